@@ -1,185 +1,297 @@
 # app.py
-from flask import Flask, render_template, jsonify
-import sqlite3
-import requests
-from flask_migrate import Migrate
-from models import db
-import os  # Import the os module
-from dotenv import load_dotenv
-
-app = Flask(__name__)
-
-load_dotenv()  # Load environment variables from .env file
-
-# Load the OpenCage API key from environment variable
-OPENCAGE_API_KEY = os.getenv('OPENCAGE_API_KEY')  # Ensure this variable is set in your .env file
-OPENCAGE_URL = 'https://api.opencagedata.com/geocode/v1/json'
-
-# Configuration to enable or disable RapidAPI
-USE_RAPIDAPI = os.getenv('USE_RAPIDAPI', 'true').lower() == 'true'
-
-# Ensure the 'instance' directory exists
-INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
-os.makedirs(INSTANCE_DIR, exist_ok=True)
-DB_PATH = os.path.join(INSTANCE_DIR, 'israeli_football.db')
-
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
-
-with app.app_context():
-    db.create_all()  # Create database tables
-
-FOOTBALL_API_KEY = os.getenv('FOOTBALL_API_KEY')
-FOOTBALL_API_URL = "https://api-football-v1.p.rapidapi.com/v3/fixtures"
-
-@app.route('/')
+#
+# create_app(config) builds the Flask app; `app:app` (flask run, gunicorn app:app) gets a default one,
+# created on first access. Nothing is connected or created at import: `flask init-db` creates the schema
+# and must run once before serving (and again after an upgrade). `flask db upgrade` alone is not enough,
+# since the migrations don't cover every table yet; until init-db has run, data routes answer 503.
+# For workers that fork with warm caches, with threads
+# for the /events streams (each holds one; at most SSE_MAX_STREAMS per worker, so keep --threads above it):
+#   PRELOAD_CACHES=true gunicorn --preload --workers 4 --worker-class gthread --threads 16 app:app
+# Sync workers answer /events with 204 (no live updates); asgi_app.py streams it without holding threads.
+from flask import Blueprint, Flask, current_app, g, render_template, jsonify, request, send_file, send_from_directory
+from flask.cli import ScriptInfo
+from image_proxy import IMAGE_MAX_AGE, ImageHostError, ImageSourceError, image_error
+from assets import ASSET_MAX_AGE, DIST_DIR, build_assets, negotiate_encoding
+from football_api import FootballApiError
+from players_api import parse_players_query, query_players, wants_query
+from clusters import refresh_clusters
+from leaderboards import refresh_leaderboards
+from responses import FastJSONProvider, choose_encoding, compress, set_encoded_body, should_compress
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REQUEST_DURATION, render as render_metrics
+from repository import SchemaNotReadyError
+from services import SCHEMA_FREE_ENDPOINTS, Services, load_config
+import time
+import click
+import mimetypes
+
+bp = Blueprint('globe', __name__, cli_group=None)  # CLI commands stay top-level: `flask init-db`, ...
+
+
+def create_app(config=None):
+    """Build the app. `config` overrides settings from the environment (see services.load_config)."""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)  # orjson for jsonify() when it is installed
+    app.config.update(load_config(config))
+
+    services = Services(app.config)
+    app.extensions['services'] = services
+    app.jinja_env.globals.update(services.template_globals())
+    app.cli.add_command(MigrationCommands('db', help='Database migrations (Flask-Migrate).'))
+    app.register_blueprint(bp)
+
+    if app.config['PRELOAD_CACHES']:
+        services.warm()
+    return app
+
+
+def current_services():
+    return current_app.extensions['services']
+
+
+def init_migrations(app):
+    """Set up Flask-SQLAlchemy and Flask-Migrate, which only the migration commands use."""
+    if 'migrate' in app.extensions:
+        return
+    from flask_migrate import Migrate
+    from models import db
+
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{app.config['DATABASE_PATH']}")
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    db.init_app(app)
+    Migrate(app, db)
+
+
+class MigrationCommands(click.Command):
+    """`flask db ...`: Flask-Migrate's commands, imported (with SQLAlchemy and Alembic) only when one runs."""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        init_migrations(parent.find_object(ScriptInfo).load_app())
+        from flask_migrate.cli import db
+        return db.make_context(info_name, args, parent=parent, **extra)
+
+
+@bp.cli.command('init-db')
+def init_db():
+    """Create the tables, indexes and triggers (or update an older database). Run before serving."""
+    current_services().init_schema()
+    print(f"Database ready: {current_app.config['DATABASE_PATH']}")
+
+@bp.cli.command('build-assets')
+def build_static_assets():
+    """Write fingerprinted, precompressed assets and texture sizes to static/dist."""
+    manifest = build_assets()
+    print(f"Built {len(manifest['files'])} assets and {len(manifest['textures'])} textures into {DIST_DIR}")
+
+@bp.route('/assets/<path:filename>')
+def get_asset(filename):
+    # Built names change with their content, so they can be cached forever
+    served, encoding = negotiate_encoding(filename, request.headers.get('Accept-Encoding'))
+    response = send_from_directory(DIST_DIR, served, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=ASSET_MAX_AGE, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@bp.before_app_request
+def require_schema():
+    # A clear 503 instead of "no such table" 500s on a database that was never initialised
+    if request.endpoint in SCHEMA_FREE_ENDPOINTS:
+        return None
+    try:
+        current_services().check_schema()
+    except SchemaNotReadyError as e:
+        current_app.logger.error(str(e))
+        return jsonify({"error": str(e)}), 503
+
+# Registered before compress_response so it runs after it (after_request hooks run in reverse)
+@bp.after_app_request
+def observe_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'  # Templates, not paths, keep labels few
+    REQUEST_DURATION.observe(time.perf_counter() - g.request_started,
+                             method=request.method, route=route, status=str(response.status_code))
+    return response
+
+@bp.after_app_request
+def compress_response(response):
+    # JSON and HTML above the size threshold; files, streams and the precompressed snapshot are left alone
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    data = response.get_data()
+    if not should_compress(response, len(data)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        set_encoded_body(response, compress(data, encoding), encoding)
+    return response
+
+@bp.route('/')
 def index():
     return render_template('globe.html')
 
-@app.route('/players', methods=['GET'])
+@bp.route('/players', methods=['GET'])
 def get_players():
-    # Connect to the SQLite database
-    conn = sqlite3.connect(DB_PATH)  # Use the absolute path
-    cursor = conn.cursor()
-
-    # Query to fetch player data
-    cursor.execute("""
-        SELECT name, city, date_of_birth, team, country, games_played, goals, assists, position, player_number, image 
-        FROM football_players
-    """)
-    players = cursor.fetchall()
-
-    # Convert to a list of dictionaries
-    player_data = []
-    for player in players:
-        city = player[1]
-        lat, lng = get_lat_long(city)  # Get latitude and longitude
-        player_data.append({
-            'name': player[0],
-            'city': city,
-            'lat': lat,
-            'lng': lng,
-            'date_of_birth': player[2],
-            'team': player[3],
-            'country': player[4],
-            'games_played': player[5],
-            'goals': player[6],
-            'assists': player[7],
-            'position': player[8],
-            'player_number': player[9],
-            'image': player[10],  # Include the image URL
-            'value': 0  # Placeholder for player value, adjust as needed
-        })
-
-    conn.close()
-    return jsonify(player_data)
-
-def get_lat_long(city):
-    """Get latitude and longitude for a given city using OpenCage API."""
+    services = current_services()
+    # Filters, projections and pages (?team=...&fields=...&cursor=...) are answered from indexed queries
+    if wants_query(request.args):
+        try:
+            query = parse_players_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        payload, next_cursor = query_players(services.players_repo, query, geocode=services.get_lat_long)
+        response = jsonify(payload)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    # Serve the prebuilt snapshot; it is only rebuilt (and recompressed) when football_players changes
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    body, etag = services.players_snapshot.get(encoding)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate, usually answered with a 304
+    return response.make_conditional(request)
+
+@bp.route('/players/clusters', methods=['GET'])
+def get_player_clusters():
+    # ?by=geohash&zoom=0..4 (default), ?by=city or ?by=team; each cluster's "filters" fetch its players from /players
+    try:
+        return jsonify(current_services().get_clusters(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@bp.route('/players/leaderboards', methods=['GET'])
+def get_player_leaderboards():
+    # ?stat=goals|assists|appearances&by=all|country|league|position&value=...&limit=10, best first;
+    # each row's "change" is its stat's gain over the last week
     try:
-        response = requests.get(OPENCAGE_URL, params={
-            'q': city,
-            'key': OPENCAGE_API_KEY  # Use the API key from the environment variable
-        })
-        data = response.json()
-        
-        if data['results']:
-            lat = data['results'][0]['geometry']['lat']
-            lng = data['results'][0]['geometry']['lng']
-            return lat, lng
-        else:
-            return 0, 0  # Default to 0 if no results found
-    except Exception as e:
-        return 0, 0  # Default to 0 on error
-
-@app.route('/next_games/<team_name>', methods=['GET'])
+        return jsonify(current_services().get_leaderboard(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@bp.cli.command('refresh-clusters')
+def refresh_player_clusters():
+    """Rebuild the /players/clusters aggregates from the stored players."""
+    services = current_services()
+    print(f"Rebuilt {refresh_clusters(services.players_repo, geocode=services.get_lat_long)} player clusters")
+
+@bp.cli.command('refresh-leaderboards')
+def refresh_player_leaderboards():
+    """Rebuild the /players/leaderboards rankings from the stored players."""
+    print(f"Rebuilt {refresh_leaderboards(current_services().players_repo)} leaderboard rows")
+
+@bp.cli.command('warm-geocodes')
+def warm_geocodes():
+    """Resolve every player city once so /players never waits on OpenCage."""
+    fetched = current_services().geocode_cache.warm_from_players()
+    print(f"Geocode cache warmed ({fetched} cities looked up)")
+
+@bp.route('/events', methods=['GET'])
+def get_events():
+    """Server-sent player and fixture changes; browsers resume with Last-Event-ID after a reconnect."""
+    # A stream holds its worker for as long as the tab is open. Sync workers (gunicorn's default) would
+    # all be taken by a few tabs, so they answer 204, which tells EventSource not to reconnect: use
+    # gthread or gevent workers, or serve /events from asgi_app.py.
+    if not request.environ.get('wsgi.multithread'):
+        return '', 204
+    live_events = current_services().live_events
+    if not live_events.open_stream():
+        response = jsonify({"error": "Too many live update streams, try again later"})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+    try:
+        cursor, first_chunk = live_events.start(
+            request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+        )
+    except Exception:
+        live_events.close_stream()
+        raise
+    response = current_app.response_class(live_events.stream(cursor, first_chunk), mimetype='text/event-stream')
+    response.call_on_close(live_events.close_stream)  # The client went away (or the worker is stopping)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx hold events back
+    return response
+
+@bp.route('/img/<size>', methods=['GET'])
+def get_image(size):
+    # /img/marker?src=<static path or photo URL>[&format=webp|jpeg]
+    try:
+        path, etag, mimetype = current_services().get_image_variant(size, request.args, request.headers.get('Accept'))
+    except (ValueError, ImageSourceError, ImageHostError) as e:
+        payload, status = image_error(e)
+        return jsonify(payload), status
+
+    response = send_file(path, mimetype=mimetype, etag=etag, max_age=IMAGE_MAX_AGE, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    if 'format' not in request.args:
+        response.vary.add('Accept')  # WebP or JPEG depending on the browser
+    return response
+
+@bp.route('/next_games/<team_name>', methods=['GET'])
 def get_next_games(team_name):
-    if not USE_RAPIDAPI:
+    if not current_app.config['USE_RAPIDAPI']:
         print('API disabled from .env file')
         return jsonify({"error": "RapidAPI usage is disabled."}), 403
 
-    headers = {
-        "X-RapidAPI-Key": FOOTBALL_API_KEY,
-        "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"
-    }
-
-    # Step 1: Get team ID from team name
-    team_url = "https://api-football-v1.p.rapidapi.com/v3/teams"
-    team_response = requests.get(team_url, headers=headers, params={"search": team_name})
-    
-    if team_response.status_code != 200:
-        return jsonify({"error": "Failed to fetch team data"}), team_response.status_code
-
-    team_data = team_response.json()
-
-    if not team_data["response"]:
-        return jsonify({"error": "No team found with that name"}), 404
-
-    selected_team = None
-    for team in team_data["response"]:
-        team_name_clean = team["team"]["name"].lower()
-        if "women" not in team_name_clean and "w" not in team_name_clean:
-            selected_team = team
-            break
-
-    if not selected_team:
-        return jsonify({"error": "Only women's team found, no men's team available"}), 404
-
-    team_id = selected_team["team"]["id"]
-    print("Team ID:", team_id)
-
-    # Step 2: Get next games for the team
-    fixtures_url = "https://api-football-v1.p.rapidapi.com/v3/fixtures"
-    fixtures_response = requests.get(fixtures_url, headers=headers, params={"team": str(team_id), "next": "2"})
-    
-    if fixtures_response.status_code != 200:
-        return jsonify({"error": "Failed to fetch fixtures"}), fixtures_response.status_code
-
-    fixtures_data = fixtures_response.json()
+    # Team IDs come from the persistent index and fixtures/photos from stale-while-revalidate
+    # caches, so a repeat click usually needs no RapidAPI call at all
+    try:
+        next_games = current_services().football_api.get_next_games(team_name)
+    except FootballApiError as e:
+        return jsonify({"error": e.message}), e.status_code
 
-    if not fixtures_data["response"]:
+    if next_games is None:
         return jsonify({"message": "No upcoming games found for this team"}), 200
 
-    # Step 3: Fetch player images for the teams
-    player_images = {}
-    for match in fixtures_data["response"]:
-        home_team_id = match["teams"]["home"]["id"]
-        away_team_id = match["teams"]["away"]["id"]
-
-        # Fetch players for home team
-        players_response = requests.get(f"https://api-football-v1.p.rapidapi.com/v3/players", headers=headers, params={"team": home_team_id})
-        if players_response.status_code == 200:
-            players_data = players_response.json()
-            if players_data["response"]:
-                player_images[home_team_id] = players_data["response"][0]["player"]["photo"]  # Get the first player's image
-
-        # Fetch players for away team
-        players_response = requests.get(f"https://api-football-v1.p.rapidapi.com/v3/players", headers=headers, params={"team": away_team_id})
-        if players_response.status_code == 200:
-            players_data = players_response.json()
-            if players_data["response"]:
-                player_images[away_team_id] = players_data["response"][0]["player"]["photo"]  # Get the first player's image
-
-    # Format response
-    upcoming_games = []
-    for match in fixtures_data["response"]:
-        home_team_id = match["teams"]["home"]["id"]
-        away_team_id = match["teams"]["away"]["id"]
-        upcoming_games.append({
-            "league": match["league"]["name"],
-            "home_team": match["teams"]["home"]["name"],
-            "away_team": match["teams"]["away"]["name"],
-            "date": match["fixture"]["date"],
-            "home_image": player_images.get(home_team_id, ""),  # Get home team image
-            "away_image": player_images.get(away_team_id, "")   # Get away team image
-        })
-
-    return jsonify({"team_name": selected_team["team"]["name"], "next_games": upcoming_games})
+    return jsonify(next_games)
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this process's metrics plus the host-wide gauges."""
+    return current_app.response_class(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+@bp.before_app_request
+def start_scheduler():
+    # Started on the first request rather than at startup, so it runs in each forked worker
+    if current_app.config['SCHEDULER_ENABLED']:
+        current_services().scheduler.start()
+
+@bp.cli.command('run-scheduler')
+@click.option('--once', is_flag=True, help='Run every job once and exit.')
+def run_scheduler(once):
+    """Run the background jobs in this process (instead of SCHEDULER_ENABLED in the web app)."""
+    scheduler = current_services().scheduler
+    if not once:
+        scheduler.run_forever()
+        return
+    if not scheduler.store.acquire_lease():
+        print("Another process is running the scheduler")
+        return
+    for job in scheduler.jobs:
+        result, error, duration = scheduler.run_job(job)
+        print(f"{job.name}: {error or result} ({duration:.2f}s)")
+    scheduler.store.release_lease()
+
+
+def __getattr__(name):
+    # `app:app` (flask run, gunicorn, hypercorn's WSGI mode) gets a default app, built once on first access
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True)
\ No newline at end of file
+    app = create_app()
+    with app.app_context():
+        current_services().init_schema()  # The development server sets the database up itself
+    app.run(host='0.0.0.0', debug=True)
@@ -0,0 +1,249 @@
+"""Async serving mode: the routes of app.py on Quart, with outbound calls on a shared httpx client.
+
+Run with:  hypercorn asgi_app:app
+"""
+import asyncio
+import mimetypes
+import time
+
+from quart import Blueprint, Quart, current_app, g, render_template, jsonify, request, send_from_directory
+from quart.wrappers.response import DataBody
+
+from assets import ASSET_MAX_AGE, DIST_DIR, negotiate_encoding
+from football_api import AsyncFootballApi, FootballApiError
+from http_client import create_async_client
+from image_proxy import IMAGE_MAX_AGE, ImageHostError, ImageSourceError, image_error
+from live_events import SSE_HEARTBEAT_SECONDS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REQUEST_DURATION, render as render_metrics
+from players_api import parse_players_query, query_players, wants_query
+from repository import SchemaNotReadyError
+from responses import FastJSONProvider, choose_encoding, compress, set_encoded_body, should_compress
+from services import SCHEMA_FREE_ENDPOINTS, Services, load_config
+
+bp = Blueprint('globe', __name__)
+
+
+def create_app(config=None):
+    """Build the app; same settings, database, snapshot and caches as app.create_app()."""
+    app = Quart(__name__)
+    app.json = FastJSONProvider(app)
+    app.config.update(load_config(config))
+
+    services = Services(app.config)
+    app.extensions['services'] = services
+    app.jinja_env.globals.update(services.template_globals())  # asset_url(), texture_urls()
+    app.register_blueprint(bp)
+
+    if app.config['PRELOAD_CACHES']:
+        services.warm()
+    return app
+
+
+def current_services():
+    return current_app.extensions['services']
+
+
+@bp.before_app_serving
+async def open_http_client():
+    # Created once the event loop is running
+    current_app.extensions['async_football_api'] = AsyncFootballApi(current_services().football_api,
+                                                                    create_async_client())
+
+
+@bp.before_app_serving
+async def start_scheduler():
+    if current_app.config['SCHEDULER_ENABLED']:
+        current_services().scheduler.start()
+
+
+@bp.after_app_serving
+async def close_http_client():
+    await current_app.extensions['async_football_api'].client.aclose()
+
+
+@bp.after_app_serving
+async def stop_scheduler():
+    # Lets a running job finish (briefly) and hands the lease to another process
+    if current_app.config['SCHEDULER_ENABLED']:
+        await asyncio.to_thread(current_services().scheduler.stop, 10)
+
+
+@bp.before_app_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.before_app_request
+async def require_schema():
+    # A clear 503 instead of "no such table" 500s on a database that was never initialised
+    if request.endpoint in SCHEMA_FREE_ENDPOINTS:
+        return None
+    try:
+        await asyncio.to_thread(current_services().check_schema)
+    except SchemaNotReadyError as e:
+        current_app.logger.error(str(e))
+        return jsonify({"error": str(e)}), 503
+
+
+# Registered before compress_response so it runs after it
+@bp.after_app_request
+async def observe_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_DURATION.observe(time.perf_counter() - g.request_started,
+                             method=request.method, route=route, status=str(response.status_code))
+    return response
+
+
+@bp.after_app_request
+async def compress_response(response):
+    if not isinstance(response.response, DataBody):  # Files are served as they are
+        return response
+    data = await response.get_data()
+    if not should_compress(response, len(data)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        set_encoded_body(response, await asyncio.to_thread(compress, data, encoding), encoding)
+    return response
+
+
+@bp.route('/')
+async def index():
+    return await render_template('globe.html')
+
+
+@bp.route('/assets/<path:filename>')
+async def get_asset(filename):
+    served, encoding = negotiate_encoding(filename, request.headers.get('Accept-Encoding'))
+    response = await send_from_directory(DIST_DIR, served, mimetype=mimetypes.guess_type(filename)[0])
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@bp.route('/players', methods=['GET'])
+async def get_players():
+    if wants_query(request.args):
+        try:
+            query = parse_players_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        services = current_services()
+        # The query and the geocode cache reads for rows without coordinates both run in the thread
+        payload, next_cursor = await asyncio.to_thread(
+            query_players, services.players_repo, query, geocode=services.get_lat_long
+        )
+        response = jsonify(payload)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    # A rebuild reads every player and the geocode cache, so keep it off the event loop
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    body, etag = await asyncio.to_thread(current_services().players_snapshot.get, encoding)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return await response.make_conditional(request)
+
+
+@bp.route('/events', methods=['GET'])
+async def get_events():
+    live_events = current_services().live_events
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    cursor, first_chunk = await asyncio.to_thread(live_events.start, last_event_id)
+
+    async def stream(cursor):
+        yield first_chunk.encode('utf-8')
+        idle = 0
+        while True:
+            chunk, cursor = await asyncio.to_thread(live_events.poll, cursor)
+            if chunk:
+                yield chunk.encode('utf-8')
+                idle = 0
+            elif idle >= SSE_HEARTBEAT_SECONDS:
+                yield b": keepalive\n\n"
+                idle = 0
+            await asyncio.sleep(live_events.poll_interval)
+            idle += live_events.poll_interval
+
+    response = current_app.response_class(stream(cursor), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None  # The stream stays open for as long as the client listens
+    return response
+
+
+@bp.route('/players/clusters', methods=['GET'])
+async def get_player_clusters():
+    try:
+        clusters = await asyncio.to_thread(current_services().get_clusters, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(clusters)
+
+
+@bp.route('/players/leaderboards', methods=['GET'])
+async def get_player_leaderboards():
+    try:
+        leaderboard = await asyncio.to_thread(current_services().get_leaderboard, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(leaderboard)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@bp.route('/img/<size>', methods=['GET'])
+async def get_image(size):
+    try:
+        path, etag, mimetype = await asyncio.to_thread(
+            current_services().get_image_variant, size, request.args, request.headers.get('Accept')
+        )
+    except (ValueError, ImageSourceError, ImageHostError) as e:
+        payload, status = image_error(e)
+        return jsonify(payload), status
+
+    response = current_app.response_class(await asyncio.to_thread(read_file, path), mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    if 'format' not in request.args:
+        response.vary.add('Accept')
+    return await response.make_conditional(request)
+
+
+@bp.route('/metrics', methods=['GET'])
+async def get_metrics():
+    # Host-wide gauges read SQLite, so render off the event loop
+    return current_app.response_class(await asyncio.to_thread(render_metrics), content_type=METRICS_CONTENT_TYPE)
+
+
+@bp.route('/next_games/<team_name>', methods=['GET'])
+async def get_next_games(team_name):
+    if not current_app.config['USE_RAPIDAPI']:
+        return jsonify({"error": "RapidAPI usage is disabled."}), 403
+
+    try:
+        next_games = await current_app.extensions['async_football_api'].get_next_games(team_name)
+    except FootballApiError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    if next_games is None:
+        return jsonify({"message": "No upcoming games found for this team"}), 200
+
+    return jsonify(next_games)
+
+
+
+# hypercorn looks the app up in the module's namespace, so it can't be created on first access
+# like app.app; creating it is cheap anyway, everything it serves is built on first use
+app = create_app()
@@ -0,0 +1,136 @@
+"""Fingerprinted, precompressed static assets for the globe page.
+
+`flask build-assets` writes static/dist/:
+- js/css files renamed to <name>.<hash>.<ext>, each with .gz (and .br if the brotli
+  package is installed) copies next to it
+- each earth texture as progressive JPEGs at a few widths, so the globe can show a
+  small one first and swap in the sharp one when it arrives
+- manifest.json mapping source names to their built files
+
+Templates ask asset_url()/texture_url() for URLs; without a build they fall back to the
+plain /static files, so development needs no build step.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from repository import ROOT_DIR
+from responses import choose_encoding
+
+STATIC_DIR = os.path.join(ROOT_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Served from /assets/ (relative to static/)
+FINGERPRINTED_ASSETS = ['js/interactive_globe.js', 'css/index_style.css']
+TEXTURE_DIR = 'images/earth_textures'
+
+# Texture widths to build; the smallest is shown first. Widths above the source's are skipped.
+TEXTURE_WIDTHS = [1024, 2048, 4096]
+TEXTURE_QUALITY = 85
+
+# Built files never change under the same name
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# Pre-encoded variants, best first: (Accept-Encoding token, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def fingerprinted_name(name, digest):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest}{ext}"
+
+
+def write_compressed(path, data):
+    """Write gzip (and brotli, when available) copies of a built file."""
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data, quality=11))
+
+
+def build_textures(source_path, name, manifest):
+    from PIL import Image  # Only the build step needs Pillow
+
+    with open(source_path, 'rb') as f:
+        digest = fingerprint(f.read())
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        widths = sorted({min(width, image.width) for width in TEXTURE_WIDTHS})
+        variants = {}
+        for width in widths:
+            height = round(image.height * width / image.width)
+            built = fingerprinted_name(name, f"{digest}.{width}")
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            resized.save(os.path.join(DIST_DIR, built), 'JPEG', quality=TEXTURE_QUALITY,
+                         optimize=True, progressive=True)
+            variants[str(width)] = built
+    manifest['textures'][name] = variants
+
+
+def build_assets():
+    """Rebuild static/dist from scratch. Returns the manifest."""
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest = {'files': {}, 'textures': {}}
+
+    for name in FINGERPRINTED_ASSETS:
+        with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+            data = f.read()
+        built = fingerprinted_name(name, fingerprint(data))
+        path = os.path.join(DIST_DIR, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        write_compressed(path, data)
+        manifest['files'][name] = built
+
+    texture_dir = os.path.join(STATIC_DIR, TEXTURE_DIR)
+    os.makedirs(os.path.join(DIST_DIR, TEXTURE_DIR), exist_ok=True)
+    for filename in sorted(os.listdir(texture_dir)):
+        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            build_textures(os.path.join(texture_dir, filename), f"{TEXTURE_DIR}/{filename}", manifest)
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """URLs for built assets, falling back to /static when there is no build."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'files': {}, 'textures': {}}
+
+    def asset_url(self, name):
+        built = self.manifest['files'].get(name)
+        return f"/assets/{built}" if built else f"/static/{name}"
+
+    def texture_urls(self, name):
+        """Texture URLs from smallest to largest (just the original without a build)."""
+        variants = self.manifest['textures'].get(name)
+        if not variants:
+            return [f"/static/{name}"]
+        return [f"/assets/{variants[width]}" for width in sorted(variants, key=int)]
+
+
+def negotiate_encoding(filename, accept_encoding):
+    """Return (path relative to DIST_DIR, content encoding or None) to serve for a request."""
+    # Negotiated like the JSON responses (q-values honoured), among the variants the build wrote
+    suffixes = {encoding: suffix for encoding, suffix in ENCODINGS
+                if os.path.isfile(os.path.join(DIST_DIR, filename + suffix))}
+    encoding = choose_encoding(accept_encoding, list(suffixes))
+    return (filename + suffixes[encoding], encoding) if encoding else (filename, None)
@@ -0,0 +1,62 @@
+"""Compare the old serial get_lat_long loop with geocode_many against a local stub OpenCage.
+
+Usage: python benchmarks/bench_geocoding.py [cities] [latency_seconds]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import TokenBucket  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+
+def serial_lookup(cities, url):
+    """The pre-batching behaviour: one bare requests.get per city, one after another."""
+    results = {}
+    for city in cities:
+        data = requests.get(url, params={'q': city, 'key': 'bench'}).json()
+        geometry = data['results'][0]['geometry']
+        results[city] = (geometry['lat'], geometry['lng'])
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    # A few repeated names, as in football_players where several players share a city
+    cities = [f'City {i % (count * 3 // 4)}' for i in range(count)]
+
+    workdir = tempfile.mkdtemp()
+    # Read when geocoding is imported: keep the quota ledger out of instance/ and never let it refuse a lookup
+    os.environ.update(SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'), OPENCAGE_DAILY_QUOTA='0')
+    from geocoding import geocode_many
+
+    with StubServer(latency=latency) as stub:
+        start = time.perf_counter()
+        serial = serial_lookup(cities, stub.url)
+        serial_time = time.perf_counter() - start
+        serial_requests = stub.requests
+
+        stub.requests = 0
+        # Paid-plan pace; on the free plan the 1 req/s quota dominates either way
+        limiter = TokenBucket(rate=40, capacity=40)
+        start = time.perf_counter()
+        batched = geocode_many(cities, 'bench', url=stub.url, limiter=limiter)
+        batched_time = time.perf_counter() - start
+        batched_requests = stub.requests
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    assert serial == batched, "batch results differ from the serial loop"
+    print(f"{count} cities, {latency * 1000:.0f} ms simulated latency")
+    print(f"serial loop : {serial_time:6.2f}s  ({serial_requests} requests)")
+    print(f"geocode_many: {batched_time:6.2f}s  ({batched_requests} requests)")
+    print(f"speed-up    : {serial_time / batched_time:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Peak memory of a tracker crawl as the number of pages grows.
+
+Each crawl runs in a fresh interpreter against the stub API-Football and OpenCage (one league,
+PER_PAGE players a page, every fifth one Israeli and abroad) and reports its peak RSS before and after
+the crawl. With the streaming pipeline the growth stays flat however many pages are crawled.
+
+Usage: python benchmarks/bench_ingest_memory.py [pages,pages,...]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from stub_server import StubServer, make_upstream_handler  # noqa: E402
+
+PER_PAGE = 100
+
+# Runs in the child interpreter; prints one JSON line with peak RSS (MiB) and crawl stats
+PROBE = '''
+import json, resource, sys, time
+sys.path[:0] = [{root!r}, {data_dir!r}]
+from fetchPlayersData import IsraeliFootballTracker
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+
+tracker = IsraeliFootballTracker({db_path!r}, leagues=['271'], seasons=['2023'])
+before = peak_rss()
+start = time.perf_counter()
+stored = tracker.fetch_football_players(debug=False)
+seconds = time.perf_counter() - start
+tracker.close()
+print(json.dumps({{'before': before, 'after': peak_rss(), 'stored': stored, 'seconds': seconds}}))
+'''
+
+
+def run_crawl(pages, workdir):
+    db_path = os.path.join(workdir, f'crawl-{pages}.db')
+    with StubServer(make_upstream_handler(total_pages=pages, per_page=PER_PAGE), latency=0) as stub:
+        env = dict(os.environ, FOOTBALL_API_BASE_URL=f'{stub.url}/v3', OPENCAGE_URL=f'{stub.url}/geocode/v1/json',
+                   FOOTBALL_API_KEY='bench', OPENCAGE_API_KEY='bench',
+                   SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'), RAPIDAPI_DAILY_QUOTA='0',
+                   OPENCAGE_DAILY_QUOTA='0', TRACKER_CACHE_MAX_AGE='0', FOOTBALL_API_RATE_LIMIT='10000',
+                   OPENCAGE_RATE_LIMIT='10000', GEOCODING_OFFLINE='false', UPSTREAM_FIXTURES='')
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(root=ROOT, data_dir=os.path.join(ROOT, 'data'), db_path=db_path)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True  # The tracker logs to its cwd
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    sizes = [int(pages) for pages in sys.argv[1].split(',')] if len(sys.argv) > 1 else [50, 500, 2000]
+    workdir = tempfile.mkdtemp()
+
+    print(f"One league, {PER_PAGE} players a page (peak RSS in MiB)")
+    print(f"{'pages':>8}{'players':>10}{'stored':>9}{'before':>10}{'after':>10}{'growth':>10}{'pages/s':>10}")
+    for pages in sizes:
+        result = run_crawl(pages, workdir)
+        print(f"{pages:>8}{pages * PER_PAGE:>10}{result['stored']:>9}{result['before']:>10.1f}"
+              f"{result['after']:>10.1f}{result['after'] - result['before']:>10.1f}"
+              f"{pages / result['seconds']:>10.0f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Serialize and compress /players payloads of 100, 1k and 10k synthetic players.
+
+Compares the json module with responses.dumps (orjson when installed), and the size and
+cost of each compression level the app uses. Brotli rows appear only when it is installed.
+
+Usage: python benchmarks/bench_json.py [repeats]
+"""
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import responses  # noqa: E402
+
+SIZES = [100, 1000, 10000]
+
+
+def synthetic_players(count):
+    return [{
+        "name": f"Player {i}",
+        "date_of_birth": f"{1990 + i % 15}-01-01",
+        "team": f"Club {i % 300}",
+        "country": f"Country {i % 30}",
+        "city": f"City {i % 120}",
+        "games_played": i % 30,
+        "goals": i % 12,
+        "assists": i % 7,
+        "position": "Midfielder",
+        "player_number": i % 99,
+        "value": None,
+        "image": f"https://media.api-sports.io/football/players/{i}.png",
+        "lat": 32.0 + (i % 100) / 100,
+        "lng": 34.8 + (i % 50) / 100,
+    } for i in range(count)]
+
+
+def best_of(repeats, function, *args):
+    """Fastest of `repeats` runs, in milliseconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def stdlib_dumps(players):
+    return json.dumps(players, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    encodings = ['gzip'] + (['br'] if responses.brotli else [])
+    print(f"orjson: {'yes' if responses.orjson else 'no (json fallback)'}, "
+          f"brotli: {'yes' if responses.brotli else 'no'}")
+
+    for count in SIZES:
+        players = synthetic_players(count)
+        body = responses.dumps(players)
+        print(f"\n{count} players, {len(body) / 1024:.1f} KiB of JSON")
+        print(f"{'':<22}{'time':>10}{'size':>12}")
+        print(f"{'json.dumps':<22}{best_of(repeats, stdlib_dumps, players):>8.2f}ms{len(stdlib_dumps(players)):>12}")
+        print(f"{'responses.dumps':<22}{best_of(repeats, responses.dumps, players):>8.2f}ms{len(body):>12}")
+        for encoding in encodings:
+            for name, levels in (('dynamic', responses.DYNAMIC_LEVELS), ('snapshot', responses.STATIC_LEVELS)):
+                label = f"{encoding} {levels[encoding]} ({name})"
+                elapsed = best_of(repeats, responses.compress, body, encoding, levels)
+                size = len(responses.compress(body, encoding, levels))
+                print(f"{label:<22}{elapsed:>8.2f}ms{size:>12}")
+
+
+if __name__ == '__main__':
+    main()
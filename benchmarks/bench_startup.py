@@ -0,0 +1,102 @@
+"""Time from `import app` to the first /players response, and a forked worker's first response.
+
+Each run is a fresh interpreter on a synthetic database. "cold" creates the app and forks a
+worker that builds everything on its first request; "preload" warms the caches before the
+fork (PRELOAD_CACHES=true, as under gunicorn --preload), so the worker starts ready.
+
+Usage: python benchmarks/bench_startup.py [players] [runs]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Runs in the child interpreter; prints one JSON line of phase timings (milliseconds)
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+flask_app = app.create_app({{'PRELOAD_CACHES': {preload!r}}})
+created = time.perf_counter()
+read_end, write_end = os.pipe()
+if os.fork() == 0:
+    forked = time.perf_counter()
+    response = flask_app.test_client().get('/players', headers={{'Accept-Encoding': 'gzip'}})
+    assert response.status_code == 200, response.status_code
+    os.write(write_end, str(time.perf_counter() - forked).encode())
+    os._exit(0)
+os.close(write_end)
+worker_first = float(os.read(read_end, 64))
+os.wait()
+phases = {{'import': imported - start, 'create_app': created - imported, 'worker_first_response': worker_first}}
+print(json.dumps({{name: seconds * 1000 for name, seconds in phases.items()}}))
+'''
+
+
+def build_database(path, count):
+    from repository import PlayerRepository
+
+    repo = PlayerRepository(path)
+    repo.ensure_schema()
+    with repo.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO football_players (name, date_of_birth, team, country, city, games_played, goals, "
+            "assists, position, player_number, player_id, last_updated) "
+            "VALUES (?, '1995-01-01', ?, 'Israel', 'Tel Aviv', 10, 1, 1, 'Midfielder', 8, ?, '2025-01-01')",
+            [(f"Player {i}", f"Club {i % 300}", str(i)) for i in range(count)]
+        )
+    repo.close()
+
+
+def run_probe(env, preload):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT, preload=preload)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = (time.perf_counter() - start) * 1000  # Interpreter start to exit
+    return timings
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'israeli_football.db')
+    build_database(db_path, count)
+    env = dict(os.environ, DATABASE_PATH=db_path, SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'),
+               GEOCODING_OFFLINE='true', SCHEDULER_ENABLED='false')
+    # The apps don't create tables at startup
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    print(f"{count} players, median of {runs} runs (ms)")
+    print(f"{'':<10}{'import':>10}{'create_app':>12}{'worker 1st':>12}{'process':>10}")
+    for label, preload in (('cold', False), ('preload', True)):
+        results = []
+        for _ in range(runs):
+            for suffix in ('', '-wal', '-shm'):  # No snapshot left by the previous run
+                if os.path.exists(env['SHARED_CACHE_PATH'] + suffix):
+                    os.remove(env['SHARED_CACHE_PATH'] + suffix)
+            results.append(run_probe(env, preload))
+        row = [median([r[phase] for r in results]) for phase in
+               ('import', 'create_app', 'worker_first_response', 'process')]
+        print(f"{label:<10}{row[0]:>10.1f}{row[1]:>12.1f}{row[2]:>12.1f}{row[3]:>10.1f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
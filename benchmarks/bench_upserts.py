@@ -0,0 +1,101 @@
+"""Upsert 10k synthetic players with the old per-row path and the tracker's batched upsert.
+
+Each path runs twice on its own fresh database: a first load (all inserts) and a re-run
+where every other player's stats changed.
+
+Usage: python benchmarks/bench_upserts.py [players]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'data')]
+os.environ.setdefault('FOOTBALL_API_KEY', 'bench')
+os.environ.setdefault('TRACKER_CACHE_MAX_AGE', '0')
+from fetchPlayersData import IsraeliFootballTracker  # noqa: E402
+
+# The tracker's table before indexes and hashes were added
+OLD_SCHEMA = '''
+CREATE TABLE football_players (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL, date_of_birth Date, team TEXT, country TEXT, city TEXT,
+    age INTEGER, games_played INTEGER, goals INTEGER, assists INTEGER, position TEXT,
+    player_id TEXT, last_updated TIMESTAMP
+)
+'''
+
+
+def synthetic_players(count, run):
+    return [{
+        "name": f"Player {i}",
+        "age": 20 + i % 15,
+        "date_of_birth": f"{1990 + i % 15}-01-01",
+        "team": f"Club {i % 300}",
+        "country": f"Country {i % 30}",
+        "league": f"League {i % 30}",
+        "city": "Unknown",  # Keeps geocoding out of the measurement
+        "games_played": i % 30,
+        # On the second run every other player scored once more
+        "goals": i % 12 + (run if i % 2 else 0),
+        "assists": i % 7,
+        "position": "Midfielder",
+        "player_number": i % 99,
+        "image": None,
+        "player_id": str(i),
+    } for i in range(count)]
+
+
+def old_upsert(conn, players):
+    """The pre-batching write loop: SELECT, then UPDATE or INSERT, one row at a time."""
+    cursor = conn.cursor()
+    for player in players:
+        cursor.execute("SELECT id FROM football_players WHERE player_id = ?", (player["player_id"],))
+        if cursor.fetchone():
+            cursor.execute('''
+            UPDATE football_players SET name=?, age=?, team=?, country=?, city=?, games_played=?, goals=?,
+            assists=?, position=?, last_updated=? WHERE player_id=?
+            ''', (player["name"], player["age"], player["team"], player["country"], player["city"],
+                  player["games_played"], player["goals"], player["assists"], player["position"],
+                  datetime.now(), player["player_id"]))
+        else:
+            cursor.execute('''
+            INSERT INTO football_players (name, age, team, country, city, games_played, goals, assists,
+            position, player_id, last_updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (player["name"], player["age"], player["team"], player["country"], player["city"],
+                  player["games_played"], player["goals"], player["assists"], player["position"],
+                  player["player_id"], datetime.now()))
+    conn.commit()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    workdir = tempfile.mkdtemp()
+
+    conn = sqlite3.connect(os.path.join(workdir, 'old.db'))
+    conn.execute(OLD_SCHEMA)
+    old_times = [timed(old_upsert, conn, synthetic_players(count, run)) for run in (0, 1)]
+    conn.close()
+
+    tracker = IsraeliFootballTracker(os.path.join(workdir, 'new.db'))
+
+    new_times = [timed(tracker.save_players, synthetic_players(count, run)) for run in (0, 1)]
+    tracker.close()
+
+    print(f"{count} players")
+    print(f"{'':<22}{'first load':>12}{'re-run':>12}")
+    print(f"{'per-row SELECT+write':<22}{old_times[0]:>11.2f}s{old_times[1]:>11.2f}s")
+    print(f"{'batched upsert':<22}{new_times[0]:>11.2f}s{new_times[1]:>11.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Load-test /next_games in the sync (gunicorn + Flask) and async (hypercorn + Quart) serving modes.
+
+Both servers talk to a local stub API-Football with artificial latency. Every request uses a
+new team name so the team index and caches miss and each request really waits on upstream.
+
+Usage: python benchmarks/load_test.py [requests] [concurrency] [upstream_latency_seconds]
+Needs gunicorn, hypercorn, quart and httpx installed.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from stub_server import StubServer, football_handler  # noqa: E402
+
+SYNC_WORKERS = 4
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, env):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start: {' '.join(command)}")
+
+
+def run_load(base_url, label, total, concurrency):
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def one(i):
+        start = time.perf_counter()
+        response = session.get(f'{base_url}/next_games/Team {label} {i}', timeout=60)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<6} {total / elapsed:8.1f} req/s   p50 {p50 * 1000:7.0f} ms   p99 {p99 * 1000:7.0f} ms")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'israeli_football.db')
+    shutil.copy(os.path.join(ROOT, 'instance', 'israeli_football.db'), db_path)
+
+    with StubServer(football_handler, latency=latency) as stub:
+        env = dict(
+            os.environ,
+            DATABASE_PATH=db_path,
+            SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'),
+            # The load would otherwise spend (and be refused by) the real daily budgets
+            RAPIDAPI_DAILY_QUOTA='0',
+            OPENCAGE_DAILY_QUOTA='0',
+            FOOTBALL_API_BASE_URL=f'{stub.url}/v3',
+            FOOTBALL_API_KEY='bench',
+            OPENCAGE_API_KEY='bench',
+            USE_RAPIDAPI='true',
+        )
+        # The apps don't create tables at startup
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        modes = [
+            ('sync', [sys.executable, '-m', 'gunicorn', '--workers', str(SYNC_WORKERS), '--bind', '127.0.0.1:{port}', 'app:app']),
+            ('async', [sys.executable, '-m', 'hypercorn', '--bind', '127.0.0.1:{port}', 'asgi_app:app']),
+        ]
+        print(f"{total} requests, concurrency {concurrency}, upstream latency {latency * 1000:.0f} ms")
+        for label, command in modes:
+            port = free_port()
+            process = start_server([part.format(port=port) for part in command], port, env)
+            try:
+                run_load(f'http://127.0.0.1:{port}', label, total, concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
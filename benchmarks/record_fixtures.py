@@ -0,0 +1,63 @@
+"""Re-record fixtures/upstream: a tracker run, the team index and /next_games, against the stub upstream.
+
+The recordings let everything run offline with UPSTREAM_FIXTURES=replay, e.g.
+    UPSTREAM_FIXTURES=replay FOOTBALL_API_KEY=x python data/fetchPlayersData.py
+Record against the real APIs instead by running any of them with UPSTREAM_FIXTURES=record and real keys.
+
+Usage: python benchmarks/record_fixtures.py [pages]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'data')]
+from stub_server import StubServer, make_upstream_handler  # noqa: E402
+
+# The tracker's default crawl, so a replayed run finds every page it asks for
+LEAGUE, SEASON = '271', '2023'
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    workdir = tempfile.mkdtemp()
+    fixtures_dir = os.path.join(ROOT, 'fixtures', 'upstream')
+    shutil.rmtree(fixtures_dir, ignore_errors=True)
+
+    with StubServer(make_upstream_handler(total_pages=pages), latency=0) as stub:
+        # Read at import by the modules below
+        os.environ.update(
+            UPSTREAM_FIXTURES='record', UPSTREAM_FIXTURES_DIR=fixtures_dir,
+            FOOTBALL_API_BASE_URL=f'{stub.url}/v3', OPENCAGE_URL=f'{stub.url}/geocode/v1/json',
+            FOOTBALL_API_KEY='fixtures', OPENCAGE_API_KEY='fixtures',
+            DATABASE_PATH=os.path.join(workdir, 'israeli_football.db'),
+            SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'),
+            TRACKER_LEAGUES=LEAGUE, TRACKER_SEASONS=SEASON, TRACKER_CACHE_MAX_AGE='0',
+            FOOTBALL_API_RATE_LIMIT='100', OPENCAGE_RATE_LIMIT='100', GEOCODING_OFFLINE='false',
+        )
+        os.chdir(workdir)  # The tracker's log file lands here, not in the repo
+        import app
+        from fetchPlayersData import IsraeliFootballTracker
+
+        tracker = IsraeliFootballTracker()
+        stored = tracker.fetch_football_players(debug=True)
+        tracker.warm_geocode_cache()
+        tracker.close()
+
+        flask_app = app.create_app()
+        services = flask_app.extensions['services']
+        client = flask_app.test_client()
+        teams = services.players_repo.distinct_teams()
+        for team in teams:  # Before indexing the league, so each team's ID search is recorded too
+            client.get(f'/next_games/{team}')
+        services.football_api.index_league_teams(LEAGUE, SEASON)
+
+    print(f"Recorded {len(os.listdir(fixtures_dir))} responses ({stored} players, {len(teams)} teams) "
+          f"into {fixtures_dir}")
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
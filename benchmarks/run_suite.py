@@ -0,0 +1,306 @@
+"""End-to-end benchmarks, all against the local stub upstream, with results saved as JSON per commit.
+
+  players    /players at 100, 1k and 10k players: cold first request, warm requests, 304 revalidation
+  next_games /next_games for distinct teams from concurrent clients, then the same teams again (cached)
+  tracker    ingest throughput of a full crawl (pages/s, players/s)
+  upserts    the tracker's batched upsert: a first load and a re-run with changed stats
+
+Nothing calls RapidAPI or OpenCage and no API key is needed. Results go to
+benchmarks/results/<timestamp>-<commit>.json; compare two runs with --compare.
+
+Usage:
+  python benchmarks/run_suite.py [--only players,tracker] [--quick] [--latency 0.05] [--error-rate 0.1]
+  python benchmarks/run_suite.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'data')]
+from stub_server import StubServer, make_upstream_handler  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SECTIONS = ('players', 'next_games', 'tracker', 'upserts')
+
+# (full run, --quick)
+SIZES = {
+    'players': ([100, 1000, 10000], [100, 1000]),
+    'warm_requests': (50, 10),
+    'next_games_teams': (200, 40),
+    'next_games_concurrency': (16, 8),
+    'tracker_pages': (50, 10),
+    'upsert_players': (10000, 1000),
+}
+PER_PAGE = 20  # Players per API-Football page, as in the real API
+
+
+def size(name, quick):
+    return SIZES[name][quick]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def gazetteer_cities():
+    """Real city names, so /players geocodes from the bundled gazetteer as it does in production."""
+    with open(os.path.join(ROOT, 'data', 'gazetteer.csv'), encoding='utf-8') as f:
+        return [(row['city'], row['country']) for row in csv.DictReader(f)]
+
+
+def build_database(path, count):
+    from repository import PlayerRepository
+
+    cities = gazetteer_cities()
+    repo = PlayerRepository(path)
+    repo.ensure_schema()
+    with repo.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO football_players (name, date_of_birth, team, country, city, games_played, goals, "
+            "assists, position, player_number, image, player_id, last_updated) "
+            "VALUES (?, '1995-01-01', ?, ?, ?, ?, ?, ?, 'Midfielder', ?, ?, ?, '2025-01-01')",
+            [(f"Player {i}", f"Club {i % 300}", cities[i % len(cities)][1], cities[i % len(cities)][0],
+              i % 30, i % 12, i % 7, i % 99, f"https://media.api-sports.io/football/players/{i}.png", str(i))
+             for i in range(count)]
+        )
+    repo.close()
+
+
+def create_app(db_path):
+    import app
+
+    flask_app = app.create_app({'DATABASE_PATH': db_path, 'USE_RAPIDAPI': True, 'SCHEDULER_ENABLED': False,
+                                'PRELOAD_CACHES': False})
+    with flask_app.app_context():
+        app.current_services().init_schema()
+    return flask_app
+
+
+def bench_players(workdir, stub, quick):
+    results = {}
+    for count in size('players', quick):
+        db_path = os.path.join(workdir, f'players-{count}.db')
+        build_database(db_path, count)
+        client = create_app(db_path).test_client()
+
+        def get(**headers):
+            return client.get('/players', headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+
+        cold, response = timed(get)
+        assert response.status_code == 200, response.status_code
+        warm = [timed(get)[0] for _ in range(size('warm_requests', quick))]
+        revalidate = [timed(lambda: get(**{'If-None-Match': response.headers['ETag']}))[0]
+                      for _ in range(size('warm_requests', quick))]
+        plain = client.get('/players')
+        results[str(count)] = {
+            'cold_ms': milliseconds(cold),
+            'warm_p50_ms': milliseconds(percentile(warm, 0.5)),
+            'warm_p99_ms': milliseconds(percentile(warm, 0.99)),
+            'not_modified_p50_ms': milliseconds(percentile(revalidate, 0.5)),
+            'body_bytes': len(plain.get_data()),
+            'gzip_bytes': len(response.get_data()),
+        }
+    return results
+
+
+def bench_next_games(workdir, stub, quick):
+    db_path = os.path.join(workdir, 'next_games.db')
+    build_database(db_path, 100)
+    flask_app = create_app(db_path)
+    teams = [f"Bench Team {i}" for i in range(size('next_games_teams', quick))]
+    concurrency = size('next_games_concurrency', quick)
+
+    def one(team):
+        start = time.perf_counter()
+        status = flask_app.test_client().get(f'/next_games/{team}').status_code
+        return time.perf_counter() - start, status
+
+    results = {}
+    for label in ('uncached', 'cached'):  # The second pass asks for the same teams again
+        calls_before = stub.requests
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            elapsed, responses = timed(lambda: list(executor.map(one, teams)))
+        latencies = [latency for latency, _ in responses]
+        results[label] = {
+            'requests_per_second': round(len(teams) / elapsed, 1),
+            'p50_ms': milliseconds(percentile(latencies, 0.5)),
+            'p99_ms': milliseconds(percentile(latencies, 0.99)),
+            'upstream_calls_per_request': round((stub.requests - calls_before) / len(teams), 2),
+            'failed_requests': sum(status != 200 for _, status in responses),  # Only with --error-rate
+        }
+    results['teams'] = len(teams)
+    results['concurrency'] = concurrency
+    return results
+
+
+def bench_tracker(workdir, stub, quick):
+    from fetchPlayersData import IsraeliFootballTracker
+
+    tracker = IsraeliFootballTracker(os.path.join(workdir, 'tracker.db'), leagues=['271'], seasons=['2023'])
+    calls_before = stub.requests
+    elapsed, stored = timed(tracker.fetch_football_players, False)
+    stats = dict(tracker.run_stats)
+    tracker.close()
+    return {
+        'seconds': round(elapsed, 3),
+        'pages': stats.get('pages_fetched', 0),
+        'pages_per_second': round(stats.get('pages_fetched', 0) / elapsed, 1),
+        'players_per_second': round(stats.get('pages_fetched', 0) * PER_PAGE / elapsed, 1),
+        'players_stored': stored,
+        'upstream_calls': stub.requests - calls_before,
+    }
+
+
+def bench_upserts(workdir, stub, quick):
+    from bench_upserts import synthetic_players
+    from fetchPlayersData import IsraeliFootballTracker
+
+    count = size('upsert_players', quick)
+    tracker = IsraeliFootballTracker(os.path.join(workdir, 'upserts.db'))
+    first_load, _ = timed(tracker.save_players, synthetic_players(count, 0))
+    rerun, _ = timed(tracker.save_players, synthetic_players(count, 1))
+    tracker.close()
+    return {
+        'players': count,
+        'first_load_ms': milliseconds(first_load),
+        'rerun_ms': milliseconds(rerun),
+        'first_load_rows_per_second': round(count / first_load),
+        'rerun_rows_per_second': round(count / rerun),
+    }
+
+
+BENCHMARKS = {'players': bench_players, 'next_games': bench_next_games,
+              'tracker': bench_tracker, 'upserts': bench_upserts}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_suite(sections, quick, latency, error_rate):
+    workdir = tempfile.mkdtemp()
+    handler = make_upstream_handler(total_pages=size('tracker_pages', quick), per_page=PER_PAGE)
+    with StubServer(handler, latency=latency, error_rate=error_rate) as stub:
+        # Read at import by the project modules, so set before any of them is imported
+        os.environ.update(
+            FOOTBALL_API_BASE_URL=f'{stub.url}/v3', OPENCAGE_URL=f'{stub.url}/geocode/v1/json',
+            FOOTBALL_API_KEY='bench', OPENCAGE_API_KEY='bench', UPSTREAM_FIXTURES='',
+            SHARED_CACHE_PATH=os.path.join(workdir, 'shared_cache.db'),
+            IMAGE_CACHE_DIR=os.path.join(workdir, 'image_cache'),
+            RAPIDAPI_DAILY_QUOTA='0', OPENCAGE_DAILY_QUOTA='0', TRACKER_CACHE_MAX_AGE='0',
+            FOOTBALL_API_RATE_LIMIT='1000', OPENCAGE_RATE_LIMIT='1000', GEOCODING_OFFLINE='true',
+        )
+        os.chdir(workdir)  # The tracker's log file lands here, not in the repo
+
+        results = {}
+        for name in sections:
+            errors_before = stub.errors
+            print(f"Running {name}...", flush=True)
+            results[name] = BENCHMARKS[name](workdir, stub, quick)
+            if error_rate:
+                results[name]['injected_errors'] = stub.errors - errors_before
+
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def flatten(results, prefix=''):
+    """{'players': {'100': {'cold_ms': 1}}} -> {'players.100.cold_ms': 1}"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    old_results, new_results = flatten(old['results']), flatten(new['results'])
+
+    print(f"{'':<52}{old['commit']:>14}{new['commit']:>14}{'change':>10}")
+    for metric in sorted(set(old_results) | set(new_results)):
+        before, after = old_results.get(metric), new_results.get(metric)
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else ''
+        print(f"{metric:<52}{'-' if before is None else before:>14}{'-' if after is None else after:>14}{change:>10}")
+
+
+def print_results(results):
+    for metric, value in flatten(results).items():
+        print(f"  {metric:<52}{value:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', help=f"comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a quick check')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub upstream latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of upstream calls that fail with 503')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<timestamp>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sections = args.only.split(',') if args.only else list(SECTIONS)
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    commit = git_commit()
+    started = datetime.now(timezone.utc)
+    results = run_suite(sections, args.quick, args.latency, args.error_rate)
+    report = {
+        'commit': commit,
+        'timestamp': started.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'quick': args.quick, 'latency': args.latency, 'error_rate': args.error_rate},
+        'results': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print_results(results)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
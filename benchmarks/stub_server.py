@@ -0,0 +1,187 @@
+"""Tiny local HTTP server that imitates the upstream APIs for benchmarks."""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def opencage_handler(path, params):
+    """Answer like OpenCage: one result whose coordinates depend on the city name."""
+    city = params.get('q', [''])[0]
+    seed = sum(ord(c) for c in city)
+    return {'results': [{'geometry': {'lat': seed % 90, 'lng': seed % 180}}]}
+
+
+def stub_team_id(name):
+    return sum(ord(c) for c in name)
+
+
+def football_handler(path, params):
+    """Answer the API-Football endpoints used by /next_games (and the connection test) with deterministic data."""
+    if path.endswith('/teams'):
+        if 'league' in params:  # A league's clubs, as indexed by `find team id.py`
+            names = [f'Club {i}' for i in range(40)]
+        else:
+            names = [params.get('search', ['Team'])[0]]
+        return {'response': [{'team': {'id': stub_team_id(name), 'name': name}} for name in names]}
+    if path.endswith('/status'):
+        return {'errors': [], 'response': {'account': {'firstname': 'Stub'}, 'requests': {'current': 0, 'limit_day': 100}}}
+    if path.endswith('/leagues'):
+        return {'response': [{'league': {'id': 271, 'name': 'Stub League'}}]}
+    if path.endswith('/fixtures'):
+        team_id = int(params['team'][0])
+        return {'response': [
+            {
+                'league': {'name': 'Stub League'},
+                'fixture': {'date': f'2026-11-0{i + 1}T18:30:00+00:00'},
+                'teams': {'home': {'id': team_id, 'name': f'Team {team_id}'},
+                          'away': {'id': team_id + i + 1, 'name': f'Team {team_id + i + 1}'}},
+            }
+            for i in range(2)
+        ]}
+    if path.endswith('/players'):
+        team_id = params['team'][0]
+        return {'response': [{'player': {'photo': f'https://media.example/players/{team_id}.png'}}]}
+    return {'response': []}
+
+
+def synthetic_player(player_id, israeli_every=5):
+    """One /players entry shaped like API-Football's; every Nth player is Israeli and plays abroad."""
+    israeli = player_id % israeli_every == 0
+    return {
+        'player': {
+            'id': player_id,
+            'name': f'Player {player_id}',
+            'age': 20 + player_id % 15,
+            'birth': {'date': f'{1990 + player_id % 15}-0{1 + player_id % 9}-1{player_id % 10}'},
+            'nationality': 'Israel' if israeli else 'Spain',
+            'position': ['Goalkeeper', 'Defender', 'Midfielder', 'Attacker'][player_id % 4],
+            'photo': f'https://media.example/players/{player_id}.png',
+        },
+        'statistics': [{
+            'team': {'id': player_id % 40, 'name': f'Club {player_id % 40}', 'country': 'Germany',
+                     'city': f'City {player_id % 25}'},
+            'league': {'id': 78 + player_id % 40 % 2, 'name': ['Bundesliga', '2. Bundesliga'][player_id % 40 % 2],
+                       'country': 'Germany'},
+            'games': {'appearences': player_id % 30, 'number': player_id % 99},
+            'goals': {'total': player_id % 12, 'assists': player_id % 7},
+        }],
+    }
+
+
+def make_players_handler(total_pages=10, per_page=20):
+    """Answer paginated /players league requests the way the tracker crawls them."""
+    def handler(path, params):
+        page = int(params.get('page', ['1'])[0])
+        first_id = (page - 1) * per_page + 1
+        return {
+            'paging': {'current': page, 'total': total_pages},
+            'response': [synthetic_player(player_id) for player_id in range(first_id, first_id + per_page)],
+        }
+    return handler
+
+
+def make_upstream_handler(total_pages=10, per_page=20):
+    """Answer OpenCage and every API-Football call of the apps and the tracker from one server.
+
+    Point the code at it with OPENCAGE_URL={url}/geocode/v1/json and FOOTBALL_API_BASE_URL={url}/v3.
+    """
+    league_pages = make_players_handler(total_pages, per_page)
+
+    def handler(path, params):
+        if path.startswith('/geocode/'):
+            return opencage_handler(path, params)
+        if path.endswith('/players') and 'league' in params:
+            return league_pages(path, params)
+        return football_handler(path, params)
+    return handler
+
+
+class StubServer:
+    """Run a ThreadingHTTPServer in the background that answers every GET via `handler`.
+
+    `handler(path, params)` gets the request path and parsed query string and returns a JSON-serializable body,
+    or a (status, body) tuple to imitate an upstream error.
+    Each request sleeps `latency` seconds first to imitate a remote API, and a random `error_rate`
+    share of them (seeded, so runs repeat) fails with `error_status` instead, with a Retry-After
+    of `retry_after` seconds if given. With a `rate_limit`, responses carry X-RateLimit-Limit and
+    -Remaining headers for that many calls a minute, like API-Football's.
+    """
+
+    def __init__(self, handler=opencage_handler, latency=0.05, error_rate=0.0, error_status=503, seed=0,
+                 retry_after=None, rate_limit=None):
+        self.handler = handler
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self._window = (0, 0)  # (minute, calls in it)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def inject_error(self):
+        with self._lock:
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def rate_limit_headers(self):
+        with self._lock:
+            minute, calls = self._window
+            now = int(time.time() // 60)
+            self._window = (now, calls + 1 if now == minute else 1)
+            return {'X-RateLimit-Limit': str(self.rate_limit),
+                    'X-RateLimit-Remaining': str(max(0, self.rate_limit - self._window[1]))}
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency)
+                parsed = urlparse(self.path)
+                headers = stub.rate_limit_headers() if stub.rate_limit else {}
+                if stub.inject_error():
+                    status, result = stub.error_status, {'message': 'Injected upstream error'}
+                    if stub.retry_after is not None:
+                        headers['Retry-After'] = str(stub.retry_after)
+                else:
+                    result = stub.handler(parsed.path, parse_qs(parsed.query))
+                    status, result = result if isinstance(result, tuple) else (200, result)
+                body = json.dumps(result).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
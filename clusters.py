@@ -0,0 +1,155 @@
+"""Precomputed player clusters for the globe: by city, by club, or by geohash cell.
+
+The tracker refreshes them after every ingest, so /players/clusters is a single indexed
+read however many players there are. Each cluster carries the /players filters that
+return its members, so the globe can draw a few dozen clusters first and load detail on demand.
+"""
+import json
+
+# Geohash cell size by globe zoom level: 0 ~ 5000 km cells ... 4 ~ 5 km cells
+ZOOM_PRECISION = [1, 2, 3, 4, 5]
+
+GROUPINGS = ('city', 'team', 'geohash')
+
+# Players listed with each cluster (best scorers first)
+TOP_PLAYERS = 3
+TOP_PLAYER_FIELDS = ['name', 'team', 'position', 'goals', 'games_played', 'image']
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision):
+    """Standard base32 geohash of a point."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def geohash_bounds(geohash):
+    """(min_lat, max_lat, min_lng, max_lng) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lng_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if bits >> shift & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def top_players(members):
+    ranked = sorted(members, key=lambda p: (p['goals'] or 0, p['games_played'] or 0), reverse=True)
+    return [{field: player[field] for field in TOP_PLAYER_FIELDS} for player in ranked[:TOP_PLAYERS]]
+
+
+def make_cluster(group_by, precision, key, label, members, filters):
+    located = [p for p in members if p['lat'] is not None and p['lng'] is not None]
+    lat = sum(p['lat'] for p in located) / len(located) if located else None
+    lng = sum(p['lng'] for p in located) / len(located) if located else None
+    return {
+        'group_by': group_by,
+        'precision': precision,
+        'cluster_key': key,
+        'label': label,
+        'player_count': len(members),
+        'lat': lat,
+        'lng': lng,
+        'top_players': json.dumps(top_players(members), separators=(',', ':')),
+        'filters': json.dumps(filters, separators=(',', ':')),
+    }
+
+
+def build_clusters(players):
+    """Every cluster row for every grouping and geohash precision."""
+    groups = {}
+    for player in players:
+        groups.setdefault(('city', 0, player['city']), []).append(player)
+        groups.setdefault(('team', 0, player['team']), []).append(player)
+        # Players without coordinates can't be placed in a cell
+        if player['lat'] is not None and player['lng'] is not None:
+            geohash = geohash_encode(player['lat'], player['lng'], ZOOM_PRECISION[-1])
+            for precision in ZOOM_PRECISION:
+                groups.setdefault(('geohash', precision, geohash[:precision]), []).append(player)
+
+    rows = []
+    for (group_by, precision, key), members in groups.items():
+        if group_by == 'geohash':
+            min_lat, max_lat, min_lng, max_lng = geohash_bounds(key)
+            filters = {'min_lat': min_lat, 'max_lat': max_lat, 'min_lng': min_lng, 'max_lng': max_lng}
+            label = key
+        else:
+            filters = {group_by: key}
+            label = key.strip()
+        rows.append(make_cluster(group_by, precision, key, label, members, filters))
+    return rows
+
+
+def refresh_clusters(repo, geocode=None):
+    """Rebuild the stored clusters from football_players. Returns the number of clusters.
+
+    Coordinates looked up for players stored without them are saved too, so the bounding-box
+    filters of geohash clusters find those players in /players.
+    """
+    players = repo.fetch_players()
+    found = {}
+    if geocode:
+        for player in players:
+            if player['lat'] is None or player['lng'] is None:
+                player['lat'], player['lng'] = geocode(player['city'], player['country'])
+                if player['lat'] is not None and player['lng'] is not None:
+                    found[(player['city'], player['country'])] = (player['lat'], player['lng'])
+    rows = build_clusters(players)
+    with repo.transaction() as conn:
+        repo.store_city_coordinates(conn, found)
+        repo.replace_clusters(conn, rows)
+    return len(rows)
+
+
+def parse_clusters_query(args):
+    """Turn /players/clusters query parameters into (group_by, precision).
+
+    Raises ValueError with a message suitable for a 400 response.
+    """
+    group_by = args.get('by', 'geohash')
+    if group_by not in GROUPINGS:
+        raise ValueError(f"'by' must be one of {', '.join(GROUPINGS)}")
+    if group_by != 'geohash':
+        return group_by, 0
+
+    try:
+        zoom = int(args.get('zoom', 0))
+    except ValueError:
+        raise ValueError("'zoom' must be an integer")
+    # Zooming past the finest precision keeps the finest cells
+    return group_by, ZOOM_PRECISION[max(0, min(zoom, len(ZOOM_PRECISION) - 1))]
+
+
+def clusters_payload(rows):
+    return [{
+        'key': row['cluster_key'],
+        'label': row['label'],
+        'count': row['player_count'],
+        'lat': row['lat'],
+        'lng': row['lng'],
+        'top_players': json.loads(row['top_players']),
+        'filters': json.loads(row['filters']),
+    } for row in rows]
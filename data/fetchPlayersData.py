@@ -3,106 +3,394 @@ import sqlite3
 import logging
 from datetime import datetime
 import os
+import sys
 import json
+import time
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Shared modules (geocoding, ...) live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geocoding import GeocodeCache
+from football_api import FOOTBALL_API_BASE_URL, api_headers, daily_calls_used
+from http_client import DEFAULT_TIMEOUT, get_session
+from rate_limiter import TokenBucket
+from repository import DEFAULT_DB_PATH, PlayerRepository
+from shared_cache import QuotaExceededError, quota_ledger
+from clusters import refresh_clusters
+from leaderboards import refresh_leaderboards
+from metrics import TRACKER_EVENTS, TRACKER_PAGE_DURATION, TRACKER_RUN_DURATION
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='israeli_football_tracker.log'
+PLAYERS_URL = f"{FOOTBALL_API_BASE_URL}/players"
+STATUS_URL = f"{FOOTBALL_API_BASE_URL}/status"
+
+# Leagues and seasons to crawl, e.g. TRACKER_LEAGUES=271,39,78 TRACKER_SEASONS=2023,2024
+DEFAULT_LEAGUES = os.getenv('TRACKER_LEAGUES', '271').split(',')
+DEFAULT_SEASONS = os.getenv('TRACKER_SEASONS', '2023').split(',')
+
+# Pages fetched in parallel, and the request budget they share (requests per second)
+CRAWL_WORKERS = 4
+FOOTBALL_API_RATE_LIMIT = float(os.getenv('FOOTBALL_API_RATE_LIMIT', '1'))
+
+# Raw API pages are cached on disk so re-runs and development iterations don't hit RapidAPI
+API_CACHE_DIR = os.getenv('TRACKER_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_cache'))
+API_CACHE_MAX_AGE = int(os.getenv('TRACKER_CACHE_MAX_AGE', str(6 * 60 * 60)))  # seconds, 0 disables
+
+# Fields that make up a player's stats payload; the row is only rewritten when one of them changes
+HASHED_FIELDS = (
+    "name", "date_of_birth", "team", "country", "league", "city", "games_played", "goals", "assists",
+    "position", "player_number", "image"
 )
 
 class IsraeliFootballTracker:
-    def __init__(self, db_path='israeli_football.db'):
+    def __init__(self, db_path=DEFAULT_DB_PATH, leagues=None, seasons=None):
+        # Same database file and schema as the web app (see repository.py)
         self.db_path = db_path
-        self.conn = None
+        self.repo = PlayerRepository(db_path)
+        self.leagues = [str(league).strip() for league in (leagues or DEFAULT_LEAGUES)]
+        self.seasons = [str(season).strip() for season in (seasons or DEFAULT_SEASONS)]
+        self.api_limiter = TokenBucket(FOOTBALL_API_RATE_LIMIT)
+        self.run_stats = {}
+        self._stats_lock = threading.Lock()
         # API Key
         self.football_api_key = os.getenv('FOOTBALL_API_KEY')
         if not self.football_api_key:
             logging.warning("No FOOTBALL_API_KEY found in environment variables")
             print("WARNING: No FOOTBALL_API_KEY found in environment variables")
         
+        self.geocode_cache = GeocodeCache(self.db_path, api_key=os.getenv('OPENCAGE_API_KEY'))
         self.setup_database()
         
     def setup_database(self):
-        """Create database and tables if they don't exist"""
+        """Create database and tables if they don't exist, or upgrade an older tracker database"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            cursor = self.conn.cursor()
-            
-            # Create football players table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS football_players (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                date_of_birth Date,
-                team TEXT,
-                country TEXT,
-                city TEXT,
-                games_played INTEGER,
-                goals INTEGER,
-                assists INTEGER,
-                position TEXT,
-                player_id TEXT,
-                last_updated TIMESTAMP
-            )
-            ''')
-            
-            self.conn.commit()
+            self.repo.ensure_schema()
+            self.geocode_cache.setup_database()
             logging.info("Database setup complete")
         except sqlite3.Error as e:
             logging.error(f"Database error: {e}")
-            if self.conn:
-                self.conn.close()
+            self.repo.close()
             raise
     
     def test_api_connection(self):
-        """Test if the API is working with a simple request"""
+        """Check the key and today's usage with API-Football's /status, which doesn't count against the quota"""
         if not self.football_api_key:
             print("No API key available for testing")
             return False
         
         try:
-            # Test with a simple leagues endpoint
-            test_url = "https://api-football-v1.p.rapidapi.com/v3/leagues"
-            headers = {
-                "X-RapidAPI-Key": self.football_api_key,
-                "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"
-            }
-            
-            test_response = requests.get(test_url, headers=headers)
+            # Through the shared session, so it is timed and can be recorded/replayed like every other call
+            test_response = get_session().get(STATUS_URL, headers=api_headers(self.football_api_key),
+                                              timeout=DEFAULT_TIMEOUT)
             print(f"Test API response status code: {test_response.status_code}")
             
-            if test_response.status_code == 200:
-                # Print first few leagues to verify data
-                data = test_response.json()
-                if 'response' in data and len(data['response']) > 0:
-                    print(f"API working properly. Found {len(data['response'])} leagues.")
-                    print("Sample league:", data['response'][0]['league']['name'])
-                    return True
-                else:
-                    print("API responded but no leagues data found.")
-                    return False
-            else:
+            if test_response.status_code != 200:
                 print(f"API test failed with status code: {test_response.status_code}")
                 return False
+
+            data = test_response.json()
+            if data.get('errors'):
+                # A bad key or plan still answers 200, with the reason in 'errors'
+                print(f"API test failed: {data['errors']}")
+                return False
+            requests_today = (data.get('response') or {}).get('requests') or {}
+            if 'current' in requests_today:
+                print(f"API working properly. {requests_today['current']} of {requests_today.get('limit_day')} "
+                      f"requests used today.")
+                # Calls made with this key elsewhere count too
+                quota_ledger.sync('rapidapi', requests_today['current'])
+            else:
+                print("API working properly.")
+            return True
                 
         except Exception as e:
             print(f"API test error: {e}")
             return False
     
+    def count(self, key, amount=1):
+        """Add to a run summary counter (pages are fetched from several threads)"""
+        with self._stats_lock:
+            self.run_stats[key] = self.run_stats.get(key, 0) + amount
+        TRACKER_EVENTS.inc(amount, event=key)
+
+    def cache_path(self, params):
+        """Disk cache file for an API request, keyed by its parameters"""
+        key = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(API_CACHE_DIR, f"{key}.json")
+
+    def read_cached_page(self, params):
+        """Return a cached API page younger than API_CACHE_MAX_AGE, or None"""
+        path = self.cache_path(params)
+        try:
+            if time.time() - os.path.getmtime(path) > API_CACHE_MAX_AGE:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_cached_page(self, params, data):
+        os.makedirs(API_CACHE_DIR, exist_ok=True)
+        path = self.cache_path(params)
+        # Write to a temp file first so a crash never leaves a truncated page behind
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def fetch_page(self, league, season, page):
+        """Fetch one page of the /players endpoint for a league season"""
+        params = {"league": str(league), "season": str(season), "page": page}
+        if API_CACHE_MAX_AGE > 0:
+            with TRACKER_PAGE_DURATION.time(step='fetch_cached'):
+                data = self.read_cached_page(params)
+            if data is not None:
+                self.count("pages_cached")
+                return data
+
+        # The daily budget is shared with the web workers; raises QuotaExceededError once it is spent
+        quota_ledger.acquire('rapidapi')
+        self.api_limiter.acquire()  # Waiting for the rate budget is not part of the fetch time
+        with TRACKER_PAGE_DURATION.time(step='fetch_api'):
+            response = get_session().get(
+                PLAYERS_URL,
+                headers=api_headers(self.football_api_key),
+                params=params,
+                timeout=DEFAULT_TIMEOUT
+            )
+        # RapidAPI's own count includes calls made elsewhere with the same key
+        used = daily_calls_used(response.headers)
+        if used is not None:
+            quota_ledger.sync('rapidapi', used)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"API returned status code {response.status_code} for league {league}, season {season}, page {page}"
+            )
+        # Decoded whole on purpose: the pipeline bounds memory by pages in flight (CRAWL_WORKERS), and
+        # API-Football caps a page at a few dozen entries, so a streaming parser (ijson over
+        # response.raw) would not lower the peak. The page is also written whole to the disk cache.
+        data = response.json()
+        self.count("pages_fetched")
+        if API_CACHE_MAX_AGE > 0:
+            self.write_cached_page(params, data)
+        return data
+
+    def israeli_abroad(self, entries, debug=False):
+        """Filter stage: yield (entry, stat) for each Israeli player with a team outside Israel"""
+        for player_data in entries:
+            # The API can't filter by nationality together with a league, so filter here
+            if player_data.get('player', {}).get('nationality') != "Israel":
+                continue
+
+            if debug:
+                print(f"\nProcessing player: {player_data['player']['name']}")
+            
+            # Check if player has statistics
+            if 'statistics' not in player_data or not player_data['statistics']:
+                if debug:
+                    print(f"No statistics found for {player_data['player']['name']}")
+                continue
+            
+            # Check if player plays outside Israel
+            for stat in player_data['statistics']:
+                if 'team' not in stat or 'country' not in stat['team']:
+                    if debug:
+                        print(f"Missing team or country data for {player_data['player']['name']}")
+                    continue
+                    
+                team_country = stat['team']['country']
+                if debug:
+                    print(f"Player's team country: {team_country}")
+                    
+                if team_country.lower() != 'israel':
+                    if debug:
+                        print(f"Found player outside Israel: {player_data['player']['name']} in {team_country}")
+                    yield player_data, stat
+                    break  # Found a team outside Israel, no need to check more statistics
+
+    def normalize_player(self, player_data, stat):
+        """Normalize stage: one API entry and its team's statistics -> a football_players row"""
+        # Get city info (not always available)
+        city = "Unknown"
+        if 'city' in stat['team']:
+            city = stat['team']['city']
+            
+        # Get games played
+        games_played = 0
+        if 'games' in stat and 'appearences' in stat['games']:
+            games_played = stat['games']['appearences'] or 0
+            
+        # Get goals
+        goals = 0
+        if 'goals' in stat and 'total' in stat['goals']:
+            goals = stat['goals']['total'] or 0
+            
+        # Get assists
+        assists = 0
+        if 'goals' in stat and 'assists' in stat['goals']:
+            assists = stat['goals']['assists'] or 0
+        
+        # Shirt number (not always available)
+        player_number = 0
+        if 'games' in stat and 'number' in stat['games']:
+            player_number = stat['games']['number'] or 0
+
+        return {
+            "name": player_data['player']['name'],
+            "date_of_birth": (player_data['player'].get('birth') or {}).get('date') or "",
+            "team": stat['team']['name'],
+            "country": stat['team']['country'],
+            "league": (stat.get('league') or {}).get('name'),
+            "city": city or "Unknown",
+            "games_played": games_played,
+            "goals": goals,
+            "assists": assists,
+            "position": player_data['player']['position'] or "",
+            "player_number": player_number,
+            "image": player_data['player'].get('photo'),
+            "player_id": str(player_data['player']['id'])
+        }
+
+    def extract_abroad_players(self, data, debug=False):
+        """Pick the Israeli players on a page whose team plays outside Israel"""
+        return [self.normalize_player(player_data, stat)
+                for player_data, stat in self.israeli_abroad(data.get('response') or [], debug)]
+
+    def stats_hash(self, player):
+        """Hash of a player's normalized stats payload"""
+        payload = json.dumps([player[field] for field in HASHED_FIELDS], separators=(",", ":"))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def save_players(self, players, checkpoint=None):
+        """Insert new players and update changed ones in one transaction; unchanged rows are not touched.
+
+        `checkpoint` is an optional (league, season, page, total_pages) saved in the same transaction.
+        """
+        self.count("fetched", len(players))
+
+        # Split the page into new, changed and unchanged players with a single indexed query
+        existing = self.repo.existing_hashes(player["player_id"] for player in players)
+        new_players, changed_players = [], []
+        for player in players:
+            player["stats_hash"] = self.stats_hash(player)
+            if player["player_id"] not in existing:
+                new_players.append(player)
+            elif existing[player["player_id"]] != player["stats_hash"]:
+                changed_players.append(player)
+        self.count("inserted", len(new_players))
+        self.count("updated", len(changed_players))
+        self.count("unchanged", len(players) - len(new_players) - len(changed_players))
+
+        # Store coordinates with each player so the web app never geocodes on a request.
+        # New cities are resolved concurrently first, so the loop below reads from the cache.
+        rows = new_players + changed_players
+        self.geocode_cache.warm((player["city"], player["country"]) for player in rows)
+        now = datetime.now()
+        for player in rows:
+            player["lat"], player["lng"] = self.lookup_coordinates(player["city"], player["country"])
+            player["last_updated"] = now  # Only moves on real changes
+
+        # Geocoding is done before the transaction so the write lock is held as briefly as possible
+        with self.repo.transaction() as conn:
+            self.repo.upsert_players(conn, rows)
+            self.repo.append_stats_history(conn, rows)  # The history behind leaderboard trends
+            if checkpoint:
+                self.repo.save_checkpoint(conn, *checkpoint, updated_at=now)
+
+    def store_page(self, league, season, page, total_pages, data, debug=False):
+        """Write stage: save a page's players and advance the checkpoint in one transaction.
+
+        Returns how many Israeli players abroad the page had.
+        """
+        with TRACKER_PAGE_DURATION.time(step='store'):
+            players = self.extract_abroad_players(data, debug)
+            self.save_players(players, checkpoint=(league, season, page, total_pages))
+        if debug:
+            print(f"League {league}, season {season}: page {page}/{total_pages}, {len(players)} Israeli players abroad")
+        return len(players)
+
+    def iter_pages(self, league, season, debug=False):
+        """Fetch stage: yield (page, total_pages, data) for a league season in page order, after its checkpoint.
+
+        Pages are fetched concurrently (within the rate budget), but at most CRAWL_WORKERS ahead of
+        the page being stored, so memory stays flat however many pages a league has.
+        """
+        checkpoint = self.repo.get_checkpoint(league, season)
+        if checkpoint and checkpoint[2]:
+            if debug:
+                print(f"League {league}, season {season} already crawled in this pass, skipping")
+            return
+
+        if checkpoint:
+            last_page, total_pages = checkpoint[0], checkpoint[1]
+        else:
+            # The first page tells us how many pages there are
+            data = self.fetch_page(league, season, 1)
+            last_page, total_pages = 1, max(1, data.get('paging', {}).get('total', 1))
+            yield 1, total_pages, data
+
+        pages = iter(range(last_page + 1, total_pages + 1))
+        executor = ThreadPoolExecutor(max_workers=CRAWL_WORKERS)
+        in_flight = deque()
+
+        def submit_next():
+            page = next(pages, None)
+            if page is not None:
+                in_flight.append((page, executor.submit(self.fetch_page, league, season, page)))
+
+        try:
+            for _ in range(CRAWL_WORKERS):
+                submit_next()
+            while in_flight:
+                page, future = in_flight.popleft()
+                data = future.result()
+                submit_next()  # Keep the workers busy while this page is stored
+                yield page, total_pages, data
+        finally:
+            # After a failed page (or a stopped crawl), don't spend quota on pages that were only queued
+            executor.shutdown(cancel_futures=True)
+
+    def crawl_league(self, league, season, debug=False):
+        """Walk every page of a league season, resuming after the last checkpointed page.
+
+        Pages are stored in order, so the checkpoint always points at the last page that is fully
+        in the database. Returns how many Israeli players abroad were stored.
+        """
+        stored = 0
+        for page, total_pages, data in self.iter_pages(league, season, debug):
+            stored += self.store_page(league, season, page, total_pages, data, debug)
+        return stored
+
+    def crawl(self, debug=False):
+        """Crawl every configured league and season. An interrupted run resumes where it stopped."""
+        stored = 0
+        for league in self.leagues:
+            for season in self.seasons:
+                logging.info(f"Crawling league {league}, season {season}")
+                stored += self.crawl_league(league, season, debug)
+
+        # Every league is done: the next run starts a fresh pass
+        self.repo.clear_checkpoints()
+        return stored
+
     def fetch_football_players(self, debug=True):
-        """Fetch Israeli football players playing internationally using API-Football"""
+        """Fetch Israeli football players playing internationally using API-Football.
+
+        Players are written page by page as they stream in and nothing is kept in memory;
+        returns how many were stored (including the pages stored before an error).
+        """
         logging.info("Fetching football players data from API")
         
         if not self.football_api_key:
             logging.error("Missing API key for football data")
             print("ERROR: Missing API key for football data")
-            return []
+            return 0
         
         # Test API connection first
         if debug:
@@ -111,201 +399,84 @@ class IsraeliFootballTracker:
             if not connection_ok:
                 print("API connection test failed. Continuing anyway...")
             
-        players = []
+        self.run_stats = {key: 0 for key in ("pages_fetched", "pages_cached", "fetched", "unchanged", "updated", "inserted")}
+        started = time.perf_counter()
         
         try:
-           # API-Football (from RapidAPI)
-            url = "https://api-football-v1.p.rapidapi.com/v3/players"
-
-            # You need to include a season parameter and likely a league parameter
-            querystring = {
-                "season": "2023",  # Current or recent season
-                "league": "271"    # Example: Premier League ID - you'll need to use leagues relevant to you
-            }
-
-            headers = {
-                "X-RapidAPI-Key": self.football_api_key,
-                "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"
-            }
-
-            print("\nFetching players data...")
-            response = requests.get(url, headers=headers, params=querystring)
-
-            # Then filter for Israeli players in your code
-            israeli_players = []
-            if response.status_code == 200:
-                data = response.json()
-                for player in data.get('response', []):
-                    if player.get('player', {}).get('nationality') == "Israel":
-                        israeli_players.append(player)
-                        
-            print(f"Found {len(israeli_players)} Israeli players")
-            
-            # Debug information
-            if debug:
-                print(f"API Response Status Code: {response.status_code}")
-                print(f"API Response Headers: {dict(response.headers)}")
-                print(f"Response data preview: {response.text[:500]}...")  # Print first 500 chars
-            
-            # Check if response is valid
-            if response.status_code != 200:
-                print(f"Error: API returned status code {response.status_code}")
-                logging.error(f"API returned error status code: {response.status_code}")
-                return []
-            
-            try:
-                data = response.json()
-            except json.JSONDecodeError:
-                print("Error: Could not parse API response as JSON")
-                logging.error("Failed to parse API response as JSON")
-                return []
-            
-            # Debug information about the response structure
-            if debug:
-                print("\nAPI Response Structure:")
-                if 'response' in data:
-                    print(f"Number of players in response: {len(data['response'])}")
-                    if len(data['response']) > 0:
-                        print(f"First player: {data['response'][0]['player']['name']}")
-                else:
-                    print("No 'response' key found in API data")
-                    print(f"Available keys in response: {data.keys()}")
-            
-            # Process the player data
-            if 'response' in data:
-                for player_data in data['response']:
-                    if debug:
-                        print(f"\nProcessing player: {player_data['player']['name']}")
-                    
-                    # Check if player has statistics
-                    if 'statistics' not in player_data or not player_data['statistics']:
-                        if debug:
-                            print(f"No statistics found for {player_data['player']['name']}")
-                        continue
-                    
-                    # Check if player plays outside Israel
-                    for stat in player_data['statistics']:
-                        if 'team' not in stat or 'country' not in stat['team']:
-                            if debug:
-                                print(f"Missing team or country data for {player_data['player']['name']}")
-                            continue
-                            
-                        team_country = stat['team']['country']
-                        if debug:
-                            print(f"Player's team country: {team_country}")
-                            
-                        if team_country.lower() != 'israel':
-                            if debug:
-                                print(f"Found player outside Israel: {player_data['player']['name']} in {team_country}")
-                            
-                            # Get city info (not always available)
-                            city = "Unknown"
-                            if 'city' in stat['team']:
-                                city = stat['team']['city']
-                                
-                            # Get games played
-                            games_played = 0
-                            if 'games' in stat and 'appearences' in stat['games']:
-                                games_played = stat['games']['appearences'] or 0
-                                
-                            # Get goals
-                            goals = 0
-                            if 'goals' in stat and 'total' in stat['goals']:
-                                goals = stat['goals']['total'] or 0
-                                
-                            # Get assists
-                            assists = 0
-                            if 'goals' in stat and 'assists' in stat['goals']:
-                                assists = stat['goals']['assists'] or 0
-                            
-                            player = {
-                                "name": player_data['player']['name'],
-                                "age": player_data['player']['age'],
-                                "team": stat['team']['name'],
-                                "country": team_country,
-                                "city": city,
-                                "games_played": games_played,
-                                "goals": goals,
-                                "assists": assists,
-                                "position": player_data['player']['position'],
-                                "player_id": str(player_data['player']['id'])
-                            }
-                            players.append(player)
-                            break  # Found a team outside Israel, no need to check more statistics
-            
-            # Debug information about players found
+            print(f"\nCrawling leagues {', '.join(self.leagues)} for seasons {', '.join(self.seasons)}...")
+            stored = self.crawl(debug)
             if debug:
-                print(f"\nFound {len(players)} Israeli players playing abroad")
-                for i, p in enumerate(players):
-                    print(f"{i+1}. {p['name']} - {p['team']} ({p['country']})")
-            
-            # If no players found, try an alternative approach
-            if len(players) == 0 and debug:
-                print("\nNo players found with initial query. Trying without season parameter...")
-                alt_querystring = {"nationality": "Israel"}
-                alt_response = requests.get(url, headers=headers, params=alt_querystring)
-                
-                if alt_response.status_code == 200:
-                    alt_data = alt_response.json()
-                    if 'response' in alt_data:
-                        print(f"Alternative query returned {len(alt_data['response'])} players")
-                
-            # Add players to database
-            cursor = self.conn.cursor()
-            for player in players:
-                # Check if player already exists
-                cursor.execute("SELECT id FROM football_players WHERE player_id = ?", (player["player_id"],))
-                existing_player = cursor.fetchone()
-                
-                if existing_player:
-                    # Update existing player
-                    cursor.execute('''
-                    UPDATE football_players SET 
-                    name=?, age=?, team=?, country=?, city=?, games_played=?, goals=?, 
-                    assists=?, position=?, last_updated=?
-                    WHERE player_id=?
-                    ''', (
-                        player["name"], player["age"], player["team"], player["country"], 
-                        player["city"], player["games_played"], player["goals"], 
-                        player["assists"], player["position"], datetime.now(), player["player_id"]
-                    ))
-                else:
-                    # Insert new player
-                    cursor.execute('''
-                    INSERT INTO football_players 
-                    (name, age, team, country, city, games_played, goals, assists, position, player_id, last_updated)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        player["name"], player["age"], player["team"], player["country"], 
-                        player["city"], player["games_played"], player["goals"], 
-                        player["assists"], player["position"], player["player_id"], datetime.now()
-                    ))
+                print(f"\nFound {stored} Israeli players playing abroad")
             
-            self.conn.commit()
-            logging.info(f"Added/updated {len(players)} football players in database")
-        
         except requests.exceptions.RequestException as e:
+            # Pages stored so far are kept; the next run resumes from the checkpoint
             logging.error(f"API request error: {e}")
             print(f"API request error: {e}")
+        except QuotaExceededError as e:
+            # Same as above: stop for today and resume from the checkpoint tomorrow
+            logging.warning(f"Stopping crawl: {e}")
+            print(f"Stopping crawl: {e}")
         except Exception as e:
             logging.error(f"Error processing football data: {e}")
             print(f"Error processing football data: {e}")
             import traceback
             print(traceback.format_exc())
+
+        # Logged even after an error: the pages stored before it are already in the database
+        duration = time.perf_counter() - started
+        TRACKER_RUN_DURATION.observe(duration)
+        summary = ", ".join(f"{key}={value}" for key, value in self.run_stats.items()) + f", seconds={duration:.1f}"
+        logging.info(f"Run summary: {summary}")
+        print(f"\nRun summary: {summary}")
             
-        return players
+        return self.run_stats["fetched"]
     
+    def lookup_coordinates(self, city, country=None):
+        """Get (lat, lng) for a club's city from the geocode cache, or (None, None) if unknown"""
+        try:
+            coords = self.geocode_cache.resolve(city, country)
+        except Exception as e:
+            logging.error(f"Geocoding failed for {city}: {e}")
+            coords = None
+        return coords if coords else (None, None)
+
+    def refresh_clusters(self):
+        """Rebuild the globe's precomputed player clusters from the stored players"""
+        try:
+            count = refresh_clusters(self.repo, geocode=self.lookup_coordinates)
+        except Exception as e:
+            logging.error(f"Cluster refresh failed: {e}")
+            return 0
+        logging.info(f"Rebuilt {count} player clusters")
+        return count
+
+    def refresh_leaderboards(self):
+        """Rebuild the precomputed leaderboards from the stored players and their stats history"""
+        try:
+            count = refresh_leaderboards(self.repo)
+        except Exception as e:
+            logging.error(f"Leaderboard refresh failed: {e}")
+            return 0
+        logging.info(f"Rebuilt {count} leaderboard rows")
+        return count
+
+    def warm_geocode_cache(self):
+        """Resolve every distinct player city once so the web app never geocodes on a request"""
+        try:
+            return self.geocode_cache.warm_from_players()
+        except Exception as e:
+            logging.error(f"Geocode warm-up failed: {e}")
+            print(f"Geocode warm-up failed: {e}")
+            return 0
+
     def query_football_players(self):
         """Query all football players in the database"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM football_players")
-        return cursor.fetchall()
+        return self.repo.fetch_players()
     
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
-            logging.info("Database connection closed")
+        """Close the database connections"""
+        self.repo.close()
+        logging.info("Database connection closed")
 
 def main():
     try:
@@ -314,10 +485,19 @@ def main():
         
         # Fetch and store data
         print("Fetching Israeli football players data...")
-        football_players = tracker.fetch_football_players(debug=True)
+        stored = tracker.fetch_football_players(debug=True)
         
         # Display some info about the data collected
-        print(f"\nCollected data for {len(football_players)} Israeli football players abroad")
+        print(f"\nCollected data for {stored} Israeli football players abroad")
+
+        # Geocode new cities now instead of on the first /players request
+        looked_up = tracker.warm_geocode_cache()
+        print(f"Geocode cache warmed ({looked_up} cities looked up)")
+
+        # Precompute the globe's clusters so /players/clusters stays a single indexed read
+        print(f"Rebuilt {tracker.refresh_clusters()} player clusters")
+        # Same for the leaderboards (/players/leaderboards)
+        print(f"Rebuilt {tracker.refresh_leaderboards()} leaderboard rows")
         
         # Query and display data
         all_football = tracker.query_football_players()
@@ -327,7 +507,7 @@ def main():
         if len(all_football) > 0:
             print("\nFootball Players:")
             for i, player in enumerate(all_football):
-                print(f"{i+1}. {player[1]} - {player[3]} ({player[4]}, {player[5]}) - {player[6]} games, {player[7]} goals, {player[8]} assists")
+                print(f"{i+1}. {player['name']} - {player['team']} ({player['country']}, {player['city']}) - {player['games_played']} games, {player['goals']} goals, {player['assists']} assists")
         else:
             print("\nNo players found in the database.")
             print("\nTroubleshooting tips:")
@@ -347,4 +527,11 @@ def main():
             tracker.close()
 
 if __name__ == "__main__":
+    # Set up logging; only when run as a script, so importing the tracker (the web app's scheduler
+    # does) leaves the importing process's logging alone
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='israeli_football_tracker.log'
+    )
     main()
\ No newline at end of file
@@ -1,25 +1,28 @@
-import requests
+import os
+import sys
+
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
 
+from football_api import FootballApi
+from repository import DEFAULT_DB_PATH
+
+FOOTBALL_API_KEY = os.getenv('FOOTBALL_API_KEY')
 
-FOOTBALL_API_KEY = "YOUR_RAPIDAPI_KEY"
-HEADERS = {
-    "X-RapidAPI-Key": FOOTBALL_API_KEY,
-    "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"
-}
 
-def get_team_list(league_id, season):
-    url = "https://api-football-v1.p.rapidapi.com/v3/teams"
-    params = {"league": league_id, "season": season}
+def index_team_list(league_id, season):
+    """Store every team of a league in the team index used by /next_games."""
+    api = FootballApi(FOOTBALL_API_KEY, DEFAULT_DB_PATH)  # DATABASE_PATH, like the apps and the tracker
+    api.team_index.setup_database()  # Also created by `flask init-db`; this script may run before it
+    count = api.index_league_teams(league_id, season)
+    print(f"Indexed {count} teams for league {league_id}, season {season}")
+    return count
 
-    response = requests.get(url, headers=HEADERS, params=params)
-    data = response.json()
-    print(data)
-    if "response" in data:
-        for team in data["response"]:
-            print(f"Team ID: {team['team']['id']} | Name: {team['team']['name']}")
 
-# Example: Bundesliga (Germany) league ID is 78, season 2024
-get_team_list(78, "2024")
+if __name__ == '__main__':
+    # Example: Bundesliga (Germany) league ID is 78, season 2024
+    # Usage: python "find team id.py" [league_id] [season]
+    league_id = sys.argv[1] if len(sys.argv) > 1 else 78
+    season = sys.argv[2] if len(sys.argv) > 2 else "2024"
+    index_team_list(league_id, season)
@@ -0,0 +1,406 @@
+import asyncio
+import os
+import sqlite3
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from http_client import DEFAULT_TIMEOUT, get_session
+from metrics import CACHE_REQUESTS
+from shared_cache import QuotaExceededError, quota_ledger
+from upstream import AsyncSingleFlight, CircuitOpenError, SingleFlight, UpstreamCache, rapidapi_breaker
+
+FOOTBALL_API_HOST = "api-football-v1.p.rapidapi.com"
+FOOTBALL_API_BASE_URL = os.getenv('FOOTBALL_API_BASE_URL', f"https://{FOOTBALL_API_HOST}/v3")
+
+# Fixtures only change a few times a day; a team's photo practically never does
+FIXTURES_TTL_SECONDS = 3 * 60 * 60
+TEAM_PHOTO_TTL_SECONDS = 24 * 60 * 60
+
+# How long old values are still served while refreshing, or while RapidAPI is failing
+FIXTURES_STALE_SECONDS = 24 * 60 * 60
+TEAM_PHOTO_STALE_SECONDS = 7 * 24 * 60 * 60
+
+# Number of upcoming fixtures shown per team
+NEXT_GAMES = 2
+
+
+class FootballApiError(Exception):
+    """An upstream failure that maps directly onto an HTTP error response."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def is_upstream_failure(status_code):
+    """Statuses that mean RapidAPI is struggling (as opposed to a bad request)."""
+    return status_code == 429 or status_code >= 500
+
+
+def daily_calls_used(headers):
+    """Today's calls as RapidAPI counts them (X-RateLimit-Requests-Limit minus -Remaining), or None."""
+    try:
+        return int(headers['x-ratelimit-requests-limit']) - int(headers['x-ratelimit-requests-remaining'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def normalize_team_name(name):
+    """Normalize a team name into the key used by the team index."""
+    return ' '.join(name.split()).casefold()
+
+
+def api_headers(api_key):
+    return {
+        "X-RapidAPI-Key": api_key,
+        "X-RapidAPI-Host": FOOTBALL_API_HOST
+    }
+
+
+def is_mens_team(team_name):
+    """The teams search also returns women's sides; skip anything that looks like one."""
+    team_name_clean = team_name.lower()
+    return "women" not in team_name_clean and "w" not in team_name_clean
+
+
+def select_team(team_data):
+    """Pick the men's team from a /teams search response. Returns (team_id, team_name)."""
+    if not team_data["response"]:
+        raise FootballApiError("No team found with that name", 404)
+
+    selected_team = next((team for team in team_data["response"] if is_mens_team(team["team"]["name"])), None)
+    if not selected_team:
+        raise FootballApiError("Only women's team found, no men's team available", 404)
+
+    return selected_team["team"]["id"], selected_team["team"]["name"]
+
+
+def team_photo_from(players_data):
+    """The photo of the first player listed for a team ("" if there is none)."""
+    return players_data["response"][0]["player"]["photo"] if players_data["response"] else ""
+
+
+def fixture_team_ids(fixtures):
+    """Distinct home and away team IDs of a list of fixtures."""
+    team_ids = []
+    for match in fixtures:
+        team_ids += [match["teams"]["home"]["id"], match["teams"]["away"]["id"]]
+    return list(dict.fromkeys(team_ids))
+
+
+def fixture_summary(fixtures):
+    """What /next_games shows of each fixture (minus photos); also what fixture change events compare."""
+    return [{
+        "league": match["league"]["name"],
+        "home_team": match["teams"]["home"]["name"],
+        "away_team": match["teams"]["away"]["name"],
+        "date": match["fixture"]["date"],
+    } for match in fixtures]
+
+
+def format_next_games(team_name, fixtures, player_images):
+    """Build the /next_games payload from fixtures and a {team_id: photo} map."""
+    upcoming_games = []
+    for match, game in zip(fixtures, fixture_summary(fixtures)):
+        game["home_image"] = player_images.get(match["teams"]["home"]["id"], "")  # Get home team image
+        game["away_image"] = player_images.get(match["teams"]["away"]["id"], "")  # Get away team image
+        upcoming_games.append(game)
+    return {"team_name": team_name, "next_games": upcoming_games}
+
+
+class TeamIndex:
+    """Persistent team name -> API-Football team ID map (team IDs never change)."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def setup_database(self):
+        """Create the team index table if it doesn't exist"""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS team_index (
+                name_key TEXT PRIMARY KEY,
+                team_id INTEGER NOT NULL,
+                team_name TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+            conn.commit()
+
+    def get(self, name):
+        """Return (team_id, team_name) for a name we have seen before, or None."""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT team_id, team_name FROM team_index WHERE name_key = ?", (normalize_team_name(name),)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def store_many(self, entries):
+        """Save (lookup name, team_id, team_name) tuples."""
+        now = time.time()
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO team_index (name_key, team_id, team_name, updated_at)
+            VALUES (?, ?, ?, ?)
+            ''', [(normalize_team_name(name), team_id, team_name, now) for name, team_id, team_name in entries])
+            conn.commit()
+
+    def store(self, name, team_id, team_name):
+        self.store_many([(name, team_id, team_name)])
+
+
+class FootballApi:
+    """API-Football client for the /next_games endpoint, with caching in front of every call."""
+
+    def __init__(self, api_key, db_path, base_url=FOOTBALL_API_BASE_URL, shared_cache=None, ledger=quota_ledger,
+                 events=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ledger = ledger  # Daily RapidAPI budget shared with the other workers and the tracker
+        self.events = events  # live_events.LiveEvents, told when a team's fixtures change
+        # Team IDs are persisted in the database, so every worker already shares them
+        self.team_index = TeamIndex(db_path)
+        self.fixtures_cache = UpstreamCache(
+            FIXTURES_TTL_SECONDS, FIXTURES_STALE_SECONDS, shared=shared_cache, namespace='fixtures'
+        )
+        self.photo_cache = UpstreamCache(
+            TEAM_PHOTO_TTL_SECONDS, TEAM_PHOTO_STALE_SECONDS, shared=shared_cache, namespace='team_photo'
+        )
+        self._team_searches = SingleFlight()
+
+    def _reserve_call(self):
+        """Check the breaker and draw one call from the daily quota, or raise FootballApiError."""
+        try:
+            rapidapi_breaker.check()
+        except CircuitOpenError:
+            raise FootballApiError("Football data is temporarily unavailable", 503)
+        try:
+            self.ledger.acquire('rapidapi')
+        except QuotaExceededError as e:
+            logging.warning(str(e))
+            raise FootballApiError("Daily football data quota reached, try again tomorrow", 429)
+
+    def _observe_quota(self, headers):
+        # Calls made elsewhere with the same key count too: keep the shared ledger at least as high
+        used = daily_calls_used(headers)
+        if used is not None:
+            self.ledger.sync('rapidapi', used)
+
+    def _get(self, endpoint, params):
+        return get_session().get(
+            f"{self.base_url}/{endpoint}", headers=api_headers(self.api_key), params=params, timeout=DEFAULT_TIMEOUT
+        )
+
+    def _get_json(self, endpoint, params, error_message):
+        """GET an endpoint through the circuit breaker and quota; anything but a 200 raises FootballApiError."""
+        import requests  # Needed by the shared session anyway (see http_client)
+
+        self._reserve_call()
+        try:
+            response = self._get(endpoint, params)
+        except requests.exceptions.RequestException as e:
+            rapidapi_breaker.record_failure()
+            logging.error(f"RapidAPI request to {endpoint} failed: {e}")
+            raise FootballApiError(error_message, 502)
+
+        self._observe_quota(response.headers)
+        if is_upstream_failure(response.status_code):
+            rapidapi_breaker.record_failure()
+        else:
+            rapidapi_breaker.record_success()
+        if response.status_code != 200:
+            raise FootballApiError(error_message, response.status_code)
+        return response.json()
+
+    def find_team(self, team_name):
+        """Return (team_id, team_name), searching the API only for names not in the index."""
+        cached = self.team_index.get(team_name)
+        if cached:
+            return cached
+
+        def search():
+            team_data = self._get_json("teams", {"search": team_name}, "Failed to fetch team data")
+            team_id, selected_name = select_team(team_data)
+            self.team_index.store(team_name, team_id, selected_name)
+            return team_id, selected_name
+
+        # Many visitors clicking the same player at once share a single search
+        return self._team_searches.do(normalize_team_name(team_name), search)
+
+    def _load_fixtures(self, team_id, team_name=None):
+        fixtures = self._get_json(
+            "fixtures", {"team": str(team_id), "next": str(NEXT_GAMES)}, "Failed to fetch fixtures"
+        )["response"]
+        self.record_fixture_change(team_id, team_name, fixtures)
+        return fixtures
+
+    def record_fixture_change(self, team_id, team_name, fixtures):
+        """Log a fixtures event when a reload differs from the cached fixtures (a first load is no change)."""
+        previous = self.fixtures_cache.get(team_id)
+        if self.events is None or previous is None:
+            return
+        next_games = fixture_summary(fixtures)
+        if next_games == fixture_summary(previous):
+            return
+        try:
+            self.events.record_fixtures(team_name, team_id, next_games)
+        except Exception as e:
+            logging.warning(f"Recording the fixture change of team {team_id} failed: {e}")
+
+    def _load_team_photo(self, team_id):
+        return team_photo_from(self._get_json("players", {"team": team_id}, "Failed to fetch players"))
+
+    def get_fixtures(self, team_id, team_name=None):
+        """Return the team's next fixtures, cached for a few hours and served stale while refreshing."""
+        return self.fixtures_cache.fetch(team_id, lambda: self._load_fixtures(team_id, team_name))
+
+    def get_team_photo(self, team_id):
+        """Return the photo of the team's first listed player ("" if unavailable)."""
+        try:
+            return self.photo_cache.fetch(team_id, lambda: self._load_team_photo(team_id))
+        except FootballApiError as e:
+            logging.error(f"Failed to fetch players for team {team_id}: {e}")
+            return ""
+
+    def get_team_photos(self, team_ids):
+        """Look up photos for several teams at once; cached ones cost no request."""
+        with ThreadPoolExecutor(max_workers=max(1, len(team_ids))) as executor:
+            return dict(zip(team_ids, executor.map(self.get_team_photo, team_ids)))
+
+    def get_next_games(self, team_name):
+        """Return the /next_games payload for a team name."""
+        team_id, selected_name = self.find_team(team_name)
+        fixtures = self.get_fixtures(team_id, team_name)
+        if not fixtures:
+            return None
+
+        player_images = self.get_team_photos(fixture_team_ids(fixtures))
+        return format_next_games(selected_name, fixtures, player_images)
+
+    def prefetch_next_games(self, team_name):
+        """Load what /next_games needs for a team wherever the cache is not fresh (used by the scheduler).
+
+        Returns the number of fixture and photo loads; raises FootballApiError when a call fails.
+        """
+        team_id, _ = self.find_team(team_name)
+        loads = 0
+        if not self.fixtures_cache.is_fresh(team_id):
+            self.fixtures_cache.refresh(team_id, lambda: self._load_fixtures(team_id, team_name))
+            loads += 1
+        for photo_team_id in fixture_team_ids(self.fixtures_cache.get(team_id) or []):
+            if not self.photo_cache.is_fresh(photo_team_id):
+                self.photo_cache.refresh(photo_team_id, lambda: self._load_team_photo(photo_team_id))
+                loads += 1
+        return loads
+
+    def index_league_teams(self, league_id, season):
+        """Add every team of a league season to the team index. Returns the number of teams."""
+        data = self._get_json("teams", {"league": league_id, "season": season}, "Failed to fetch team data")
+        teams = [(team["team"]["name"], team["team"]["id"], team["team"]["name"])
+                 for team in data.get("response", [])]
+        self.team_index.store_many(teams)
+        return len(teams)
+
+
+class AsyncFootballApi:
+    """asyncio twin of FootballApi for the ASGI app. Shares the team index and caches of `api`.
+
+    The quota ledger, the shared cache and the team index are SQLite files that other processes
+    write to, so every call into them runs in a thread: one waiting on a lock (up to the 5 s
+    busy timeout) must not stall the event loop.
+    """
+
+    def __init__(self, api, client):
+        self.api = api
+        self.client = client  # Shared httpx.AsyncClient
+        self._flight = AsyncSingleFlight()
+
+    async def _get_json(self, endpoint, params, error_message):
+        await asyncio.to_thread(self.api._reserve_call)
+        try:
+            response = await self.client.get(
+                f"{self.api.base_url}/{endpoint}", headers=api_headers(self.api.api_key), params=params
+            )
+        except Exception as e:
+            rapidapi_breaker.record_failure()
+            logging.error(f"RapidAPI request to {endpoint} failed: {e}")
+            raise FootballApiError(error_message, 502)
+
+        await asyncio.to_thread(self.api._observe_quota, response.headers)
+        if is_upstream_failure(response.status_code):
+            rapidapi_breaker.record_failure()
+        else:
+            rapidapi_breaker.record_success()
+        if response.status_code != 200:
+            raise FootballApiError(error_message, response.status_code)
+        return response.json()
+
+    async def _cached(self, cache, key, load):
+        """Fresh hit, else stale value plus a background refresh, else one coalesced load.
+
+        Uses the same keys as FootballApi, so both share (and fill) the same cache entries.
+        """
+        flight_key = (cache.namespace, key)
+        async def load_and_store():
+            value = await load()
+            await asyncio.to_thread(cache.set, key, value)
+            return value
+
+        def lookup():
+            stale = cache.get(key)
+            return stale, stale is not None and cache.is_fresh(key)
+
+        stale, fresh = await asyncio.to_thread(lookup)
+        if stale is not None:
+            CACHE_REQUESTS.inc(cache=cache.namespace, result='hit' if fresh else 'stale')
+            if not fresh:
+                refresh = asyncio.ensure_future(self._flight.do(flight_key, load_and_store))
+                refresh.add_done_callback(lambda task: task.cancelled() or task.exception())
+            return stale
+        CACHE_REQUESTS.inc(cache=cache.namespace, result='miss')
+        return await self._flight.do(flight_key, load_and_store)
+
+    async def find_team(self, team_name):
+        cached = await asyncio.to_thread(self.api.team_index.get, team_name)
+        if cached:
+            return cached
+
+        async def search():
+            team_data = await self._get_json("teams", {"search": team_name}, "Failed to fetch team data")
+            team_id, selected_name = select_team(team_data)
+            await asyncio.to_thread(self.api.team_index.store, team_name, team_id, selected_name)
+            return team_id, selected_name
+
+        return await self._flight.do(("team", normalize_team_name(team_name)), search)
+
+    async def get_fixtures(self, team_id, team_name=None):
+        async def load():
+            data = await self._get_json(
+                "fixtures", {"team": str(team_id), "next": str(NEXT_GAMES)}, "Failed to fetch fixtures"
+            )
+            await asyncio.to_thread(self.api.record_fixture_change, team_id, team_name, data["response"])
+            return data["response"]
+        return await self._cached(self.api.fixtures_cache, team_id, load)
+
+    async def get_team_photo(self, team_id):
+        async def load():
+            return team_photo_from(await self._get_json("players", {"team": team_id}, "Failed to fetch players"))
+        try:
+            return await self._cached(self.api.photo_cache, team_id, load)
+        except FootballApiError as e:
+            logging.error(f"Failed to fetch players for team {team_id}: {e}")
+            return ""
+
+    async def get_next_games(self, team_name):
+        """Return the /next_games payload for a team name (same shape as FootballApi)."""
+        team_id, selected_name = await self.find_team(team_name)
+        fixtures = await self.get_fixtures(team_id, team_name)
+        if not fixtures:
+            return None
+
+        team_ids = fixture_team_ids(fixtures)
+        photos = await asyncio.gather(*(self.get_team_photo(team_id) for team_id in team_ids))
+        return format_next_games(selected_name, fixtures, dict(zip(team_ids, photos)))
@@ -0,0 +1,93 @@
+"""Offline city -> (lat, lng) lookups from the bundled gazetteer (data/gazetteer.csv).
+
+Club cities are a small set that rarely changes, so most of them are answered here
+without calling OpenCage. Each row has a city, its country, coordinates and optional
+"|"-separated aliases (other spellings, local names, the suburb a stadium is in).
+"""
+import csv
+import difflib
+import os
+import re
+import unicodedata
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+# How similar a misspelled name must be to a known one (difflib ratio) to count as a match
+FUZZY_CUTOFF = 0.88
+
+
+def normalize_place(name):
+    """Fold accents, case, punctuation and "Saint"/"St." so spellings of a place compare equal."""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).casefold()
+    name = re.sub(r"[.'’\-_/]", ' ', name)
+    name = ' '.join(name.split())
+    return re.sub(r'^saint ', 'st ', name)
+
+
+def candidate_names(city):
+    """Spellings worth trying for a raw city value: "Wals-Siezenheim, Salzburg" or "Brussel / Bruxelles"."""
+    city = re.sub(r'\(.*?\)', '', city or '')
+    parts = [city] + city.split(',')[:1] + city.split('/')
+    return [key for key in dict.fromkeys(normalize_place(part) for part in parts) if key]
+
+
+class Gazetteer:
+    """In-memory index of the gazetteer: exact normalized matches first, then fuzzy ones."""
+
+    def __init__(self, rows):
+        self._index = {}  # normalized name -> [(normalized country, (lat, lng))], in file order
+        for city, country, lat, lng, aliases in rows:
+            entry = (normalize_place(country), (float(lat), float(lng)))
+            for name in [city] + [alias for alias in aliases.split('|') if alias]:
+                entries = self._index.setdefault(normalize_place(name), [])
+                if entry not in entries:  # An alias that normalizes to the city's own name
+                    entries.append(entry)
+        self._names = list(self._index)
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)  # Header
+            return cls([row + [''] * (5 - len(row)) for row in reader if row])
+
+    def __len__(self):
+        return len(self._names)
+
+    def _pick(self, entries, country):
+        if not country:
+            return entries[0][1]
+        # A same-named place in another country is a wrong answer, not a fallback: leave it to OpenCage
+        country = normalize_place(country)
+        for entry_country, coords in entries:
+            if entry_country == country:
+                return coords
+        return None
+
+    def lookup(self, city, country=None, fuzzy=True):
+        """Return (lat, lng) for a city, or None if the gazetteer doesn't know it.
+
+        With a `country`, only places in that country match. Exact matches are a dict
+        lookup; fuzzy matching (about a millisecond) can be skipped with fuzzy=False.
+        """
+        candidates = candidate_names(city)
+        for key in candidates:
+            coords = self._pick(self._index[key], country) if key in self._index else None
+            if coords:
+                return coords
+        if not fuzzy:
+            return None
+
+        for key in candidates:
+            close = difflib.get_close_matches(key, self._names, n=1, cutoff=FUZZY_CUTOFF)
+            coords = self._pick(self._index[close[0]], country) if close else None
+            if coords:
+                return coords
+        return None
+
+
+# Loaded once at import (a few hundred rows, about a millisecond)
+gazetteer = Gazetteer.load()
@@ -0,0 +1,257 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from gazetteer import gazetteer as bundled_gazetteer
+from http_client import DEFAULT_TIMEOUT, get_session
+from metrics import CACHE_REQUESTS
+from rate_limiter import TokenBucket
+from shared_cache import quota_ledger
+from upstream import SingleFlight, opencage_breaker
+
+OPENCAGE_URL = os.getenv('OPENCAGE_URL', 'https://api.opencagedata.com/geocode/v1/json')
+
+# OpenCage's free plan allows 1 request per second; raise this on a paid plan
+OPENCAGE_RATE_LIMIT = float(os.getenv('OPENCAGE_RATE_LIMIT', '1'))
+opencage_limiter = TokenBucket(OPENCAGE_RATE_LIMIT)
+
+# Upper bound on concurrent OpenCage requests during batch geocoding; the pool is also capped at
+# the limiter's rate, since more threads than requests per second only queue on the limiter
+GEOCODE_WORKERS = 8
+
+# City names we never send to OpenCage (the tracker stores "Unknown" when the API has no city)
+UNRESOLVABLE_CITIES = {'', 'unknown'}
+
+# How long a "no results" answer is trusted before we ask OpenCage again
+NEGATIVE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Returned by GeocodeCache.lookup when a city has never been resolved
+MISS = object()
+
+# Set GEOCODING_OFFLINE=true to answer only from the gazetteer and the cache (no OpenCage calls)
+GEOCODING_OFFLINE = os.getenv('GEOCODING_OFFLINE', 'false').lower() == 'true'
+
+
+class GeocodingOfflineError(Exception):
+    """Raised for a city only OpenCage could resolve while geocoding is offline."""
+
+
+def normalize_city(city):
+    """Normalize a city name into the key used by the geocode cache."""
+    if not city:
+        return ''
+    return ' '.join(city.split()).casefold()
+
+
+def fetch_lat_long(city, api_key, url=OPENCAGE_URL, limiter=None, timeout=DEFAULT_TIMEOUT):
+    """Ask OpenCage for the coordinates of a city. Returns None if nothing matched."""
+    def request():
+        (limiter or opencage_limiter).acquire()
+        response = get_session().get(url, params={'q': city, 'key': api_key}, timeout=timeout)
+        # Quota or auth errors must not be mistaken for "city not found"
+        response.raise_for_status()
+        return response.json()
+
+    # While OpenCage keeps failing, give up at once (CircuitOpenError) instead of queueing on it
+    opencage_breaker.check()
+    # Every worker and the tracker share one daily budget (QuotaExceededError once it is spent)
+    quota_ledger.acquire('opencage')
+    data = opencage_breaker.call(request)
+
+    if data['results']:
+        geometry = data['results'][0]['geometry']
+        return geometry['lat'], geometry['lng']
+    return None
+
+
+def geocode_many(cities, api_key, max_workers=GEOCODE_WORKERS, url=OPENCAGE_URL,
+                 limiter=None, timeout=DEFAULT_TIMEOUT):
+    """Resolve a batch of cities concurrently. Returns a {city: (lat, lng)} map.
+
+    Duplicate names (after normalization) are looked up once. Cities OpenCage has no
+    result for map to None; cities whose lookup failed are left out of the map.
+    Concurrency only hides latency: at the free plan's 1 request per second this runs one
+    lookup at a time and is no faster than a serial loop.
+    """
+    limiter = limiter or opencage_limiter
+    max_workers = max(1, min(max_workers, math.ceil(limiter.rate)))
+    unique = {}
+    for city in cities:
+        key = normalize_city(city)
+        if key not in UNRESOLVABLE_CITIES:
+            unique.setdefault(key, city)
+
+    def lookup(key):
+        try:
+            return key, fetch_lat_long(unique[key], api_key, url=url, limiter=limiter, timeout=timeout), None
+        except Exception as e:
+            return key, None, e
+
+    resolved = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, coords, error in executor.map(lookup, list(unique)):
+            if error is not None:
+                logging.error(f"Geocoding failed for {unique[key]}: {error}")
+                continue
+            resolved[key] = coords
+
+    # Hand back every spelling the caller passed in, not just the first one seen
+    return {city: resolved[normalize_city(city)] for city in cities if normalize_city(city) in resolved}
+
+
+class GeocodeCache:
+    """Persistent city -> (lat, lng) cache: an in-process LRU in front of a SQLite table.
+
+    Cities in the bundled gazetteer are answered from it first; OpenCage is only asked about the rest.
+    """
+
+    def __init__(self, db_path, api_key=None, maxsize=1024, gazetteer=bundled_gazetteer, offline=GEOCODING_OFFLINE):
+        self.db_path = db_path
+        self.api_key = api_key
+        self.maxsize = maxsize
+        self.gazetteer = gazetteer
+        self.offline = offline
+        self._lru = OrderedDict()  # city key -> (coords or None, expires_at or None)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def setup_database(self):
+        """Create the geocode cache table if it doesn't exist"""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                city_key TEXT PRIMARY KEY,
+                city TEXT NOT NULL,
+                lat REAL,
+                lng REAL,
+                found INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+            conn.commit()
+
+    def _remember(self, key, coords, expires_at):
+        with self._lock:
+            self._lru[key] = (coords, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def lookup(self, city):
+        """Return cached coordinates, None for a cached negative result, or MISS."""
+        key = normalize_city(city)
+        if key in UNRESOLVABLE_CITIES:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                coords, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._lru.move_to_end(key)
+                    return coords
+                del self._lru[key]
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT lat, lng, found, updated_at FROM geocode_cache WHERE city_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return MISS
+
+        lat, lng, found, updated_at = row
+        if found:
+            coords, expires_at = (lat, lng), None
+        else:
+            coords, expires_at = None, updated_at + NEGATIVE_TTL_SECONDS
+            if expires_at <= now:
+                return MISS
+        self._remember(key, coords, expires_at)
+        return coords
+
+    def store(self, city, coords):
+        """Save a resolved city. Pass coords=None to record that OpenCage found nothing."""
+        key = normalize_city(city)
+        now = time.time()
+        lat, lng = coords if coords else (None, None)
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO geocode_cache (city_key, city, lat, lng, found, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, city, lat, lng, 1 if coords else 0, now))
+            conn.commit()
+        self._remember(key, coords, None if coords else now + NEGATIVE_TTL_SECONDS)
+
+    def resolve_cached(self, city, country=None):
+        """Like resolve(), without OpenCage: the gazetteer and the cache only.
+
+        Returns MISS for a city nobody has looked up yet; the geocode job (or `flask warm-geocodes`)
+        resolves those, so a request never waits on OpenCage.
+        """
+        if normalize_city(city) in UNRESOLVABLE_CITIES:
+            CACHE_REQUESTS.inc(cache='geocode', result='unresolvable')
+            return None
+        coords = self.gazetteer.lookup(city, country, fuzzy=False) if self.gazetteer else None
+        if coords:
+            CACHE_REQUESTS.inc(cache='geocode', result='gazetteer')
+            return coords
+
+        coords = self.lookup(city)
+        if coords is not MISS:
+            CACHE_REQUESTS.inc(cache='geocode', result='hit')
+            return coords
+        coords = self.gazetteer.lookup(city, country) if self.gazetteer else None
+        if coords:
+            CACHE_REQUESTS.inc(cache='geocode', result='gazetteer_fuzzy')
+            return coords
+        CACHE_REQUESTS.inc(cache='geocode', result='miss')
+        return MISS
+
+    def resolve(self, city, country=None):
+        """Get coordinates for a city: exact gazetteer match, cache, fuzzy gazetteer match, then OpenCage.
+
+        `country` (the club's) picks between gazetteer places that share a name. Returns None if the
+        city is unknown. Network errors are raised and never cached.
+        """
+        coords = self.resolve_cached(city, country)
+        if coords is not MISS:
+            return coords
+        if self.offline:
+            raise GeocodingOfflineError(f"{city!r} is not in the gazetteer and geocoding is offline")
+
+        def fetch():
+            coords = fetch_lat_long(city, self.api_key)
+            self.store(city, coords)
+            return coords
+
+        # Concurrent requests for the same uncached city share one OpenCage call
+        return self._flight.do(normalize_city(city), fetch)
+
+    def warm(self, places):
+        """Resolve every distinct (city, country) that is not cached yet. Returns the number of API lookups."""
+        # Same order as resolve(): the slow fuzzy gazetteer match only for cities that aren't cached
+        missing = {city for city, country in set(places)
+                   if not (self.gazetteer and self.gazetteer.lookup(city, country, fuzzy=False))
+                   and self.lookup(city) is MISS
+                   and not (self.gazetteer and self.gazetteer.lookup(city, country))}
+        if self.offline:
+            return 0
+        resolved = geocode_many(list(missing), self.api_key)
+        for city, coords in resolved.items():
+            self.store(city, coords)
+        return len(resolved)
+
+    def warm_from_players(self, players_db_path=None):
+        """Pre-resolve every distinct football_players city and country (run at ingest time)."""
+        with closing(sqlite3.connect(players_db_path or self.db_path)) as conn:
+            places = conn.execute("SELECT DISTINCT city, country FROM football_players").fetchall()
+        fetched = self.warm(places)
+        logging.info(f"Geocode cache warmed: {len(places)} cities, {fetched} looked up")
+        return fetched
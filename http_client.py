@@ -0,0 +1,253 @@
+"""The outbound HTTP clients every caller shares: the app, the tracker and the ASGI app.
+
+- Keep-alive connection pools per host and (connect, read) timeouts on every call.
+- 429 and 5xx answers are retried with exponential backoff and full jitter, or after the
+  Retry-After the upstream asked for (every outbound call is an idempotent GET).
+- X-RateLimit-Limit/-Remaining headers (API-Football's per-minute budget, OpenCage's daily one)
+  space out the next calls to that host once its budget runs low, instead of running into 429s.
+"""
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+
+from http_fixtures import fixture_adapter_class, fixture_store, fixture_transport
+from metrics import UPSTREAM_DURATION, UPSTREAM_RETRIES, upstream_host
+
+# (connect, read) timeout in seconds for every outbound call
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Keep-alive connections kept per host; matches the largest worker pool we run
+POOL_MAXSIZE = 16
+
+# Retries after the first attempt, and the backoff between them (doubling from BACKOFF_BASE, in seconds)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_METHODS = frozenset({'GET', 'HEAD'})
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = 8
+
+# A longer Retry-After isn't waited out: the 429 goes back to the caller (a spent daily quota, say)
+RETRY_AFTER_MAX = 30
+
+# Once fewer than this share of a host's calls are left, the rest are spread over its reset window
+PACE_LOW_WATERMARK = 0.2
+RATE_LIMIT_WINDOW = 60  # seconds, when the host doesn't send X-RateLimit-Reset
+PACE_MAX_DELAY = 10  # Never hold a call back longer than this; the upstream's 429 handling takes over
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delay-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now or time.time()))
+
+
+def retry_delay(attempt, status, headers):
+    """Seconds to wait before retrying a response, or None to hand it to the caller as it is.
+
+    `attempt` counts the retries made so far.
+    """
+    if status not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+        return None
+    retry_after = parse_retry_after(headers.get('retry-after'))
+    if retry_after is not None:
+        return retry_after if retry_after <= RETRY_AFTER_MAX else None
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitPacer:
+    """Spaces out calls to a host once its rate-limit headers say its budget is running low."""
+
+    def __init__(self, low_watermark=PACE_LOW_WATERMARK, window=RATE_LIMIT_WINDOW, max_delay=PACE_MAX_DELAY):
+        self.low_watermark = low_watermark
+        self.window = window
+        self.max_delay = max_delay
+        self._interval = {}  # host -> seconds to leave between calls
+        self._next_call = {}  # host -> time.monotonic() of the next free slot
+        self._lock = threading.Lock()
+
+    def observe(self, host, headers):
+        """Adjust the pace for `host` from a response's X-RateLimit-* headers."""
+        limit = header_number(headers, 'x-ratelimit-limit')
+        remaining = header_number(headers, 'x-ratelimit-remaining')
+        if not limit or remaining is None:
+            return
+        reset = header_number(headers, 'x-ratelimit-reset')
+        if reset is not None and reset > 1e9:  # An epoch timestamp (OpenCage) rather than seconds
+            reset -= time.time()
+        reset = max(0.0, reset) if reset is not None else self.window
+
+        with self._lock:
+            if remaining <= 0:
+                # Nothing left: hold every call until the window resets
+                self._interval[host] = 0.0
+                self._next_call[host] = time.monotonic() + min(reset, self.max_delay)
+            elif remaining < limit * self.low_watermark:
+                self._interval[host] = min(reset / remaining, self.max_delay)
+            else:
+                # Plenty left (or the window reset): back to full speed
+                self._interval.pop(host, None)
+                self._next_call.pop(host, None)
+
+    def reserve(self, host):
+        """Take the next free slot for a call to `host`; returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            # Queued callers never wait more than max_delay; past that, the upstream's 429s take over
+            start = min(max(now, self._next_call.get(host, now)), now + self.max_delay)
+            interval = self._interval.get(host, 0.0)
+            if interval or start > now:
+                self._next_call[host] = start + interval
+            return start - now
+
+
+# Shared by both clients, so the tracker's threads and the web requests slow down together
+pacer = RateLimitPacer()
+
+
+def log_retry(host, status, delay, attempt):
+    UPSTREAM_RETRIES.inc(host=host, status=str(status))
+    logging.info(f"{host} answered {status}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+
+
+def create_session():
+    """Create a requests.Session that records each call's latency and status per host.
+
+    requests is imported here, so processes (and app imports) that never call out don't load it.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class InstrumentedSession(requests.Session):
+        def request(self, method, url, *args, **kwargs):
+            host = upstream_host(url)
+            attempt = 0
+            while True:
+                pause = pacer.reserve(host)
+                if pause:
+                    time.sleep(pause)
+                response = self.timed_request(host, method, url, *args, **kwargs)
+                pacer.observe(host, response.headers)
+                delay = retry_delay(attempt, response.status_code, response.headers)
+                if delay is None or method.upper() not in RETRY_METHODS:
+                    return response
+                log_retry(host, response.status_code, delay, attempt)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+
+        def timed_request(self, host, method, url, *args, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                status = str(response.status_code)
+                return response
+            finally:
+                UPSTREAM_DURATION.observe(time.perf_counter() - start, host=host, status=status)
+
+    store = fixture_store()  # UPSTREAM_FIXTURES=record|replay (see http_fixtures)
+    adapter_class = fixture_adapter_class(store) if store else HTTPAdapter
+    session = InstrumentedSession()
+    adapter = adapter_class(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide requests.Session so calls reuse pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """Close the shared session's connections; the next get_session() starts a new one."""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def _forget_session():
+    # A forked child must not share the parent's sockets: it opens its own on first use
+    global _session, _session_lock, pacer
+    _session = None
+    _session_lock = threading.Lock()
+    pacer = RateLimitPacer()  # Its lock may have been held by another thread at the fork
+
+
+os.register_at_fork(after_in_child=_forget_session)
+
+
+def create_async_client():
+    """Create the httpx.AsyncClient shared by the ASGI app (one per event loop).
+
+    httpx is only needed for the async serving mode, so it is imported here.
+    """
+    import httpx
+
+    class InstrumentedAsyncClient(httpx.AsyncClient):
+        async def send(self, request, **kwargs):
+            host = request.url.host
+            attempt = 0
+            while True:
+                pause = pacer.reserve(host)
+                if pause:
+                    await asyncio.sleep(pause)
+                response = await self.timed_send(host, request, **kwargs)
+                pacer.observe(host, response.headers)
+                delay = retry_delay(attempt, response.status_code, response.headers)
+                if delay is None or request.method not in RETRY_METHODS:
+                    return response
+                log_retry(host, response.status_code, delay, attempt)
+                await response.aclose()
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        async def timed_send(self, host, request, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = await super().send(request, **kwargs)
+                status = str(response.status_code)
+                return response
+            finally:
+                UPSTREAM_DURATION.observe(time.perf_counter() - start, host=host, status=status)
+
+    connect_timeout, read_timeout = DEFAULT_TIMEOUT
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=POOL_MAXSIZE * 4, max_keepalive_connections=POOL_MAXSIZE)
+    )
+    store = fixture_store()
+    return InstrumentedAsyncClient(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        transport=fixture_transport(store, transport) if store else transport,
+    )
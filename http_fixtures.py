@@ -0,0 +1,158 @@
+"""Recorded upstream responses, so the apps, the tracker and the benchmarks run without API keys.
+
+  UPSTREAM_FIXTURES=record  call the upstreams as usual and save every response in UPSTREAM_FIXTURES_DIR
+  UPSTREAM_FIXTURES=replay  answer every call from those files; a call that was never recorded
+                            fails like an unreachable host
+
+Both shared clients (http_client.get_session and create_async_client) go through here, so this
+covers the web apps, the tracker and `find team id.py`. Responses are keyed by method, path and
+query string, without the host (a recording made against benchmarks/stub_server.py replays for
+the real API URLs) and without credentials. Only the response headers callers read are kept.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from repository import ROOT_DIR
+
+# Recordings shipped with the repo (made against benchmarks/stub_server.py by benchmarks/record_fixtures.py)
+DEFAULT_FIXTURES_DIR = os.path.join(ROOT_DIR, 'fixtures', 'upstream')
+
+# Query parameters that carry credentials (OpenCage's API key); left out of keys and files
+SECRET_PARAMS = {'key', 'api_key', 'apikey'}
+
+# Response headers worth replaying: the body's type and the upstreams' rate-limit hints
+KEPT_HEADERS = {'content-type', 'retry-after'}
+KEPT_HEADER_PREFIXES = ('x-ratelimit-',)
+
+
+def fixture_key(method, url):
+    """'GET /v3/fixtures?next=2&team=33': what identifies a recorded call."""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in SECRET_PARAMS)
+    return f"{method.upper()} {parts.path}" + (f"?{urlencode(query)}" if query else '')
+
+
+def kept_headers(headers):
+    return {name.lower(): value for name, value in headers.items()
+            if name.lower() in KEPT_HEADERS or name.lower().startswith(KEPT_HEADER_PREFIXES)}
+
+
+class FixtureStore:
+    """One JSON file per recorded call, named after its path so the directory stays browsable."""
+
+    def __init__(self, directory=DEFAULT_FIXTURES_DIR, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"UPSTREAM_FIXTURES must be 'record' or 'replay', not {mode!r}")
+        self.directory = directory
+        self.mode = mode
+
+    def path(self, key):
+        slug = re.sub(r'[^a-z0-9]+', '-', key.split('?')[0].lower()).strip('-')[:60]
+        return os.path.join(self.directory, f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.json")
+
+    def load(self, method, url):
+        """The recorded response for a call, or None if there is none."""
+        try:
+            with open(self.path(fixture_key(method, url)), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, method, url, status, headers, content):
+        key = fixture_key(method, url)
+        headers = kept_headers(headers)
+        fixture = {'request': key, 'status': status, 'headers': headers}
+        if headers.get('content-type', '').startswith('application/json'):
+            try:
+                fixture['json'] = json.loads(content)  # Readable, diffable recordings
+            except ValueError:
+                fixture['base64'] = base64.b64encode(content).decode('ascii')
+        else:
+            fixture['base64'] = base64.b64encode(content).decode('ascii')  # Images and anything else
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def body(fixture):
+        if 'json' in fixture:
+            return json.dumps(fixture['json']).encode('utf-8')
+        return base64.b64decode(fixture['base64'])
+
+
+def fixture_store():
+    """The store selected by UPSTREAM_FIXTURES (read when a client is created, after .env), or None."""
+    mode = os.getenv('UPSTREAM_FIXTURES', '').lower()
+    if not mode:
+        return None
+    return FixtureStore(os.getenv('UPSTREAM_FIXTURES_DIR', DEFAULT_FIXTURES_DIR), mode)
+
+
+def fixture_adapter_class(store):
+    """A requests transport adapter that records to or replays from `store`."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    class FixtureAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            if store.mode == 'record':
+                response = super().send(request, **kwargs)
+                store.save(request.method, request.url, response.status_code, response.headers, response.content)
+                return response
+
+            fixture = store.load(request.method, request.url)
+            if fixture is None:
+                raise requests.exceptions.ConnectionError(
+                    f"No recorded response for {fixture_key(request.method, request.url)}", request=request
+                )
+            response = requests.Response()
+            response.status_code = fixture['status']
+            response.headers = CaseInsensitiveDict(fixture['headers'])
+            response.encoding = get_encoding_from_headers(response.headers)
+            response._content = store.body(fixture)
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            return response
+
+    return FixtureAdapter
+
+
+def fixture_transport(store, transport):
+    """Wrap an httpx async transport so it records to or replays from `store`."""
+    import httpx
+
+    class FixtureTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            method, url = request.method, str(request.url)
+            if store.mode == 'record':
+                response = await transport.handle_async_request(request)
+                content = await response.aread()  # Decoded, so the copy handed on must not claim an encoding
+                await response.aclose()
+                store.save(method, url, response.status_code, response.headers, content)
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+                return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+            fixture = store.load(method, url)
+            if fixture is None:
+                raise httpx.ConnectError(f"No recorded response for {fixture_key(method, url)}", request=request)
+            return httpx.Response(fixture['status'], headers=fixture['headers'], content=store.body(fixture),
+                                  request=request)
+
+        async def aclose(self):
+            await transport.aclose()
+
+    return FixtureTransport()
@@ -0,0 +1,192 @@
+"""Resized, transcoded player photos and team logos served from a content-addressed disk cache.
+
+Sources are either files under static/images or photos on the API's image hosts. A
+remote source is downloaded once; every variant (size x format) is encoded once and
+stored under the SHA-256 of its source, so identical images share their variants.
+"""
+import hashlib
+import io
+import os
+import threading
+from urllib.parse import urlparse
+
+from http_client import DEFAULT_TIMEOUT, get_session
+from metrics import CACHE_REQUESTS
+from repository import ROOT_DIR
+
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(ROOT_DIR, 'instance', 'image_cache'))
+
+# Square sizes (pixels) the globe uses: marker textures and team logos in the games list
+IMAGE_SIZES = {
+    'marker': 128,
+    'avatar': 64,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+# Local sources must live under here
+LOCAL_IMAGE_ROOT = os.path.join(ROOT_DIR, 'static', 'images')
+
+# Remote hosts we are willing to fetch from (API-Football photos and logos, player photo CDN)
+ALLOWED_HOSTS = set(os.getenv('IMAGE_PROXY_HOSTS', 'media.api-sports.io,assets.sorare.com').split(','))
+
+# Photos at a given URL practically never change, so browsers may keep variants for a month
+IMAGE_MAX_AGE = 30 * 24 * 60 * 60
+
+# Downloads larger than this are refused (bytes)
+MAX_SOURCE_BYTES = 5 * 1024 * 1024
+
+
+class ImageSourceError(Exception):
+    """The requested source is not allowed, missing, or not an image."""
+
+
+class ImageHostError(Exception):
+    """The image host could not be reached."""
+
+
+def image_error(error):
+    """Return (JSON payload, status) for an error raised while getting an /img variant."""
+    if isinstance(error, ValueError):
+        return {"error": str(error)}, 400
+    if isinstance(error, ImageSourceError):
+        return {"error": str(error)}, 404
+    return {"error": "Image host unavailable"}, 502
+
+
+def is_remote(src):
+    return src.startswith(('http://', 'https://'))
+
+
+def local_source_path(src):
+    """Resolve a static image path ("static\\images\\..." or "/static/images/...") safely."""
+    relative = src.replace('\\', '/').lstrip('/')
+    if relative.startswith('static/images/'):
+        relative = relative[len('static/images/'):]
+    path = os.path.realpath(os.path.join(LOCAL_IMAGE_ROOT, relative))
+    if not path.startswith(os.path.realpath(LOCAL_IMAGE_ROOT) + os.sep):
+        raise ImageSourceError("Image path is outside static/images")
+    if not os.path.isfile(path):
+        raise ImageSourceError("Image not found")
+    return path
+
+
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def resize_image(data, size, image_format):
+    """Center-crop `data` to a square of `size` pixels and encode it."""
+    from PIL import Image, ImageOps  # Pillow is only needed by this endpoint
+
+    pil_format, _, options = FORMATS[image_format]
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA')
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        if pil_format == 'JPEG':
+            # JPEG has no alpha channel: flatten transparent photos onto white
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        output = io.BytesIO()
+        image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+class ImageProxy:
+    """Looks up (and on first use builds) the cached variant of an image source."""
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._digests = {}  # source key -> SHA-256 of its bytes
+        self._lock = threading.Lock()
+
+    def _fetch_remote(self, url):
+        host = urlparse(url).hostname or ''
+        if host not in ALLOWED_HOSTS:
+            raise ImageSourceError(f"Images from {host or 'this URL'} are not proxied")
+
+        # Keep the original too, so a new size or format never needs another download
+        path = os.path.join(self.cache_dir, 'sources', hashlib.sha256(url.encode('utf-8')).hexdigest())
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+
+        import requests  # Needed by the shared session anyway (see http_client)
+
+        try:
+            response = get_session().get(url, timeout=DEFAULT_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            raise ImageHostError(str(e))
+        if response.status_code != 200:
+            raise ImageSourceError(f"Image host answered {response.status_code}")
+        if not response.headers.get('Content-Type', '').startswith('image/'):
+            raise ImageSourceError("Source is not an image")
+        if len(response.content) > MAX_SOURCE_BYTES:
+            raise ImageSourceError("Source image is too large")
+        write_atomically(path, response.content)
+        return response.content
+
+    def _load_source(self, src):
+        """Return (source key, bytes or None if its digest is already known, digest)."""
+        if is_remote(src):
+            key = src
+        else:
+            path = local_source_path(src)
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)  # Edited files get new variants
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest:
+            return key, None, digest
+
+        if is_remote(src):
+            data = self._fetch_remote(src)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+        return key, data, digest
+
+    def variant_path(self, digest, size_name, image_format):
+        return os.path.join(self.cache_dir, 'variants', digest[:2], f"{digest}-{size_name}.{image_format}")
+
+    def get(self, src, size_name, image_format):
+        """Return (path, etag, mimetype) of the variant, encoding it on first use."""
+        if size_name not in IMAGE_SIZES:
+            raise ValueError(f"size must be one of {', '.join(IMAGE_SIZES)}")
+        if image_format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+        key, data, digest = self._load_source(src)
+        path = self.variant_path(digest, size_name, image_format)
+        CACHE_REQUESTS.inc(cache='image_variant', result='hit' if os.path.exists(path) else 'miss')
+        if not os.path.exists(path):
+            if data is None:
+                # The variant is new but the source was seen before: read it again
+                with self._lock:
+                    self._digests.pop(key, None)
+                key, data, digest = self._load_source(src)
+                path = self.variant_path(digest, size_name, image_format)
+            try:
+                encoded = resize_image(data, IMAGE_SIZES[size_name], image_format)
+            except OSError as e:  # Pillow's UnidentifiedImageError is an OSError
+                raise ImageSourceError(f"Source is not a readable image: {e}")
+            write_atomically(path, encoded)
+
+        return path, f"{digest[:32]}-{size_name}-{image_format}", FORMATS[image_format][1]
+
+
+def preferred_format(accept_header):
+    """WebP for browsers that accept it, JPEG otherwise."""
+    return 'webp' if 'image/webp' in (accept_header or '') else 'jpeg'
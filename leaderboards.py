@@ -0,0 +1,111 @@
+"""Precomputed leaderboards: top scorers, assist makers and most-capped players, overall and
+per country, league and position, each with the player's change over the last TREND_DAYS.
+
+The tracker rebuilds them after every ingest from football_players and the append-only
+player_stats_history, so /players/leaderboards reads the first rows of one board off the
+primary key however many players there are.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+# Leaderboard stat -> football_players column
+STATS = {'goals': 'goals', 'assists': 'assists', 'appearances': 'games_played'}
+
+# One board per stat overall, plus one per distinct value of each of the other columns
+SCOPES = ('all', 'country', 'league', 'position')
+
+# Rows stored per board, and the most the endpoint returns
+LEADERBOARD_SIZE = 50
+DEFAULT_LIMIT = 10
+
+# Trends compare against each player's stats as they were this many days ago
+TREND_DAYS = 7
+
+
+def ranking_key(stat):
+    column = STATS[stat]
+    # Ties go to the player who needed fewer games, then by name so the order is stable
+    if column == 'games_played':
+        return lambda p: (-p[column], p['name'])
+    return lambda p: (-p[column], p['games_played'] or 0, p['name'])
+
+
+def rank_board(stat, scope, scope_value, members, baseline):
+    """The stored rows of one board: its best LEADERBOARD_SIZE players, tied players sharing a rank."""
+    column = STATS[stat]
+    candidates = [p for p in members if p[column]]  # Nobody tops a board with zero
+    rows, rank, previous = [], 0, None
+    for ordinal, player in enumerate(heapq.nsmallest(LEADERBOARD_SIZE, candidates, key=ranking_key(stat)), 1):
+        if player[column] != previous:
+            rank, previous = ordinal, player[column]
+        before = baseline.get(player['player_id'])
+        rows.append({
+            'stat': stat,
+            'scope': scope,
+            'scope_value': scope_value,
+            'ordinal': ordinal,
+            'rank': rank,
+            'player_id': player['player_id'],
+            'name': player['name'],
+            'team': player['team'],
+            'country': player['country'],
+            'league': player['league'],
+            'position': player['position'],
+            'image': player['image'],
+            'value': player[column],
+            # None for players with no snapshot that old (new to the tracker)
+            'change': player[column] - (before[column] or 0) if before else None,
+        })
+    return rows
+
+
+def build_leaderboards(players, baseline):
+    """Every leaderboard row; `baseline` is {player_id: stats} from TREND_DAYS ago."""
+    boards = {}
+    for player in players:
+        for scope in SCOPES:
+            scope_value = '' if scope == 'all' else player[scope]
+            if scope == 'all' or scope_value:
+                boards.setdefault((scope, scope_value), []).append(player)
+
+    rows = []
+    for stat in STATS:
+        for (scope, scope_value), members in boards.items():
+            rows += rank_board(stat, scope, scope_value, members, baseline)
+    return rows
+
+
+def refresh_leaderboards(repo, now=None):
+    """Rebuild the stored leaderboards from football_players. Returns the number of rows."""
+    baseline = repo.stats_as_of((now or datetime.now()) - timedelta(days=TREND_DAYS))
+    rows = build_leaderboards(repo.fetch_ranked_players(), baseline)
+    with repo.transaction() as conn:
+        repo.replace_leaderboards(conn, rows)
+    return len(rows)
+
+
+def parse_leaderboard_query(args):
+    """Turn /players/leaderboards query parameters into (stat, scope, scope_value, limit).
+
+    Raises ValueError with a message suitable for a 400 response.
+    """
+    stat = args.get('stat', 'goals')
+    if stat not in STATS:
+        raise ValueError(f"'stat' must be one of {', '.join(STATS)}")
+    scope = args.get('by', 'all')
+    if scope not in SCOPES:
+        raise ValueError(f"'by' must be one of {', '.join(SCOPES)}")
+
+    scope_value = args.get('value', '')
+    if scope == 'all':
+        scope_value = ''
+    elif not scope_value:
+        raise ValueError(f"'value' is required with by={scope}")
+
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("'limit' must be an integer")
+    if not 1 <= limit <= LEADERBOARD_SIZE:
+        raise ValueError(f"'limit' must be between 1 and {LEADERBOARD_SIZE}")
+    return stat, scope, scope_value, limit
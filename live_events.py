@@ -0,0 +1,142 @@
+"""Change feed behind /events: player and fixture changes as server-sent events.
+
+Player changes are logged by triggers on football_players (see repository.py), so the
+tracker, the scheduler and anything else writing the table all feed it. Fixture changes are
+logged by FootballApi when a refresh returns different games. Log ids are the SSE event ids,
+so a client that reconnects with Last-Event-ID gets exactly what it missed.
+
+Events are compact deltas:
+  event: player    {"op": "add", <every /players field>}
+                   {"op": "update" | "move", "id": ..., <changed fields only>}  ("move" = new club)
+                   {"op": "remove", "id": ...}
+  event: fixtures  {"team": ..., "team_id": ..., "next_games": [...]}
+  event: reset     {} -- the client's position is gone (pruned); reload /players
+"""
+import json
+import os
+import threading
+import time
+
+from responses import dumps
+
+# How long events are kept for reconnecting clients (pruned by the scheduler)
+LIVE_EVENTS_RETENTION = int(os.getenv('LIVE_EVENTS_RETENTION_SECONDS', str(24 * 60 * 60)))
+
+# How often each process checks the log for new events, however many clients are connected
+SSE_POLL_SECONDS = float(os.getenv('SSE_POLL_SECONDS', '2'))
+
+# A comment line this often keeps proxies from closing idle streams
+SSE_HEARTBEAT_SECONDS = 15
+
+# Reconnect delay suggested to browsers (milliseconds)
+SSE_RETRY_MS = 5000
+
+# Events sent per read; a client far behind catches up over several polls
+MAX_EVENTS_PER_READ = 500
+
+# Streams one Flask process serves at once. Each holds a worker thread for as long as its tab is
+# open, so keep this below gunicorn's --threads to leave threads for other requests. The ASGI app
+# streams from the event loop and has no such limit.
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', '8'))
+
+
+def player_delta(old, new):
+    """The player event for one logged change: the full row when added, changed fields otherwise."""
+    if old is None:
+        return {'op': 'add', **new}
+    if new is None:
+        return {'op': 'remove', 'id': old['id']}
+    changed = {field: value for field, value in new.items() if old.get(field) != value}
+    return {'op': 'move' if 'team' in changed else 'update', 'id': new['id'], **changed}
+
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+class LiveEvents:
+    """Reads (and for fixtures, writes) the change log, and formats it as SSE."""
+
+    def __init__(self, repo, poll_interval=SSE_POLL_SECONDS, max_streams=SSE_MAX_STREAMS):
+        self.repo = repo
+        self.poll_interval = poll_interval
+        self._stream_slots = threading.BoundedSemaphore(max_streams)
+        self._lock = threading.Lock()
+        self._latest_id = 0
+        self._checked_at = None
+
+    def record_fixtures(self, team_name, team_id, next_games):
+        self.repo.record_live_event('fixtures', team_id, None, json.dumps({
+            'team': team_name, 'team_id': team_id, 'next_games': next_games
+        }))
+
+    def latest_id(self, refresh=False):
+        """Latest logged id, read from the database at most once per poll interval for all streams."""
+        with self._lock:
+            now = time.monotonic()
+            if refresh or self._checked_at is None or now - self._checked_at >= self.poll_interval:
+                self._latest_id = self.repo.live_event_bounds()[1]
+                self._checked_at = now
+            return self._latest_id
+
+    def start(self, last_event_id=None):
+        """Return (cursor, first chunk) for a new stream.
+
+        A client resuming from an id we no longer have (or never issued) gets a reset event
+        and continues from now.
+        """
+        chunk = f"retry: {SSE_RETRY_MS}\n\n"
+        oldest, latest = self.repo.live_event_bounds()
+        if last_event_id is None or last_event_id == '':
+            return latest, chunk
+        try:
+            cursor = int(last_event_id)
+        except ValueError:
+            cursor = -1
+        # Ids are consecutive, so a gap before the oldest kept event means some were pruned
+        if cursor < 0 or cursor > latest or cursor < (oldest or latest + 1) - 1:
+            return latest, chunk + format_event(latest, 'reset', {})
+        return cursor, chunk
+
+    def poll(self, cursor):
+        """Return (chunk, cursor) with the events logged after `cursor`; chunk is '' when there are none."""
+        if self.latest_id() <= cursor:
+            return '', cursor
+        chunks = []
+        for event_id, kind, key, old, new in self.repo.live_events_after(cursor, MAX_EVENTS_PER_READ):
+            old = json.loads(old) if old else None
+            new = json.loads(new) if new else None
+            if kind == 'player':
+                chunks.append(format_event(event_id, 'player', player_delta(old, new)))
+            else:
+                chunks.append(format_event(event_id, kind, new))
+            cursor = event_id
+        return ''.join(chunks), cursor
+
+    def open_stream(self):
+        """Take one of the process's blocking-stream slots; False when all are in use."""
+        return self._stream_slots.acquire(blocking=False)
+
+    def close_stream(self):
+        self._stream_slots.release()
+
+    def stream(self, cursor, chunk):
+        """Blocking generator of SSE text for the Flask app (one thread per connected client).
+
+        Take a slot with open_stream() first and give it back with close_stream() when the response closes.
+        """
+        yield chunk
+        idle = 0
+        while True:
+            chunk, cursor = self.poll(cursor)
+            if chunk:
+                yield chunk
+                idle = 0
+            elif idle >= SSE_HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                idle = 0
+            time.sleep(self.poll_interval)
+            idle += self.poll_interval
+
+    def prune(self, retention=LIVE_EVENTS_RETENTION):
+        return self.repo.prune_live_events(time.time() - retention)
@@ -0,0 +1,207 @@
+"""In-process metrics exposed by /metrics in the Prometheus text format.
+
+A few counters, gauges and histograms instrument the hot paths: routes, outbound calls,
+caches, database queries and the tracker. Gauges with a callback (quota left, scheduler
+jobs) are read from the shared SQLite file at scrape time, so they describe the whole
+host. Everything else is counted per process, so scrape each worker (or run a single one)
+to see all of it.
+"""
+import threading
+import time
+from contextlib import ContextDecorator
+from urllib.parse import urlparse
+
+# Seconds; covers a cached /players hit (~1 ms) up to a slow upstream call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values tuple -> value
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for the exposition."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value set directly, or computed by `function` (returning {label values tuple: value}) at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, function=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.function is None:
+            yield from super().samples()
+            return
+        for key, value in self.function().items():
+            yield '', key if isinstance(key, tuple) else (key,), (), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0, 0.0]  # buckets, count, sum
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += 1
+            counts[-1] += value
+
+    def time(self, **labels):
+        """Context manager (or decorator) observing how long its block takes."""
+        return Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', key, (('le', format_value(float(bound))),), cumulative
+            yield '_bucket', key, (('le', '+Inf'),), counts[-2]
+            yield '_count', key, (), counts[-2]
+            yield '_sum', key, (), counts[-1]
+
+
+class Timer(ContextDecorator):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._starts = threading.local()  # One instance may decorate a function called from many threads
+
+    def __enter__(self):
+        self._starts.__dict__.setdefault('stack', []).append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._starts.stack.pop(), **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics)
+        blocks = []
+        for metric in metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as e:  # A failing gauge callback shouldn't hide every other metric
+                blocks.append(f"# {metric.name} unavailable: {escape_label(e)}")
+        return '\n'.join(blocks) + '\n'
+
+
+REGISTRY = Registry()
+
+# Routes (observed by the apps' request hooks)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to build a response, by route.', ['method', 'route', 'status']
+)
+
+# Outbound calls (observed by http_client for every request made through the shared clients)
+UPSTREAM_DURATION = Histogram(
+    'upstream_request_duration_seconds', 'Outbound HTTP call latency by host and status ("error" if none).',
+    ['host', 'status']
+)
+UPSTREAM_RETRIES = Counter(
+    'upstream_retries_total', 'Outbound calls retried after a 429 or 5xx, by host and status.', ['host', 'status']
+)
+
+# Caches: UpstreamCache namespaces, geocodes, the /players snapshot, image variants
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit, stale, miss, ...).', ['cache', 'result']
+)
+
+DB_QUERY_DURATION = Histogram('db_query_duration_seconds', 'Repository query time by query.', ['query'])
+
+# Tracker (counted in whichever process runs the crawl: the scheduler's or the CLI's)
+TRACKER_PAGE_DURATION = Histogram(
+    'tracker_page_duration_seconds', 'Time to fetch (from the API or page cache) or store one page.',
+    ['step'], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+TRACKER_RUN_DURATION = Histogram(
+    'tracker_run_duration_seconds', 'Duration of a whole tracker crawl.', buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800)
+)
+TRACKER_EVENTS = Counter('tracker_events_total', 'Tracker run counters (pages, players by outcome).', ['event'])
+
+
+def upstream_host(url):
+    return urlparse(url).hostname or 'unknown'
+
+
+def render():
+    return REGISTRY.render()
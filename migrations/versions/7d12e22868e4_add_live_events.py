@@ -0,0 +1,79 @@
+"""Add live_events, the change log behind /events, and its football_players triggers
+
+Revision ID: 7d12e22868e4
+Revises: dae1300a0331
+Create Date: 2026-10-19 09:40:18.227905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d12e22868e4'
+down_revision = 'dae1300a0331'
+branch_labels = None
+depends_on = None
+
+# The /players columns as of this revision; `flask init-db` recreates the triggers from the current list
+PLAYER_COLUMNS = [
+    'id', 'name', 'city', 'lat', 'lng', 'date_of_birth', 'team', 'country',
+    'games_played', 'goals', 'assists', 'position', 'player_number', 'image'
+]
+
+NOW_SQL = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def player_json(row):
+    pairs = ', '.join("'%s', %s.%s" % (column, row, column) for column in PLAYER_COLUMNS)
+    return f"json_object({pairs})"
+
+
+TRIGGERS = {
+    'live_events_player_insert': f'''
+    CREATE TRIGGER live_events_player_insert AFTER INSERT ON football_players BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', NEW.id, NULL, {player_json('NEW')}, {NOW_SQL});
+    END
+    ''',
+    'live_events_player_update': f'''
+    CREATE TRIGGER live_events_player_update AFTER UPDATE ON football_players
+    WHEN {' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in PLAYER_COLUMNS)} BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', NEW.id, {player_json('OLD')}, {player_json('NEW')}, {NOW_SQL});
+    END
+    ''',
+    'live_events_player_delete': f'''
+    CREATE TRIGGER live_events_player_delete AFTER DELETE ON football_players BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', OLD.id, {player_json('OLD')}, NULL, {NOW_SQL});
+    END
+    ''',
+}
+
+
+def upgrade():
+    # The tracker (repository.ensure_schema) may already have created these in the same database
+    if not sa.inspect(op.get_bind()).has_table('live_events'):
+        # AUTOINCREMENT so ids (the SSE event ids) are never reused after pruning; creating the
+        # table also creates sqlite_sequence, which the app reads the latest issued id from
+        op.create_table(
+            'live_events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.Text(), nullable=False),
+            sa.Column('key', sa.Text(), nullable=False),
+            sa.Column('old', sa.Text(), nullable=True),
+            sa.Column('new', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sqlite_autoincrement=True,
+        )
+    for name, statement in TRIGGERS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(statement)
+
+
+def downgrade():
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table('live_events')
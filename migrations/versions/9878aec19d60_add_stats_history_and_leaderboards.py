@@ -0,0 +1,66 @@
+"""Add player_stats_history and player_leaderboards, behind /players/leaderboards
+
+Revision ID: 9878aec19d60
+Revises: 7d12e22868e4
+Create Date: 2026-10-19 10:05:51.410362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9878aec19d60'
+down_revision = '7d12e22868e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tracker (repository.ensure_schema) may already have created these in the same database
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('player_stats_history'):
+        # Append-only: one row per player each time an ingest inserted or changed their stats
+        op.create_table(
+            'player_stats_history',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('player_id', sa.String(), nullable=False),
+            sa.Column('team', sa.String(), nullable=True),
+            sa.Column('league', sa.String(), nullable=True),
+            sa.Column('games_played', sa.Integer(), nullable=True),
+            sa.Column('goals', sa.Integer(), nullable=True),
+            sa.Column('assists', sa.Integer(), nullable=True),
+            sa.Column('recorded_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        # Trend baselines look up each player's snapshots by time
+        op.create_index('ix_player_stats_history_player', 'player_stats_history', ['player_id', 'recorded_at'],
+                        unique=False)
+
+    if not inspector.has_table('player_leaderboards'):
+        # The primary key makes every board one range read, in rank order
+        op.create_table(
+            'player_leaderboards',
+            sa.Column('stat', sa.Text(), nullable=False),
+            sa.Column('scope', sa.Text(), nullable=False),
+            sa.Column('scope_value', sa.Text(), nullable=False),
+            sa.Column('ordinal', sa.Integer(), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('player_id', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('team', sa.String(), nullable=True),
+            sa.Column('country', sa.String(), nullable=True),
+            sa.Column('league', sa.String(), nullable=True),
+            sa.Column('position', sa.String(), nullable=True),
+            sa.Column('image', sa.String(), nullable=True),
+            sa.Column('value', sa.Integer(), nullable=False),
+            sa.Column('change', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('stat', 'scope', 'scope_value', 'ordinal'),
+        )
+
+
+def downgrade():
+    op.drop_table('player_leaderboards')
+    op.drop_index('ix_player_stats_history_player', table_name='player_stats_history')
+    op.drop_table('player_stats_history')
@@ -0,0 +1,28 @@
+"""Add league to football_players
+
+Revision ID: 9e4d1c6b2a57
+Revises: c71e4a2f9d30
+Create Date: 2026-10-18 16:41:09.527318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4d1c6b2a57'
+down_revision = 'c71e4a2f9d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tracker (repository.ensure_schema) may already have added it to the same database
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('football_players')}
+    if 'league' not in columns:
+        op.add_column('football_players', sa.Column('league', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('football_players') as batch_op:
+        batch_op.drop_column('league')
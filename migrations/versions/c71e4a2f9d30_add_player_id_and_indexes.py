@@ -0,0 +1,43 @@
+"""Add player_id/stats_hash and read indexes to football_players
+
+Revision ID: c71e4a2f9d30
+Revises: 3b9d2e7c41a6
+Create Date: 2026-10-18 14:03:27.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e4a2f9d30'
+down_revision = '3b9d2e7c41a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tracker (repository.ensure_schema) may already have added these to the same database
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('football_players')}
+    indexes = {index['name'] for index in inspector.get_indexes('football_players')}
+
+    if 'player_id' not in columns:
+        op.add_column('football_players', sa.Column('player_id', sa.String(), nullable=True))
+    if 'stats_hash' not in columns:
+        op.add_column('football_players', sa.Column('stats_hash', sa.String(), nullable=True))
+    if 'ix_football_players_player_id' not in indexes:
+        op.create_index('ix_football_players_player_id', 'football_players', ['player_id'], unique=True)
+    if 'ix_football_players_team' not in indexes:
+        op.create_index('ix_football_players_team', 'football_players', ['team'], unique=False)
+    if 'ix_football_players_country' not in indexes:
+        op.create_index('ix_football_players_country', 'football_players', ['country'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_football_players_country', table_name='football_players')
+    op.drop_index('ix_football_players_team', table_name='football_players')
+    op.drop_index('ix_football_players_player_id', table_name='football_players')
+    with op.batch_alter_table('football_players') as batch_op:
+        batch_op.drop_column('stats_hash')
+        batch_op.drop_column('player_id')
@@ -0,0 +1,40 @@
+"""Add player_clusters, the precomputed clusters behind /players/clusters
+
+Revision ID: dae1300a0331
+Revises: 9e4d1c6b2a57
+Create Date: 2026-10-19 09:12:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dae1300a0331'
+down_revision = '9e4d1c6b2a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tracker (repository.ensure_schema) may already have created it in the same database
+    if sa.inspect(op.get_bind()).has_table('player_clusters'):
+        return
+    # The primary key is the index every /players/clusters read goes through
+    op.create_table(
+        'player_clusters',
+        sa.Column('group_by', sa.Text(), nullable=False),
+        sa.Column('precision', sa.Integer(), nullable=False),
+        sa.Column('cluster_key', sa.Text(), nullable=False),
+        sa.Column('label', sa.Text(), nullable=False),
+        sa.Column('player_count', sa.Integer(), nullable=False),
+        sa.Column('lat', sa.Float(), nullable=True),
+        sa.Column('lng', sa.Float(), nullable=True),
+        sa.Column('top_players', sa.Text(), nullable=False),
+        sa.Column('filters', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('group_by', 'precision', 'cluster_key'),
+    )
+
+
+def downgrade():
+    op.drop_table('player_clusters')
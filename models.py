@@ -8,15 +8,20 @@ class FootballPlayer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     date_of_birth = db.Column(db.Date, nullable=False)
-    team = db.Column(db.String, nullable=False)
-    country = db.Column(db.String, nullable=False)
+    team = db.Column(db.String, nullable=False, index=True)
+    country = db.Column(db.String, nullable=False, index=True)
+    league = db.Column(db.String)  # League of the team the tracker found the player at
     city = db.Column(db.String, nullable=False)
+    lat = db.Column(db.Float)
+    lng = db.Column(db.Float)
     games_played = db.Column(db.Integer, default=0)
     goals = db.Column(db.Integer, default=0)
     assists = db.Column(db.Integer, default=0)
     position = db.Column(db.String, nullable=False)
     player_number = db.Column(db.Integer, nullable=False)
     image = db.Column(db.String)
+    player_id = db.Column(db.String, unique=True, index=True)  # API-Football player ID, set by the tracker
+    stats_hash = db.Column(db.String)  # Hash of the last ingested stats, used to skip unchanged rows
     last_updated = db.Column(db.DateTime)
 
     def __repr__(self):
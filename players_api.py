@@ -0,0 +1,111 @@
+from repository import PLAYER_COLUMNS, PLAYER_FILTERS
+
+# Query parameters that switch /players from the full snapshot to a filtered query
+QUERY_PARAMS = set(PLAYER_FILTERS) | {'fields', 'cursor', 'limit', 'format'}
+
+# Computed fields that are not stored columns
+EXTRA_FIELDS = ['value']
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+INTEGER_FILTERS = {'min_goals', 'min_games'}
+FLOAT_FILTERS = {'min_lat', 'max_lat', 'min_lng', 'max_lng'}
+
+
+def wants_query(args):
+    """True when the request asks for anything other than the plain full player list."""
+    return any(name in args for name in QUERY_PARAMS)
+
+
+def parse_int(args, name, minimum=0):
+    try:
+        value = int(args[name])
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    if value < minimum:
+        raise ValueError(f"'{name}' must be at least {minimum}")
+    return value
+
+
+def parse_float(args, name):
+    try:
+        return float(args[name])
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number")
+
+
+def parse_players_query(args):
+    """Turn /players query parameters into keyword arguments for query_players().
+
+    Raises ValueError with a message suitable for a 400 response.
+    """
+    filters = {}
+    for name in PLAYER_FILTERS:
+        if name in args:
+            if name in INTEGER_FILTERS:
+                filters[name] = parse_int(args, name)
+            elif name in FLOAT_FILTERS:
+                filters[name] = parse_float(args, name)
+            else:
+                filters[name] = args[name]
+
+    fields = PLAYER_COLUMNS + EXTRA_FIELDS
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = set(fields) - set(PLAYER_COLUMNS + EXTRA_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    after_id = parse_int(args, 'cursor') if 'cursor' in args else None
+    limit = parse_int(args, 'limit', minimum=1) if 'limit' in args else DEFAULT_PAGE_SIZE
+
+    output_format = args.get('format', 'records')
+    if output_format not in ('records', 'columnar'):
+        raise ValueError("'format' must be 'records' or 'columnar'")
+
+    return {
+        'filters': filters,
+        'fields': fields,
+        'after_id': after_id,
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'format': output_format,
+    }
+
+
+def query_players(repo, query, geocode=None):
+    """Run a parsed /players query. Returns (payload, next_cursor or None)."""
+    fields = query['fields']
+    stored_fields = [field for field in fields if field in PLAYER_COLUMNS]
+    # Coordinates may need the city and its country for a geocode fallback, like the snapshot does
+    wants_coordinates = 'lat' in fields or 'lng' in fields
+    extra_fields = [field for field in ('city', 'country') if wants_coordinates and field not in stored_fields]
+    select_fields = stored_fields + extra_fields
+
+    players, last_id = repo.query_players(
+        query['filters'], select_fields, after_id=query['after_id'], limit=query['limit']
+    )
+    for player in players:
+        if ('lat' in player and player['lat'] is None) or ('lng' in player and player['lng'] is None):
+            lat, lng = geocode(player['city'], player['country']) if geocode else (None, None)
+            if 'lat' in player:
+                player['lat'] = lat
+            if 'lng' in player:
+                player['lng'] = lng
+        if 'value' in fields:
+            player['value'] = 0  # Placeholder for player value, adjust as needed
+        for field in extra_fields:
+            del player[field]
+
+    # A short page means there is nothing after it
+    next_cursor = str(last_id) if len(players) == query['limit'] else None
+
+    if query['format'] == 'columnar':
+        payload = {
+            'fields': fields,
+            'columns': [[player[field] for player in players] for field in fields],
+            'next_cursor': next_cursor,
+        }
+    else:
+        payload = [{field: player[field] for field in fields} for player in players]
+    return payload, next_cursor
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import threading
+import time
+
+from geocoding import MISS
+from metrics import CACHE_REQUESTS
+from repository import connect
+from responses import STATIC_LEVELS, compress, dumps
+
+# A snapshot with cities the geocode job hasn't resolved yet (or whose lookup failed) is retried after this long
+RETRY_INCOMPLETE_SECONDS = 60
+
+# Key and lifetime of the snapshot in the cross-worker cache
+SHARED_SNAPSHOT_KEY = 'players_snapshot'
+SHARED_SNAPSHOT_TTL = 24 * 60 * 60
+
+
+class PlayersSnapshot:
+    """Prebuilt /players JSON body that is rebuilt only when football_players changes.
+
+    Change detection uses PRAGMA data_version on a long-lived connection, which moves
+    whenever another connection (the tracker, a migration, ...) commits to the database.
+    That includes the geocode cache and team index tables, so a moved version only triggers
+    a rebuild once players_fingerprint() confirms football_players changed.
+
+    With `shared` (a shared_cache.SharedCache), a worker that sees a change first checks whether
+    another worker already built the body for the table's current fingerprint.
+    """
+
+    def __init__(self, repo, geocode=None, shared=None):
+        self.repo = repo
+        # Fallback for rows that have no stored coordinates yet: (lat, lng), None for an unknown city,
+        # or geocoding.MISS for one not looked up yet; the snapshot is then retried, as when it raises
+        self.geocode = geocode
+        self.shared = shared
+        # Only used for change detection: data_version is tracked per connection. Opened on first
+        # use, so a snapshot can be created (and warmed, then closed) before worker processes fork.
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._fingerprint = None  # players_fingerprint() of the table the body was built from
+        self._incomplete_since = None  # Set while some cities are missing coordinates for now
+        self._unresolved = False
+        self.body = None
+        self.etag = None
+        self._encoded = {}  # encoding -> compressed body, made once per snapshot
+
+    def locate(self, city, country):
+        """(lat, lng) for a city, or (None, None) when it is unknown or not resolved yet."""
+        try:
+            coords = self.geocode(city, country) if self.geocode else None
+        except Exception as e:
+            logging.warning(f"Geocoding failed for {city}: {e}")
+            coords = MISS
+        if coords is MISS:
+            # Not geocoded yet: leave the point off the globe until the retry
+            self._unresolved = True
+            return None, None
+        return coords if coords else (None, None)
+
+    def build_players(self):
+        """Read every player and return the list of dicts served by /players."""
+        self._unresolved = False
+        player_data = self.repo.fetch_players()
+        for player in player_data:
+            if player['lat'] is None or player['lng'] is None:
+                player['lat'], player['lng'] = self.locate(player['city'], player['country'])
+            player['value'] = 0  # Placeholder for player value, adjust as needed
+        return player_data
+
+    def rebuild(self):
+        """Serialize the player list once and remember its ETag."""
+        players = self.build_players()
+        body = dumps(players)
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._encoded = {}
+        # Cities that are simply unknown stay off the globe; only unresolved ones are worth retrying
+        self._incomplete_since = time.monotonic() if self._unresolved else None
+
+    def _retry_due(self):
+        return (self._incomplete_since is not None
+                and time.monotonic() - self._incomplete_since >= RETRY_INCOMPLETE_SECONDS)
+
+    def load_shared(self, fingerprint):
+        """Take the body another worker built for this fingerprint. Returns False if there is none."""
+        try:
+            entry = self.shared.get(SHARED_SNAPSHOT_KEY)
+        except Exception as e:
+            logging.warning(f"Shared /players snapshot read failed: {e}")
+            return False
+        if not entry or entry['fingerprint'] != fingerprint:
+            return False
+        self.body = entry['body'].encode('utf-8')
+        self.etag = entry['etag']
+        self._encoded = {}
+        self._incomplete_since = None
+        return True
+
+    def refresh(self):
+        """Reuse a snapshot built by another worker, or build one and share it."""
+        fingerprint = self._fingerprint = self.repo.players_fingerprint()
+        if self.shared is None:
+            self.rebuild()
+            return
+
+        if not self._retry_due() and self.load_shared(fingerprint):
+            return
+        self.rebuild()
+        if self._incomplete_since is None:  # Only complete snapshots are worth sharing
+            try:
+                self.shared.set(SHARED_SNAPSHOT_KEY, {
+                    'fingerprint': fingerprint, 'body': self.body.decode('utf-8'), 'etag': self.etag
+                }, SHARED_SNAPSHOT_TTL)
+            except Exception as e:
+                logging.warning(f"Shared /players snapshot write failed: {e}")
+
+    def _read_data_version(self):
+        if self._conn is not None:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._conn = connect(self.repo.db_path, check_same_thread=False)
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        # Versions of different connections can't be compared: after a reopen, keep the body
+        # (built before close(), e.g. in a preloading master) only if the table is unchanged
+        unchanged = self.body is not None and self.repo.players_fingerprint() == self._fingerprint
+        self._data_version = version if unchanged else None
+        return version
+
+    def close(self):
+        """Close the change-detection connection; the next get() opens a new one."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, encoding=None):
+        """Return (body, etag), rebuilding first if the table changed since the last build.
+
+        With an `encoding` ('gzip' or 'br') the body comes compressed, from a copy made once
+        per snapshot, and the ETag names the encoding.
+        """
+        with self._lock:
+            # Read the version before building so a write that races the rebuild triggers another one
+            version = self._read_data_version()
+            stale = self.body is None or self._retry_due()
+            if not stale and version != self._data_version:
+                stale = self.repo.players_fingerprint() != self._fingerprint
+                if not stale:  # A write to another table in the same file
+                    self._data_version = version
+            if stale:
+                CACHE_REQUESTS.inc(cache='players_snapshot', result='miss')
+                self.refresh()
+                self._data_version = version
+            else:
+                CACHE_REQUESTS.inc(cache='players_snapshot', result='hit')
+            if encoding is None:
+                return self.body, self.etag
+            if encoding not in self._encoded:
+                self._encoded[encoding] = compress(self.body, encoding, STATIC_LEVELS)
+            return self._encoded[encoding], f"{self.etag}-{encoding}"
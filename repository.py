@@ -0,0 +1,575 @@
+"""Data access for football_players, shared by the web app and the tracker.
+
+ensure_schema (`flask init-db`) creates the full schema. The Alembic migrations (head:
+9878aec19d60) create the same football_players columns and indexes and the tables the routes
+read, but not crawl_checkpoints, and init-db also recreates the live_events triggers from the
+current columns. Both processes open the same database file through this module, so they
+agree on columns and indexes.
+"""
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from metrics import DB_QUERY_DURATION
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTANCE_DIR = os.path.join(ROOT_DIR, 'instance')
+DEFAULT_DB_PATH = os.getenv('DATABASE_PATH', os.path.join(INSTANCE_DIR, 'israeli_football.db'))
+
+# How long a connection waits for another process's write lock (milliseconds)
+BUSY_TIMEOUT_MS = 5000
+
+# Idle connections kept per repository
+POOL_SIZE = 8
+
+# Same columns, types and constraints as models.FootballPlayer after the migrations
+CREATE_PLAYERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS football_players (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    date_of_birth DATE NOT NULL,
+    team VARCHAR NOT NULL,
+    country VARCHAR NOT NULL,
+    city VARCHAR NOT NULL,
+    lat FLOAT,
+    lng FLOAT,
+    games_played INTEGER,
+    goals INTEGER,
+    assists INTEGER,
+    position VARCHAR NOT NULL,
+    player_number INTEGER NOT NULL,
+    image VARCHAR,
+    player_id VARCHAR,
+    stats_hash VARCHAR,
+    last_updated DATETIME,
+    league VARCHAR,
+    PRIMARY KEY (id)
+)
+'''
+
+CREATE_INDEXES_SQL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_football_players_player_id ON football_players (player_id)",
+    "CREATE INDEX IF NOT EXISTS ix_football_players_team ON football_players (team)",
+    "CREATE INDEX IF NOT EXISTS ix_football_players_country ON football_players (country)",
+]
+
+# Columns older databases may lack (the tracker's original table had no image/player_number)
+ADDED_COLUMNS = [
+    ("lat", "FLOAT"),
+    ("lng", "FLOAT"),
+    ("player_number", "INTEGER NOT NULL DEFAULT 0"),
+    ("image", "VARCHAR"),
+    ("player_id", "VARCHAR"),
+    ("stats_hash", "VARCHAR"),
+    ("league", "VARCHAR"),
+]
+
+CREATE_CHECKPOINTS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    league TEXT NOT NULL,
+    season TEXT NOT NULL,
+    last_page INTEGER NOT NULL,
+    total_pages INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (league, season)
+)
+'''
+
+# Clusters for the globe, rebuilt after each ingest (see clusters.py)
+CREATE_CLUSTERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS player_clusters (
+    group_by TEXT NOT NULL,
+    precision INTEGER NOT NULL,
+    cluster_key TEXT NOT NULL,
+    label TEXT NOT NULL,
+    player_count INTEGER NOT NULL,
+    lat FLOAT,
+    lng FLOAT,
+    top_players TEXT NOT NULL,
+    filters TEXT NOT NULL,
+    PRIMARY KEY (group_by, precision, cluster_key)
+)
+'''
+
+CLUSTER_COLUMNS = ['cluster_key', 'label', 'player_count', 'lat', 'lng', 'top_players', 'filters']
+
+INSERT_CLUSTER_SQL = '''
+INSERT INTO player_clusters (group_by, precision, cluster_key, label, player_count, lat, lng, top_players, filters)
+VALUES (:group_by, :precision, :cluster_key, :label, :player_count, :lat, :lng, :top_players, :filters)
+'''
+
+SELECT_CLUSTERS_SQL = f'''
+SELECT {', '.join(CLUSTER_COLUMNS)} FROM player_clusters
+WHERE group_by = ? AND precision = ? ORDER BY player_count DESC, cluster_key
+'''
+
+# Append-only: a player's stats each time an ingest inserted or changed them (see leaderboards.py)
+CREATE_STATS_HISTORY_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS player_stats_history (
+    id INTEGER PRIMARY KEY,
+    player_id VARCHAR NOT NULL,
+    team VARCHAR,
+    league VARCHAR,
+    games_played INTEGER,
+    goals INTEGER,
+    assists INTEGER,
+    recorded_at DATETIME NOT NULL
+)
+'''
+
+CREATE_STATS_HISTORY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS ix_player_stats_history_player ON player_stats_history (player_id, recorded_at)"
+)
+
+INSERT_STATS_HISTORY_SQL = '''
+INSERT INTO player_stats_history (player_id, team, league, games_played, goals, assists, recorded_at)
+VALUES (:player_id, :team, :league, :games_played, :goals, :assists, :last_updated)
+'''
+
+# Each player's latest snapshot taken at or before a point in time (the baseline of a trend)
+SELECT_STATS_AS_OF_SQL = '''
+SELECT history.player_id, history.games_played, history.goals, history.assists
+FROM player_stats_history AS history
+JOIN (
+    SELECT player_id, MAX(recorded_at) AS recorded_at FROM player_stats_history
+    WHERE recorded_at <= ? GROUP BY player_id
+) AS latest ON latest.player_id = history.player_id AND latest.recorded_at = history.recorded_at
+'''
+
+# Top players per stat and scope, rebuilt after each ingest (see leaderboards.py); `ordinal` keeps
+# tied players (same `rank`) in a stable order, and the key makes every board one range read
+CREATE_LEADERBOARDS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS player_leaderboards (
+    stat TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    scope_value TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    player_id VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    team VARCHAR,
+    country VARCHAR,
+    league VARCHAR,
+    position VARCHAR,
+    image VARCHAR,
+    value INTEGER NOT NULL,
+    change INTEGER,
+    PRIMARY KEY (stat, scope, scope_value, ordinal)
+)
+'''
+
+LEADERBOARD_COLUMNS = [
+    'rank', 'player_id', 'name', 'team', 'country', 'league', 'position', 'image', 'value', 'change'
+]
+
+INSERT_LEADERBOARD_SQL = '''
+INSERT INTO player_leaderboards
+(stat, scope, scope_value, ordinal, rank, player_id, name, team, country, league, position, image, value, change)
+VALUES (:stat, :scope, :scope_value, :ordinal, :rank, :player_id, :name, :team, :country, :league, :position,
+        :image, :value, :change)
+'''
+
+SELECT_LEADERBOARD_SQL = f'''
+SELECT {', '.join(LEADERBOARD_COLUMNS)} FROM player_leaderboards
+WHERE stat = ? AND scope = ? AND scope_value = ? ORDER BY ordinal LIMIT ?
+'''
+
+# What the leaderboards are ranked from: every stored player with its league and API ID
+RANKED_PLAYER_COLUMNS = [
+    'player_id', 'name', 'team', 'country', 'league', 'position', 'image', 'games_played', 'goals', 'assists'
+]
+
+SELECT_RANKED_PLAYERS_SQL = f"SELECT {', '.join(RANKED_PLAYER_COLUMNS)} FROM football_players WHERE player_id IS NOT NULL"
+
+# Keep the newest row of any duplicate player_id so the unique index can be built
+DEDUPLICATE_PLAYERS_SQL = '''
+DELETE FROM football_players WHERE player_id IS NOT NULL AND id NOT IN (
+    SELECT MAX(id) FROM football_players WHERE player_id IS NOT NULL GROUP BY player_id
+)
+'''
+
+# Columns served by /players, in response order
+PLAYER_COLUMNS = [
+    'id', 'name', 'city', 'lat', 'lng', 'date_of_birth', 'team', 'country',
+    'games_played', 'goals', 'assists', 'position', 'player_number', 'image'
+]
+
+SELECT_PLAYERS_SQL = f"SELECT {', '.join(PLAYER_COLUMNS)} FROM football_players"
+
+# Change feed behind /events (see live_events.py); AUTOINCREMENT so ids are never reused after pruning
+CREATE_LIVE_EVENTS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS live_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    old TEXT,
+    new TEXT,
+    created_at REAL NOT NULL
+)
+'''
+
+
+# Tables the apps read, checked before serving data (Services.check_schema); crawl_checkpoints is
+# left out, since only the tracker uses it and it creates its schema itself. The geocode cache and
+# the team index are created by GeocodeCache/TeamIndex.setup_database(), which `flask init-db` runs.
+SCHEMA_TABLES = ['football_players', 'player_clusters', 'live_events', 'player_stats_history', 'player_leaderboards',
+                 'geocode_cache', 'team_index']
+
+
+def player_json(row):
+    """SQL for a JSON object of a trigger row's (NEW or OLD) served columns."""
+    pairs = ', '.join("'%s', %s.%s" % (column, row, column) for column in PLAYER_COLUMNS)
+    return f"json_object({pairs})"
+
+
+# Every writer (tracker, clusters, migrations) feeds the change log in the same transaction as its
+# write. Updates are logged only when a served column changed, so hash-only rewrites stay silent.
+LIVE_EVENT_NOW_SQL = "(julianday('now') - 2440587.5) * 86400.0"
+LIVE_EVENT_TRIGGERS_SQL = {
+    'live_events_player_insert': f'''
+    CREATE TRIGGER live_events_player_insert AFTER INSERT ON football_players BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', NEW.id, NULL, {player_json('NEW')}, {LIVE_EVENT_NOW_SQL});
+    END
+    ''',
+    'live_events_player_update': f'''
+    CREATE TRIGGER live_events_player_update AFTER UPDATE ON football_players
+    WHEN {' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in PLAYER_COLUMNS)} BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', NEW.id, {player_json('OLD')}, {player_json('NEW')}, {LIVE_EVENT_NOW_SQL});
+    END
+    ''',
+    'live_events_player_delete': f'''
+    CREATE TRIGGER live_events_player_delete AFTER DELETE ON football_players BEGIN
+        INSERT INTO live_events (kind, key, old, new, created_at)
+        VALUES ('player', OLD.id, {player_json('OLD')}, NULL, {LIVE_EVENT_NOW_SQL});
+    END
+    ''',
+}
+
+INSERT_LIVE_EVENT_SQL = f'''
+INSERT INTO live_events (kind, key, old, new, created_at) VALUES (?, ?, ?, ?, {LIVE_EVENT_NOW_SQL})
+'''
+
+SELECT_LIVE_EVENTS_SQL = "SELECT id, kind, key, old, new FROM live_events WHERE id > ? ORDER BY id LIMIT ?"
+
+# (oldest kept id, latest id ever issued); the sequence survives pruning an empty table. Creating
+# live_events (AUTOINCREMENT) creates sqlite_sequence; its live_events row appears with the first event.
+LIVE_EVENT_BOUNDS_SQL = '''
+SELECT (SELECT MIN(id) FROM live_events),
+       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'live_events'), (SELECT MAX(id) FROM live_events), 0)
+'''
+
+# Filters accepted by query_players; team and country are backed by indexes
+PLAYER_FILTERS = {
+    'team': 'team = ?',
+    'country': 'country = ?',
+    'city': 'city = ?',
+    'position': 'position = ?',
+    'min_goals': 'goals >= ?',
+    'min_games': 'games_played >= ?',
+    # Bounding box, e.g. a geohash cluster's cell
+    'min_lat': 'lat >= ?',
+    'max_lat': 'lat < ?',
+    'min_lng': 'lng >= ?',
+    'max_lng': 'lng < ?',
+}
+
+SELECT_DISTINCT_CITIES_SQL = "SELECT DISTINCT city FROM football_players"
+SELECT_DISTINCT_TEAMS_SQL = "SELECT DISTINCT team FROM football_players WHERE team IS NOT NULL AND team != ''"
+
+# Cheap summary that changes whenever the tracker inserts, updates (last_updated) or rows are deleted;
+# the change log's newest id also catches edits that keep last_updated (e.g. stored coordinates).
+# Read from live_events itself, not sqlite_sequence, which only exists once an AUTOINCREMENT row has.
+PLAYERS_FINGERPRINT_SQL = '''
+SELECT COUNT(*), MAX(id), MAX(last_updated), (SELECT MAX(id) FROM live_events)
+FROM football_players
+'''
+
+# Insert new players and rewrite existing ones only when their stats hash changed
+UPSERT_PLAYER_SQL = '''
+INSERT INTO football_players
+(name, date_of_birth, team, country, league, city, lat, lng, games_played, goals, assists, position,
+ player_number, image, player_id, stats_hash, last_updated)
+VALUES (:name, :date_of_birth, :team, :country, :league, :city, :lat, :lng, :games_played, :goals, :assists,
+        :position, :player_number, :image, :player_id, :stats_hash, :last_updated)
+ON CONFLICT(player_id) DO UPDATE SET
+    name=excluded.name, date_of_birth=excluded.date_of_birth, team=excluded.team, country=excluded.country,
+    league=excluded.league, city=excluded.city, lat=excluded.lat, lng=excluded.lng,
+    games_played=excluded.games_played, goals=excluded.goals, assists=excluded.assists,
+    position=excluded.position, player_number=excluded.player_number, image=excluded.image,
+    stats_hash=excluded.stats_hash, last_updated=excluded.last_updated
+WHERE football_players.stats_hash IS NOT excluded.stats_hash
+'''
+
+SELECT_CHECKPOINT_SQL = '''
+SELECT last_page, total_pages, completed FROM crawl_checkpoints WHERE league = ? AND season = ?
+'''
+
+SAVE_CHECKPOINT_SQL = '''
+INSERT OR REPLACE INTO crawl_checkpoints (league, season, last_page, total_pages, completed, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+class SchemaNotReadyError(Exception):
+    """Raised when the database lacks tables the apps read; `flask init-db` creates them."""
+
+
+def connect(db_path, **kwargs):
+    """Open a connection with the pragmas every reader and writer should use."""
+    conn = sqlite3.connect(db_path, **kwargs)
+    # WAL lets the web app keep reading while an ingest is writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+class PlayerRepository:
+    """Pooled access to football_players and the crawl checkpoints.
+
+    Queries are module-level constants, so each pooled connection's statement cache
+    keeps them prepared between calls.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool_size=POOL_SIZE):
+        self.db_path = db_path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection (opened on demand, returned when done)."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = connect(self.db_path, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit everything done with it, or roll it all back."""
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def ensure_schema(self):
+        """Create the tables, or bring an older database up to the current schema."""
+        with self.transaction() as conn:
+            conn.execute(CREATE_PLAYERS_TABLE_SQL)
+            conn.execute(CREATE_CHECKPOINTS_TABLE_SQL)
+            conn.execute(CREATE_CLUSTERS_TABLE_SQL)
+            conn.execute(CREATE_LIVE_EVENTS_TABLE_SQL)
+            conn.execute(CREATE_STATS_HISTORY_TABLE_SQL)
+            conn.execute(CREATE_STATS_HISTORY_INDEX_SQL)
+            conn.execute(CREATE_LEADERBOARDS_TABLE_SQL)
+
+            existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(football_players)")}
+            for column, column_type in ADDED_COLUMNS:
+                if column not in existing_columns:
+                    conn.execute(f"ALTER TABLE football_players ADD COLUMN {column} {column_type}")
+
+            conn.execute(DEDUPLICATE_PLAYERS_SQL)
+            for statement in CREATE_INDEXES_SQL:
+                conn.execute(statement)
+
+            # Recreated every time so they always log the current PLAYER_COLUMNS
+            for name, statement in LIVE_EVENT_TRIGGERS_SQL.items():
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(statement)
+
+    def missing_tables(self):
+        """The SCHEMA_TABLES the database lacks (all of them when the file doesn't exist yet)."""
+        if not os.path.exists(self.db_path):  # Connecting would create an empty file
+            return list(SCHEMA_TABLES)
+        with self.connection() as conn:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return [table for table in SCHEMA_TABLES if table not in existing]
+
+    @DB_QUERY_DURATION.time(query='fetch_players')
+    def fetch_players(self):
+        """Every player as a dict with the /players columns."""
+        with self.connection() as conn:
+            return [dict(zip(PLAYER_COLUMNS, row)) for row in conn.execute(SELECT_PLAYERS_SQL)]
+
+    @DB_QUERY_DURATION.time(query='query_players')
+    def query_players(self, filters=None, fields=None, after_id=None, limit=None):
+        """A filtered, projected page of players in id order.
+
+        Returns (players, last_id); pass last_id back as `after_id` to get the next page.
+        Pagination is keyset-based, so every page costs the same however deep it is.
+        """
+        fields = PLAYER_COLUMNS if fields is None else list(fields)
+        unknown = set(fields) - set(PLAYER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        clauses, params = [], []
+        for name, value in (filters or {}).items():
+            clauses.append(PLAYER_FILTERS[name])
+            params.append(value)
+        if after_id is not None:
+            clauses.append('id > ?')
+            params.append(after_id)
+
+        # id is always read for the cursor, even for an empty projection (e.g. ?fields=value)
+        sql = f"SELECT {', '.join(['id'] + fields)} FROM football_players"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        players = [dict(zip(fields, row[1:])) for row in rows]
+        return players, (rows[-1][0] if rows else None)
+
+    @DB_QUERY_DURATION.time(query='players_fingerprint')
+    def players_fingerprint(self):
+        """A value that changes when football_players does; comparable across processes."""
+        with self.connection() as conn:
+            return list(conn.execute(PLAYERS_FINGERPRINT_SQL).fetchone())
+
+    @DB_QUERY_DURATION.time(query='distinct_cities')
+    def distinct_cities(self):
+        with self.connection() as conn:
+            return [row[0] for row in conn.execute(SELECT_DISTINCT_CITIES_SQL)]
+
+    @DB_QUERY_DURATION.time(query='distinct_teams')
+    def distinct_teams(self):
+        with self.connection() as conn:
+            return [row[0] for row in conn.execute(SELECT_DISTINCT_TEAMS_SQL)]
+
+    @DB_QUERY_DURATION.time(query='existing_hashes')
+    def existing_hashes(self, player_ids):
+        """Return {player_id: stats_hash} for the given players that are already stored."""
+        player_ids = list(player_ids)
+        hashes = {}
+        with self.connection() as conn:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(player_ids), 500):
+                chunk = player_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                hashes.update(conn.execute(
+                    f"SELECT player_id, stats_hash FROM football_players WHERE player_id IN ({placeholders})", chunk
+                ))
+        return hashes
+
+    @DB_QUERY_DURATION.time(query='upsert_players')
+    def upsert_players(self, conn, players):
+        """Batch-upsert player dicts on `conn` (part of the caller's transaction)."""
+        conn.executemany(UPSERT_PLAYER_SQL, players)
+
+    def append_stats_history(self, conn, players):
+        """Snapshot the stats of upserted player dicts on `conn` (part of the caller's transaction)."""
+        conn.executemany(INSERT_STATS_HISTORY_SQL, players)
+
+    @DB_QUERY_DURATION.time(query='stats_as_of')
+    def stats_as_of(self, when):
+        """{player_id: {'games_played', 'goals', 'assists'}} from each player's last snapshot at or before `when`."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_STATS_AS_OF_SQL, (when,)).fetchall()
+        return {player_id: {'games_played': games, 'goals': goals, 'assists': assists}
+                for player_id, games, goals, assists in rows}
+
+    @DB_QUERY_DURATION.time(query='fetch_ranked_players')
+    def fetch_ranked_players(self):
+        with self.connection() as conn:
+            return [dict(zip(RANKED_PLAYER_COLUMNS, row)) for row in conn.execute(SELECT_RANKED_PLAYERS_SQL)]
+
+    def get_checkpoint(self, league, season):
+        """Return (last_page, total_pages, completed) for a league season, or None."""
+        with self.connection() as conn:
+            return conn.execute(SELECT_CHECKPOINT_SQL, (str(league), str(season))).fetchone()
+
+    def save_checkpoint(self, conn, league, season, last_page, total_pages, updated_at):
+        """Record the last stored page on `conn` (part of the caller's transaction)."""
+        completed = 1 if last_page >= total_pages else 0
+        conn.execute(SAVE_CHECKPOINT_SQL, (str(league), str(season), last_page, total_pages, completed, updated_at))
+
+    def store_city_coordinates(self, conn, coordinates):
+        """Fill in lat/lng for players of each city that has none yet; `coordinates` is {(city, country): (lat, lng)}."""
+        conn.executemany(
+            "UPDATE football_players SET lat = ?, lng = ? WHERE city = ? AND country = ? AND (lat IS NULL OR lng IS NULL)",
+            [(lat, lng, city, country) for (city, country), (lat, lng) in coordinates.items()]
+        )
+
+    def replace_clusters(self, conn, clusters):
+        """Swap in a fresh set of cluster rows on `conn` (part of the caller's transaction)."""
+        conn.execute("DELETE FROM player_clusters")
+        conn.executemany(INSERT_CLUSTER_SQL, clusters)
+
+    @DB_QUERY_DURATION.time(query='fetch_clusters')
+    def fetch_clusters(self, group_by, precision):
+        """Stored clusters of one grouping, largest first."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_CLUSTERS_SQL, (group_by, precision)).fetchall()
+        return [dict(zip(CLUSTER_COLUMNS, row)) for row in rows]
+
+    def has_clusters(self):
+        with self.connection() as conn:
+            return conn.execute("SELECT 1 FROM player_clusters LIMIT 1").fetchone() is not None
+
+    def replace_leaderboards(self, conn, rows):
+        """Swap in a fresh set of leaderboard rows on `conn` (part of the caller's transaction)."""
+        conn.execute("DELETE FROM player_leaderboards")
+        conn.executemany(INSERT_LEADERBOARD_SQL, rows)
+
+    @DB_QUERY_DURATION.time(query='fetch_leaderboard')
+    def fetch_leaderboard(self, stat, scope, scope_value, limit):
+        """The top `limit` rows of one stored leaderboard, best first."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_LEADERBOARD_SQL, (stat, scope, scope_value, limit)).fetchall()
+        return [dict(zip(LEADERBOARD_COLUMNS, row)) for row in rows]
+
+    def has_leaderboards(self):
+        with self.connection() as conn:
+            return conn.execute("SELECT 1 FROM player_leaderboards LIMIT 1").fetchone() is not None
+
+    def record_live_event(self, kind, key, old, new):
+        """Append a change that no trigger sees (fixtures); `old`/`new` are JSON strings or None."""
+        with self.transaction() as conn:
+            conn.execute(INSERT_LIVE_EVENT_SQL, (kind, str(key), old, new))
+
+    @DB_QUERY_DURATION.time(query='live_events_after')
+    def live_events_after(self, after_id, limit):
+        """Up to `limit` (id, kind, key, old, new) rows logged after `after_id`, oldest first."""
+        with self.connection() as conn:
+            return conn.execute(SELECT_LIVE_EVENTS_SQL, (after_id, limit)).fetchall()
+
+    @DB_QUERY_DURATION.time(query='live_event_bounds')
+    def live_event_bounds(self):
+        """(oldest kept id or None, latest issued id or 0)."""
+        with self.connection() as conn:
+            oldest, latest = conn.execute(LIVE_EVENT_BOUNDS_SQL).fetchone()
+        return oldest, latest or 0
+
+    def prune_live_events(self, before):
+        """Drop events logged before the `before` timestamp. Returns the number dropped."""
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM live_events WHERE created_at < ?", (before,)).rowcount
+
+    def clear_checkpoints(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM crawl_checkpoints")
@@ -0,0 +1,102 @@
+"""JSON encoding and response compression shared by the Flask and Quart apps.
+
+orjson is used when it is installed (several times faster than the json module on
+player lists) and brotli likewise; both fall back to the standard library.
+"""
+import gzip
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Same output as Flask's provider: sorted keys, non-str keys allowed, and dates left to `default`
+ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                  | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+# Smaller bodies aren't worth the CPU (they fit in a packet either way)
+COMPRESS_MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript'}
+
+# Per-request compression favours speed; bodies compressed once (the /players snapshot) favour size
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+STATIC_LEVELS = {'br': 9, 'gzip': 9}
+
+
+def dumps(obj, default=None):
+    """Compact JSON as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for jsonify() and app.json, in both the Flask and Quart apps.
+
+    Pretty-printed output (debug mode) still goes through the json module.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.keys() - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default) + b"\n", mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """The best of `encodings` (default: those we can produce, best first) that the client accepts, or None.
+
+    Encodings the client lists with q=0 are refused.
+    """
+    accepted = {}
+    for token in (accept_encoding or '').split(','):
+        name, _, params = token.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        accepted[name.strip().lower()] = quality
+
+    for encoding in encodings if encodings is not None else (['br'] if brotli else []) + ['gzip']:
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, levels=DYNAMIC_LEVELS):
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+
+
+def should_compress(response, size):
+    """True for successful, not yet encoded, compressible bodies above the size threshold."""
+    return (200 <= response.status_code < 300
+            and size >= COMPRESS_MIN_SIZE
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in response.headers)
+
+
+def set_encoded_body(response, data, encoding):
+    """Swap in an encoded body; a strong ETag gets the encoding appended, as each encoding is a different entity."""
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
@@ -0,0 +1,309 @@
+"""Background jobs: the tracker crawl, geocode warm-up, fixture prefetch, /players snapshot rebuild
+and /events log pruning.
+
+The scheduler runs embedded in the web app (SCHEDULER_ENABLED=true) or on its own with
+`flask run-scheduler`. Any number of processes may start one: only the holder of a lease
+in the shared SQLite file runs jobs, so several web workers plus a CLI scheduler still
+crawl once. Per-job run counts and timings are kept in the same file.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from football_api import FootballApiError
+from repository import ROOT_DIR, connect
+from shared_cache import SHARED_CACHE_PATH, quota_ledger
+
+# Seconds between runs of each job
+JOB_INTERVALS = {
+    'crawl': int(os.getenv('SCHEDULE_CRAWL_SECONDS', str(6 * 60 * 60))),
+    'geocode': int(os.getenv('SCHEDULE_GEOCODE_SECONDS', str(60 * 60))),
+    'fixtures': int(os.getenv('SCHEDULE_FIXTURES_SECONDS', str(60 * 60))),
+    'snapshot': int(os.getenv('SCHEDULE_SNAPSHOT_SECONDS', '60')),
+    'prune_events': 60 * 60,
+}
+
+# Each wait is stretched or shortened by up to this fraction, so restarted workers don't run in lockstep
+JITTER = 0.1
+
+# The lease is renewed every third of this while the scheduler runs; a dead runner's lease expires
+LEASE_SECONDS = 120
+
+# How often the loop looks for due jobs (and renews or tries to take the lease)
+TICK_SECONDS = 5
+
+# Daily RapidAPI calls the fixture prefetch leaves for visitors' /next_games requests
+PREFETCH_QUOTA_RESERVE = int(os.getenv('PREFETCH_QUOTA_RESERVE', '20'))
+
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+
+CREATE_LEASE_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS scheduler_lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+'''
+
+CREATE_JOB_STATS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+    name TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_started REAL,
+    last_duration REAL,
+    max_duration REAL,
+    total_duration REAL NOT NULL DEFAULT 0,
+    last_result TEXT,
+    last_error TEXT
+)
+'''
+
+# Take the lease if it is free or expired, or extend it if we hold it; atomic across processes
+ACQUIRE_LEASE_SQL = '''
+INSERT INTO scheduler_lease (name, owner, expires_at) VALUES (:name, :owner, :expires_at)
+ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+WHERE scheduler_lease.owner = excluded.owner OR scheduler_lease.expires_at <= :now
+'''
+
+RECORD_RUN_SQL = '''
+INSERT INTO scheduler_jobs (name, runs, failures, last_started, last_duration, max_duration,
+                            total_duration, last_result, last_error)
+VALUES (:name, 1, :failed, :started, :duration, :duration, :duration, :result, :error)
+ON CONFLICT(name) DO UPDATE SET
+    runs = runs + 1,
+    failures = failures + excluded.failures,
+    last_started = excluded.last_started,
+    last_duration = excluded.last_duration,
+    max_duration = MAX(max_duration, excluded.max_duration),
+    total_duration = total_duration + excluded.total_duration,
+    last_result = excluded.last_result,
+    last_error = excluded.last_error
+'''
+
+JOB_STATS_COLUMNS = ['name', 'runs', 'failures', 'last_started', 'last_duration', 'max_duration',
+                     'total_duration', 'last_result', 'last_error']
+
+
+class SchedulerStore:
+    """The runner lease and per-job stats, in the shared cache's SQLite file."""
+
+    def __init__(self, db_path=SHARED_CACHE_PATH, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex  # Identifies this scheduler among all processes
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = connect(self.db_path)
+        if not self._ready:
+            with conn:
+                conn.execute(CREATE_LEASE_TABLE_SQL)
+                conn.execute(CREATE_JOB_STATS_TABLE_SQL)
+            self._ready = True
+        return conn
+
+    def acquire_lease(self, name='scheduler'):
+        """Take or extend the lease. Returns True while this scheduler is the runner."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(ACQUIRE_LEASE_SQL, {
+                    'name': name, 'owner': self.owner, 'expires_at': now + self.lease_seconds, 'now': now
+                })
+        finally:
+            conn.close()
+        return cursor.rowcount == 1
+
+    def release_lease(self, name='scheduler'):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM scheduler_lease WHERE name = ? AND owner = ?", (name, self.owner))
+        finally:
+            conn.close()
+
+    def record_run(self, name, started, duration, result=None, error=None):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(RECORD_RUN_SQL, {
+                    'name': name, 'failed': 1 if error else 0, 'started': started, 'duration': duration,
+                    'result': result, 'error': error
+                })
+        finally:
+            conn.close()
+
+    def job_stats(self):
+        """{job name: stats dict} for every job that has run at least once."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT {', '.join(JOB_STATS_COLUMNS)} FROM scheduler_jobs").fetchall()
+        finally:
+            conn.close()
+        return {row[0]: dict(zip(JOB_STATS_COLUMNS, row)) for row in rows}
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=JITTER):
+        self.name = name
+        self.func = func  # Called with no arguments; may return a short summary for the stats
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = 0
+
+    def schedule(self, last_started):
+        """Set the next run `interval` (with jitter) after the last one started."""
+        self.next_run = last_started + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """Runs due jobs one at a time on a background thread while holding the lease."""
+
+    def __init__(self, jobs, store=None, tick=TICK_SECONDS):
+        self.jobs = jobs
+        self.store = store or SchedulerStore()
+        self.tick = tick
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._loaded = False
+
+    def _load_schedule(self):
+        """Continue from the recorded runs, so a restart doesn't repeat a crawl that just ran."""
+        stats = self.store.job_stats()
+        for job in self.jobs:
+            last_started = (stats.get(job.name) or {}).get('last_started')
+            if last_started:
+                job.schedule(last_started)
+        self._loaded = True
+
+    def _keep_lease(self, done):
+        # A crawl can outlast the lease; keep renewing it until the job finishes
+        while not done.wait(self.store.lease_seconds / 3):
+            try:
+                self.store.acquire_lease()
+            except Exception as e:  # e.g. the shared SQLite file is locked; try again next time
+                logging.warning(f"Renewing the scheduler lease failed: {e}")
+
+    def run_job(self, job):
+        """Run one job now and record its timing. Errors are logged and recorded, not raised."""
+        done = threading.Event()
+        threading.Thread(target=self._keep_lease, args=(done,), daemon=True).start()
+        started = time.time()
+        start = time.perf_counter()
+        result = error = None
+        try:
+            result = job.func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logging.exception(f"Scheduled job {job.name} failed")
+        finally:
+            done.set()
+        duration = time.perf_counter() - start
+        job.schedule(started)
+        try:
+            self.store.record_run(job.name, started, duration,
+                                  result=None if result is None else str(result), error=error)
+        except Exception as e:
+            logging.warning(f"Recording the {job.name} run failed: {e}")
+        logging.info(f"Scheduled job {job.name} {'failed' if error else 'finished'} in {duration:.2f}s"
+                     + (f" ({result})" if result is not None else ""))
+        return result, error, duration
+
+    def run_pending(self):
+        """Run every due job if this scheduler holds the lease. Returns the names of the jobs run."""
+        if not self.store.acquire_lease():
+            return []
+        if not self._loaded:
+            self._load_schedule()
+        ran = []
+        for job in self.jobs:
+            if self._stop.is_set():
+                break
+            if time.time() >= job.next_run:
+                self.run_job(job)
+                ran.append(job.name)
+        return ran
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:  # e.g. the shared SQLite file is locked for too long
+                logging.warning(f"Scheduler tick failed: {e}")
+            self._stop.wait(self.tick)
+        try:
+            self.store.release_lease()
+        except Exception as e:
+            logging.warning(f"Releasing the scheduler lease failed: {e}")
+
+    def start(self):
+        """Run the loop on a daemon thread (once per process; later calls do nothing)."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def crawl_players(db_path):
+    """The tracker's full run: crawl, geocode new cities, rebuild the clusters and leaderboards."""
+    if DATA_DIR not in sys.path:
+        sys.path.append(DATA_DIR)  # The tracker lives in data/ next to its cache
+    from fetchPlayersData import IsraeliFootballTracker
+
+    tracker = IsraeliFootballTracker(db_path)
+    try:
+        stored = tracker.fetch_football_players(debug=False)
+        tracker.warm_geocode_cache()
+        tracker.refresh_clusters()
+        tracker.refresh_leaderboards()
+    finally:
+        tracker.close()
+    return f"{stored} players crawled"
+
+
+def prefetch_fixtures(football_api, repo, ledger=quota_ledger, reserve=PREFETCH_QUOTA_RESERVE):
+    """Refresh fixtures and team photos of every tracked team, leaving `reserve` calls of today's quota."""
+    limit = ledger.quotas.get('rapidapi', 0)
+    loads = 0
+    teams = repo.distinct_teams()
+    for team_name in teams:
+        if limit and limit - ledger.used('rapidapi') <= reserve:
+            logging.info(f"Fixture prefetch paused: keeping the last {reserve} RapidAPI calls for visitors")
+            break
+        try:
+            loads += football_api.prefetch_next_games(team_name)
+        except FootballApiError as e:
+            if e.status_code in (429, 503):  # Out of quota or the breaker is open: try again next run
+                logging.warning(f"Fixture prefetch stopped at {team_name}: {e.message}")
+                break
+            logging.warning(f"Fixture prefetch for {team_name} failed: {e.message}")
+    return f"{loads} loads for {len(teams)} teams"
+
+
+def build_jobs(db_path, repo, geocode_cache, football_api, snapshot, live_events=None, use_rapidapi=True,
+               intervals=JOB_INTERVALS):
+    jobs = [
+        Job('crawl', lambda: crawl_players(db_path), intervals['crawl']),
+        Job('geocode', lambda: f"{geocode_cache.warm_from_players()} cities looked up", intervals['geocode']),
+    ]
+    if use_rapidapi:
+        jobs.append(Job('fixtures', lambda: prefetch_fixtures(football_api, repo), intervals['fixtures']))
+    if live_events is not None:
+        jobs.append(Job('prune_events', lambda: f"{live_events.prune()} events pruned", intervals['prune_events']))
+    # Snapshot last: it picks up whatever the jobs before it changed
+    jobs.append(Job('snapshot', lambda: snapshot.get()[1], intervals['snapshot']))
+    return jobs
@@ -0,0 +1,254 @@
+"""Settings and long-lived objects (database access, caches, API clients, scheduler) of the web apps.
+
+app.py and asgi_app.py each hold one Services. Every object is built on first use, so creating
+an app opens no database or HTTP connection and runs no DDL: the schema is created by
+`flask init-db`, not at startup. The Alembic migrations (`flask db upgrade`) don't cover every
+table yet, so init-db is required either way. Until it has run, data routes answer 503 with a
+message saying so (check_schema).
+
+A preloading server (gunicorn --preload, PRELOAD_CACHES=true) calls warm() in its master
+process: the workers fork with the /players snapshot, its compressed copies, the gazetteer and
+the geocode LRU already in memory they share.
+"""
+import gc
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+import http_client
+from assets import AssetManifest
+from clusters import clusters_payload, parse_clusters_query, refresh_clusters
+from football_api import FOOTBALL_API_BASE_URL, FootballApi
+from geocoding import MISS, GeocodeCache
+from image_proxy import ImageProxy, preferred_format
+from leaderboards import parse_leaderboard_query, refresh_leaderboards
+from live_events import LiveEvents
+from metrics import Gauge
+from players_snapshot import PlayersSnapshot
+from repository import DEFAULT_DB_PATH, PlayerRepository, SchemaNotReadyError
+from responses import brotli
+from scheduler import Scheduler, SchedulerStore, build_jobs
+from shared_cache import SharedCache, quota_ledger
+from upstream import opencage_breaker, rapidapi_breaker
+
+
+# Endpoints (named alike in both apps) that don't read the database, so they answer before
+# `flask init-db` has run; every other route first calls Services.check_schema
+SCHEMA_FREE_ENDPOINTS = {'static', 'globe.index', 'globe.get_asset', 'globe.get_image', 'globe.get_metrics'}
+
+
+def env_flag(name, default):
+    return os.getenv(name, default).lower() == 'true'
+
+
+def load_config(overrides=None):
+    """Settings from the environment (and .env), with `overrides` on top."""
+    load_dotenv()
+    config = {
+        'DATABASE_PATH': os.getenv('DATABASE_PATH', DEFAULT_DB_PATH),  # Shared with the tracker
+        'OPENCAGE_API_KEY': os.getenv('OPENCAGE_API_KEY'),
+        'FOOTBALL_API_KEY': os.getenv('FOOTBALL_API_KEY'),
+        'FOOTBALL_API_BASE_URL': os.getenv('FOOTBALL_API_BASE_URL', FOOTBALL_API_BASE_URL),
+        'USE_RAPIDAPI': env_flag('USE_RAPIDAPI', 'true'),  # Enable or disable /next_games
+        'SCHEDULER_ENABLED': env_flag('SCHEDULER_ENABLED', 'false'),
+        'PRELOAD_CACHES': env_flag('PRELOAD_CACHES', 'false'),
+    }
+    config.update(overrides or {})
+    return config
+
+
+class service:
+    """A Services attribute built by the decorated method on first access, once per Services."""
+
+    def __init__(self, build):
+        self.build = build
+        self.name = build.__name__
+        self.__doc__ = build.__doc__
+
+    def __get__(self, services, owner=None):
+        if services is None:
+            return self
+        with services._lock:  # Reentrant: building one service may need another
+            if self.name not in services.__dict__:
+                services.__dict__[self.name] = self.build(services)
+        return services.__dict__[self.name]
+
+
+class Services:
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    @property
+    def db_path(self):
+        return self.config['DATABASE_PATH']
+
+    @service
+    def players_repo(self):
+        # Raw-SQL access shared with the tracker
+        return PlayerRepository(self.db_path)
+
+    @service
+    def geocode_cache(self):
+        # Geocodes are cached in the same database; /players only reads them, the geocode job fills them in
+        return GeocodeCache(self.db_path, api_key=self.config['OPENCAGE_API_KEY'])
+
+    @service
+    def shared_cache(self):
+        # Fixtures, team photos and the /players snapshot are shared by every worker process
+        # (SHARED_CACHE_PATH, default instance/shared_cache.db), so they survive restarts too
+        return SharedCache()
+
+    @service
+    def live_events(self):
+        # Player and fixture changes pushed to browsers by /events
+        return LiveEvents(self.players_repo)
+
+    @service
+    def football_api(self):
+        return FootballApi(self.config['FOOTBALL_API_KEY'], self.db_path, base_url=self.config['FOOTBALL_API_BASE_URL'],
+                           shared_cache=self.shared_cache, events=self.live_events)
+
+    @service
+    def players_snapshot(self):
+        # /players body, rebuilt lazily after the tracker (or anything else) writes to the table
+        return PlayersSnapshot(self.players_repo, geocode=self.geocode_cache.resolve_cached, shared=self.shared_cache)
+
+    @service
+    def image_proxy(self):
+        # Resized player photos and team logos, cached on disk (IMAGE_CACHE_DIR, default instance/image_cache)
+        return ImageProxy()
+
+    @service
+    def asset_manifest(self):
+        # Fingerprinted JS/CSS and multi-resolution textures from `flask build-assets` (plain /static without a build)
+        return AssetManifest()
+
+    @service
+    def scheduler(self):
+        # Crawl, geocode warm-up, fixture prefetch and snapshot rebuild in the background, so no
+        # request waits on RapidAPI or OpenCage. One process at a time runs the jobs (see scheduler.py).
+        return Scheduler(build_jobs(self.db_path, self.players_repo, self.geocode_cache, self.football_api,
+                                    self.players_snapshot, live_events=self.live_events,
+                                    use_rapidapi=self.config['USE_RAPIDAPI']))
+
+    def template_globals(self):
+        """asset_url() and texture_urls() for the templates; the manifest is read on first render."""
+        return {
+            'asset_url': lambda name: self.asset_manifest.asset_url(name),
+            'texture_urls': lambda name: self.asset_manifest.texture_urls(name),
+        }
+
+    def get_lat_long(self, city, country=None):
+        """Get (lat, lng) for a city from the gazetteer and the geocode cache; (None, None) if it can't be placed yet.
+
+        Never asks OpenCage: cities nobody has looked up yet are left to the geocode job (or
+        `flask warm-geocodes`), so no request waits on it.
+        """
+        try:
+            coords = self.geocode_cache.resolve_cached(city, country)
+        except Exception as e:
+            logging.warning(f"Geocode cache lookup failed for {city}: {e}")
+            return None, None
+        if coords is MISS or not coords:  # Unknown city: off the globe, not at (0, 0)
+            return None, None
+        return coords
+
+    def get_clusters(self, args):
+        """Return the stored clusters asked for by /players/clusters query parameters."""
+        group_by, precision = parse_clusters_query(args)
+        # The tracker refreshes clusters after every ingest; build them here only before its first run
+        if not self.players_repo.has_clusters():
+            refresh_clusters(self.players_repo, geocode=self.get_lat_long)
+        return clusters_payload(self.players_repo.fetch_clusters(group_by, precision))
+
+    def get_leaderboard(self, args):
+        """Return the stored leaderboard rows asked for by /players/leaderboards query parameters."""
+        stat, scope, scope_value, limit = parse_leaderboard_query(args)
+        # Like the clusters, rebuilt after every ingest; built here only before the tracker's first run
+        if not self.players_repo.has_leaderboards():
+            refresh_leaderboards(self.players_repo)
+        return self.players_repo.fetch_leaderboard(stat, scope, scope_value, limit)
+
+    def get_image_variant(self, size, args, accept_header):
+        """Return (path, etag, mimetype) for an /img request; raises ValueError, ImageSourceError or ImageHostError."""
+        src = args.get('src')
+        if not src:
+            raise ValueError("'src' is required")
+        return self.image_proxy.get(src, size, args.get('format') or preferred_format(accept_header))
+
+    def check_schema(self):
+        """Raise SchemaNotReadyError if the database lacks tables the apps read.
+
+        Checked until it passes once, so workers recover as soon as `flask init-db` has run.
+        """
+        if self._schema_ready:
+            return
+        missing = self.players_repo.missing_tables()
+        if missing:
+            raise SchemaNotReadyError(f"The database at {self.db_path} has no {', '.join(missing)} table(s); "
+                                      f"run `flask init-db` to create them")
+        self._schema_ready = True
+
+    def init_schema(self):
+        """Create the tables and triggers the apps and the tracker use, or update an older database."""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.players_repo.ensure_schema()
+        self.geocode_cache.setup_database()
+        self.football_api.team_index.setup_database()
+        self._schema_ready = True
+
+    def warm(self):
+        """Build what each worker would otherwise build on its first requests, then drop the connections.
+
+        Run in a preloading master before it forks; SQLite connections and HTTP sockets must not
+        cross the fork, so the workers open their own on first use.
+        """
+        self.check_schema()  # Refuse to start on a database that was never initialised
+        for encoding in (None, 'gzip') + (('br',) if brotli else ()):
+            self.players_snapshot.get(encoding)
+        self.asset_manifest  # Read the build manifest now
+        self.release_connections()
+        gc.freeze()  # Keeps the collector from writing to (and so copying) the preloaded objects
+
+    def release_connections(self):
+        if 'players_snapshot' in self.__dict__:
+            self.players_snapshot.close()
+        if 'players_repo' in self.__dict__:
+            self.players_repo.close()
+        http_client.close_session()
+
+
+# Host-wide gauges for /metrics (either app), read from the shared SQLite file when scraped
+def quota_samples(field):
+    samples = {}
+    for service_name, limit in quota_ledger.quotas.items():
+        used = quota_ledger.used(service_name)
+        samples[(service_name,)] = used if field == 'used' else (max(0, limit - used) if limit else float('inf'))
+    return samples
+
+
+job_stats_store = SchedulerStore()
+
+
+def scheduler_samples(field):
+    return {(name,): stats[field] or 0 for name, stats in job_stats_store.job_stats().items()}
+
+
+Gauge('upstream_quota_used', "Calls drawn from today's upstream quota by every process.", ['service'],
+      function=lambda: quota_samples('used'))
+Gauge('upstream_quota_remaining', "Calls left in today's upstream quota (+Inf when unlimited).", ['service'],
+      function=lambda: quota_samples('remaining'))
+Gauge('upstream_circuit_open', 'Whether calls to an upstream are being short-circuited (this process).',
+      ['service'], function=lambda: {(b.name,): int(b.is_open) for b in (opencage_breaker, rapidapi_breaker)})
+Gauge('scheduler_job_runs', 'Runs of each scheduled job, by any process.', ['job'],
+      function=lambda: scheduler_samples('runs'))
+Gauge('scheduler_job_failures', 'Failed runs of each scheduled job, by any process.', ['job'],
+      function=lambda: scheduler_samples('failures'))
+Gauge('scheduler_job_last_duration_seconds', 'Duration of the last run of each scheduled job.', ['job'],
+      function=lambda: scheduler_samples('last_duration'))
+Gauge('scheduler_job_last_started_timestamp_seconds', 'Start time of the last run of each scheduled job.', ['job'],
+      function=lambda: scheduler_samples('last_started'))
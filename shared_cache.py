@@ -0,0 +1,194 @@
+"""Cache and API quota shared by every process on the host (web workers and the tracker).
+
+Both live in their own SQLite file rather than the players database, so the writes that come
+with every upstream call don't wake the /players snapshot's data_version check. The geocode
+cache and the team index are still in the players database; the snapshot tells their writes
+from player changes by its fingerprint (see players_snapshot.py).
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from repository import INSTANCE_DIR, connect
+
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(INSTANCE_DIR, 'shared_cache.db'))
+
+# Entries kept in the shared cache before the oldest are evicted
+SHARED_CACHE_MAXSIZE = 10000
+
+# Calls per UTC day each upstream allows (free plans); 0 means no limit
+DAILY_QUOTAS = {
+    'rapidapi': int(os.getenv('RAPIDAPI_DAILY_QUOTA', '100')),
+    'opencage': int(os.getenv('OPENCAGE_DAILY_QUOTA', '2500')),
+}
+
+CREATE_SHARED_CACHE_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS shared_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+)
+'''
+
+CREATE_API_QUOTA_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS api_quota (
+    service TEXT NOT NULL,
+    period TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (service, period)
+)
+'''
+
+# Count the calls only if they still fit the budget; a single statement, so it is atomic across processes
+RESERVE_QUOTA_SQL = '''
+INSERT INTO api_quota (service, period, used) VALUES (:service, :period, :calls)
+ON CONFLICT(service, period) DO UPDATE SET used = used + excluded.used
+WHERE used + excluded.used <= :limit
+'''
+
+# The upstream's own count of today's calls (made by anything using the same key); never lowers ours
+SYNC_QUOTA_SQL = '''
+INSERT INTO api_quota (service, period, used) VALUES (:service, :period, :used)
+ON CONFLICT(service, period) DO UPDATE SET used = max(used, excluded.used)
+'''
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of calling an upstream whose daily quota is used up."""
+
+
+class SharedCache:
+    """JSON values with a TTL in a SQLite file every worker can read and write.
+
+    Eviction drops expired entries first, then the oldest ones once there are more than `maxsize`.
+    """
+
+    def __init__(self, db_path=SHARED_CACHE_PATH, maxsize=SHARED_CACHE_MAXSIZE):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = connect(self.db_path)
+        if not self._ready:
+            with conn:
+                conn.execute(CREATE_SHARED_CACHE_TABLE_SQL)
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_shared_cache_stored_at ON shared_cache (stored_at)")
+            self._ready = True
+        return conn
+
+    def get_entry(self, key):
+        """Return (value, stored_at) for an unexpired key, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, stored_at FROM shared_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return entry[0] if entry else default
+
+    def set(self, key, value, ttl, stored_at=None):
+        now = time.time()
+        stored_at = stored_at or now
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), stored_at, stored_at + ttl)
+                )
+                conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,))
+                overflow = conn.execute("SELECT COUNT(*) FROM shared_cache").fetchone()[0] - self.maxsize
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM shared_cache WHERE key IN "
+                        "(SELECT key FROM shared_cache ORDER BY stored_at LIMIT ?)", (overflow,)
+                    )
+        finally:
+            conn.close()
+
+    def delete(self, key):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM shared_cache WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+
+class QuotaLedger:
+    """Per-day call budget per upstream, drawn from atomically by every process."""
+
+    def __init__(self, db_path=SHARED_CACHE_PATH, quotas=None):
+        self.db_path = db_path
+        self.quotas = DAILY_QUOTAS if quotas is None else quotas
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = connect(self.db_path)
+        if not self._ready:
+            with conn:
+                conn.execute(CREATE_API_QUOTA_TABLE_SQL)
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def period():
+        # Upstream quotas reset at midnight UTC
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def acquire(self, service, calls=1):
+        """Reserve `calls` from today's budget, or raise QuotaExceededError without reserving anything."""
+        limit = self.quotas.get(service, 0)
+        if not limit:
+            return
+        if calls > limit:
+            raise QuotaExceededError(f"{service} daily quota of {limit} calls is used up")
+
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(RESERVE_QUOTA_SQL, {
+                    'service': service, 'period': self.period(), 'calls': calls, 'limit': limit
+                })
+        finally:
+            conn.close()
+        if cursor.rowcount != 1:
+            raise QuotaExceededError(f"{service} daily quota of {limit} calls is used up")
+
+    def sync(self, service, used):
+        """Raise today's count to `used`, the calls the upstream itself reports for today."""
+        if not self.quotas.get(service, 0):
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(SYNC_QUOTA_SQL, {'service': service, 'period': self.period(), 'used': int(used)})
+        finally:
+            conn.close()
+
+    def used(self, service):
+        """Calls drawn from today's budget so far."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT used FROM api_quota WHERE service = ? AND period = ?", (service, self.period())
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+
+# One ledger for the whole host: the web workers and the tracker draw from the same budget
+quota_ledger = QuotaLedger()
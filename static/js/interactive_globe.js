@@ -24,6 +24,11 @@ function latLngToVector3(lat, lng, radius) {
     );
 }
 
+// URL of a player photo or team logo resized by the /img endpoint
+function imageUrl(src, size) {
+    return src ? `/img/${size}?src=${encodeURIComponent(src)}` : src;
+}
+
 // Function to calculate age from date of birth
 function calculateAge(dateOfBirth) {
     const birthDate = new Date(dateOfBirth);
@@ -73,21 +78,39 @@ function init() {
     earthGroup.rotation.x = Math.PI / 6; // Adjust this value for the desired angle (e.g., 30 degrees)
     earthGroup.rotation.y = Math.PI /-1.5; // Adjust this value for the desired angle (e.g., 45 degrees)
     
-    // Load Earth texture
+    // Load Earth texture: the page lists it from smallest to sharpest. The globe appears with the
+    // small one, then each sharper one is fetched in turn and replaces it when it arrives
+    const textureUrls = container.dataset.textures
+        ? JSON.parse(container.dataset.textures)
+        : ['static/images/earth_textures/earth_texture1.jpg'];
     const textureLoader = new THREE.TextureLoader();
-    textureLoader.load('static/images/earth_textures/earth_texture1.jpg', function(texture) {
-        // Create Earth sphere with texture
-        const earthGeometry = new THREE.SphereGeometry(2, 64, 64);
-        const earthMaterial = new THREE.MeshPhongMaterial({
-            map: texture, // Apply the texture
-            emissive: 0x000000,
-            specular: 0x112233,
-            shininess: 10, // Reduce shininess for less reflection
-            color: 0x000000 // Change this to black
+    let earthMaterial = null;
+    function loadEarthTexture(level) {
+        textureLoader.load(textureUrls[level], function(texture) {
+            if (earthMaterial) {
+                const previous = earthMaterial.map;
+                earthMaterial.map = texture;
+                earthMaterial.needsUpdate = true;
+                previous.dispose();
+            } else {
+                // Create Earth sphere with texture
+                const earthGeometry = new THREE.SphereGeometry(2, 64, 64);
+                earthMaterial = new THREE.MeshPhongMaterial({
+                    map: texture, // Apply the texture
+                    emissive: 0x000000,
+                    specular: 0x112233,
+                    shininess: 10, // Reduce shininess for less reflection
+                    color: 0x000000 // Change this to black
+                });
+                const earthMesh = new THREE.Mesh(earthGeometry, earthMaterial);
+                earthGroup.add(earthMesh);
+            }
+            if (level + 1 < textureUrls.length) {
+                loadEarthTexture(level + 1);
+            }
         });
-        const earthMesh = new THREE.Mesh(earthGeometry, earthMaterial);
-        earthGroup.add(earthMesh);
-    });
+    }
+    loadEarthTexture(0);
     
     // Add coordinate grid lines
     addCoordinateGrid();
@@ -301,70 +324,156 @@ async function addDataPoints() {
     const players = await fetchPlayerData(); // Fetch player data
 
     players.forEach(player => {
-        // Define minimum and maximum distances from the globe
-        const minDistance = 2.3; // Minimum distance from the globe
-        const maxDistance = 2.9; // Maximum distance from the globe
+        addPlayerMarker(player);
 
-        // Generate a random distance within the specified range
-        const randomDistance = Math.random() * (maxDistance - minDistance) + minDistance;
+        // Fetch next games for the player
+        fetchNextGames(player.team); // Assuming player_number is the ID for the team
+    });
 
-        // Calculate position on the globe using the random distance
-        const basePosition = latLngToVector3(player.lat, player.lng, randomDistance); 
-        
-        // Define a vertical offset range
-        const verticalOffset = Math.random() * 0.2 - 0.1; // Random offset between -0.1 and 0.1
+    // Keep the globe current without reloading /players
+    subscribeToUpdates();
+}
 
-        // Apply the vertical offset to the Y-coordinate
-        const position = new THREE.Vector3(basePosition.x, basePosition.y + verticalOffset, basePosition.z);
-        
-        // Create a smaller disk geometry for circular appearance
-        const size = baseDiskSize; // Use base size for the disks
-        const diskGeometry = new THREE.PlaneGeometry(size, size); // Create a flat disk
-        
-        // Load the player's image as a texture
-        const textureLoader = new THREE.TextureLoader();
-        textureLoader.load(
-            player.image, // Assuming player.image contains the URL to the player's image
-            function(texture) {
-                // Create a circular texture material
-                const diskMaterial = new THREE.MeshBasicMaterial({ 
-                    map: texture, 
-                    side: THREE.DoubleSide, 
-                    transparent: true // Allow transparency for circular effect
-                }); 
-                const disk = new THREE.Mesh(diskGeometry, diskMaterial);
-                
-                // Store data with the disk
-                disk.userData = player; // Store the entire player data
-                
-                // Set position
-                disk.position.copy(position);
-                
-                // Make the disk face the camera
-                disk.lookAt(camera.position); // Make the disk face the camera
-                
-                // Add disk to the earth group
-                earthGroup.add(disk);
-                
-                // Store reference to disk
-                markers.push(disk);
-
-                // Draw line from the globe point to the player image
-                const globePosition = latLngToVector3(player.lat, player.lng, 2.01); // Position on the globe
-                const lineMaterial = new THREE.LineBasicMaterial({ color: 0xff0000 }); // Line color
-                const points = [globePosition, position]; // Start and end points of the line
-                const geometry = new THREE.BufferGeometry().setFromPoints(points);
-                const line = new THREE.Line(geometry, lineMaterial);
-                earthGroup.add(line); // Add line to the earth group
-            },
-            undefined, // onProgress callback
-            function(error) {
-                console.error('Error loading texture for player:', player.name, error);
-            }
-        );
+// Marker (disk and line) of each player by id, so live updates can find them
+const markersById = new Map();
 
-        // Fetch next games for the player
-        fetchNextGames(player.team); // Assuming player_number is the ID for the team
+function addPlayerMarker(player) {
+    // Players whose city couldn't be geocoded yet have no coordinates; skip them until it can
+    if (player.lat == null || player.lng == null) return;
+
+    // Define minimum and maximum distances from the globe
+    const minDistance = 2.3; // Minimum distance from the globe
+    const maxDistance = 2.9; // Maximum distance from the globe
+
+    // Generate a random distance within the specified range
+    const randomDistance = Math.random() * (maxDistance - minDistance) + minDistance;
+
+    // Calculate position on the globe using the random distance
+    const basePosition = latLngToVector3(player.lat, player.lng, randomDistance); 
+    
+    // Define a vertical offset range
+    const verticalOffset = Math.random() * 0.2 - 0.1; // Random offset between -0.1 and 0.1
+
+    // Apply the vertical offset to the Y-coordinate
+    const position = new THREE.Vector3(basePosition.x, basePosition.y + verticalOffset, basePosition.z);
+    
+    // Create a smaller disk geometry for circular appearance
+    const size = baseDiskSize; // Use base size for the disks
+    const diskGeometry = new THREE.PlaneGeometry(size, size); // Create a flat disk
+    
+    // Load the player's image as a texture
+    const textureLoader = new THREE.TextureLoader();
+    textureLoader.load(
+        imageUrl(player.image, 'marker'), // Resized (and WebP where supported) by the server
+        function(texture) {
+            // Create a circular texture material
+            const diskMaterial = new THREE.MeshBasicMaterial({ 
+                map: texture, 
+                side: THREE.DoubleSide, 
+                transparent: true // Allow transparency for circular effect
+            }); 
+            const disk = new THREE.Mesh(diskGeometry, diskMaterial);
+            
+            // Store data with the disk
+            disk.userData = player; // Store the entire player data
+            
+            // Set position
+            disk.position.copy(position);
+            
+            // Make the disk face the camera
+            disk.lookAt(camera.position); // Make the disk face the camera
+            
+            // Add disk to the earth group
+            earthGroup.add(disk);
+            
+            // Store reference to disk
+            markers.push(disk);
+
+            // Draw line from the globe point to the player image
+            const globePosition = latLngToVector3(player.lat, player.lng, 2.01); // Position on the globe
+            const lineMaterial = new THREE.LineBasicMaterial({ color: 0xff0000 }); // Line color
+            const points = [globePosition, position]; // Start and end points of the line
+            const geometry = new THREE.BufferGeometry().setFromPoints(points);
+            const line = new THREE.Line(geometry, lineMaterial);
+            earthGroup.add(line); // Add line to the earth group
+
+            removePlayerMarker(player.id); // An update may have raced this texture load
+            markersById.set(player.id, { disk, line });
+        },
+        undefined, // onProgress callback
+        function(error) {
+            console.error('Error loading texture for player:', player.name, error);
+        }
+    );
+}
+
+function removePlayerMarker(id) {
+    const marker = markersById.get(id);
+    if (!marker) return;
+    earthGroup.remove(marker.disk);
+    earthGroup.remove(marker.line);
+    markers = markers.filter(disk => disk !== marker.disk);
+    markersById.delete(id);
+}
+
+// Apply one player delta from /events (see live_events.py for the format)
+function applyPlayerChange(change) {
+    const { op, ...fields } = change;
+    if (op === 'add') {
+        addPlayerMarker(fields);
+        return;
+    }
+    if (op === 'remove') {
+        removePlayerMarker(fields.id);
+        return;
+    }
+
+    const marker = markersById.get(fields.id);
+    if (!marker) {
+        // Not on the globe yet (e.g. it had no coordinates): only a full row can place it
+        if (fields.lat != null && fields.lng != null && fields.name) addPlayerMarker(fields);
+        return;
+    }
+    const player = { ...marker.disk.userData, ...fields };
+    const moved = player.lat !== marker.disk.userData.lat || player.lng !== marker.disk.userData.lng
+        || player.image !== marker.disk.userData.image;
+    if (moved) {
+        // New club city or photo: redraw the marker
+        removePlayerMarker(player.id);
+        addPlayerMarker(player);
+    } else {
+        marker.disk.userData = player; // Stats only: the tooltip reads userData
+    }
+}
+
+// Team whose games are in the games list, refreshed when its fixtures change
+let displayedTeam = null;
+
+// Id of the last change applied, so a fresh subscription resumes where the old one stopped
+let lastEventId = null;
+const RESUBSCRIBE_DELAY_MS = 60000;
+
+function subscribeToUpdates() {
+    if (!window.EventSource) return;
+    // The browser reconnects by itself and resumes with Last-Event-ID
+    const events = new EventSource(lastEventId ? `/events?last_event_id=${lastEventId}` : '/events');
+    const track = handler => event => {
+        lastEventId = event.lastEventId || lastEventId;
+        handler(event);
+    };
+    events.addEventListener('player', track(event => applyPlayerChange(JSON.parse(event.data))));
+    events.addEventListener('fixtures', track(event => {
+        const change = JSON.parse(event.data);
+        if (change.team === displayedTeam) fetchNextGames(change.team);
+    }));
+    events.addEventListener('reset', track(async () => {
+        // We missed changes that are no longer kept: reload everything once
+        for (const id of [...markersById.keys()]) removePlayerMarker(id);
+        (await fetchPlayerData()).forEach(addPlayerMarker);
+    }));
+    events.addEventListener('error', () => {
+        // The server turned the stream down (busy, or live updates are off): it won't reconnect by itself
+        if (events.readyState === EventSource.CLOSED) setTimeout(subscribeToUpdates, RESUBSCRIBE_DELAY_MS);
     });
 }
 
@@ -381,6 +490,7 @@ async function fetchNextGames(teamName) {
         
         // Display the next games
         displayNextGames(gamesData);
+        displayedTeam = teamName;
     } catch (error) {
         console.error('Error fetching next games:', error);
     }
@@ -411,12 +521,12 @@ function displayNextGames(gamesData) {
 
                 // Create image elements for teams
                 const homeImage = document.createElement('img');
-                homeImage.src = game.home_image;
+                homeImage.src = imageUrl(game.home_image, 'avatar');
                 homeImage.alt = `${game.home_team} logo`;
                 homeImage.classList.add('team-image');
 
                 const awayImage = document.createElement('img');
-                awayImage.src = game.away_image;
+                awayImage.src = imageUrl(game.away_image, 'avatar');
                 awayImage.alt = `${game.away_team} logo`;
                 awayImage.classList.add('team-image');
 
@@ -0,0 +1,41 @@
+"""Shared test setup: no network, no API keys, and nothing written under instance/.
+
+Several modules read their settings at import (SHARED_CACHE_PATH, the daily quotas,
+GEOCODING_OFFLINE), so the environment is set here, before any test imports them.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+os.environ.update(
+    DATABASE_PATH=os.path.join(WORKDIR, 'israeli_football.db'),
+    SHARED_CACHE_PATH=os.path.join(WORKDIR, 'shared_cache.db'),
+    IMAGE_CACHE_DIR=os.path.join(WORKDIR, 'image_cache'),
+    FOOTBALL_API_KEY='test', OPENCAGE_API_KEY='test',
+    GEOCODING_OFFLINE='true', SCHEDULER_ENABLED='false', PRELOAD_CACHES='false',
+)
+
+INSERT_PLAYER_SQL = '''
+INSERT INTO football_players (name, date_of_birth, team, country, city, games_played, goals, assists,
+                              position, player_number, player_id, last_updated)
+VALUES (?, '1995-01-01', 'Maccabi Haifa', 'Israel', 'Haifa', 10, ?, 1, 'Midfielder', 8, ?, '2025-01-01')
+'''
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A PlayerRepository on a fresh database with the tracker's schema and two players."""
+    from repository import PlayerRepository
+
+    repo = PlayerRepository(str(tmp_path / 'players.db'))
+    repo.ensure_schema()
+    with repo.transaction() as conn:
+        conn.executemany(INSERT_PLAYER_SQL, [('Player 1', 3, '1'), ('Player 2', 5, '2')])
+    yield repo
+    repo.close()
@@ -0,0 +1,39 @@
+import sqlite3
+from contextlib import closing
+
+from app import create_app, current_services
+
+
+def make_app(tmp_path):
+    return create_app({'DATABASE_PATH': str(tmp_path / 'israeli_football.db'), 'SCHEDULER_ENABLED': False,
+                       'PRELOAD_CACHES': False})
+
+
+def test_data_routes_answer_503_before_init_db(tmp_path):
+    client = make_app(tmp_path).test_client()
+    response = client.get('/players')
+    assert response.status_code == 503
+    assert 'flask init-db' in response.get_json()['error']
+    assert client.get('/players/clusters').status_code == 503
+    assert client.get('/metrics').status_code == 200  # Schema-free endpoints still answer
+
+
+def test_missing_table_is_named(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        current_services().init_schema()
+    with closing(sqlite3.connect(str(tmp_path / 'israeli_football.db'))) as conn:
+        conn.execute("DROP TABLE team_index")
+
+    response = make_app(tmp_path).test_client().get('/players')
+    assert response.status_code == 503
+    assert 'team_index' in response.get_json()['error']
+
+
+def test_data_routes_answer_after_init_db(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        current_services().init_schema()
+    response = app.test_client().get('/players')
+    assert response.status_code == 200
+    assert response.get_json() == []
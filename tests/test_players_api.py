@@ -0,0 +1,36 @@
+import pytest
+
+from players_api import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_players_query, query_players
+
+
+def test_defaults():
+    query = parse_players_query({'team': 'Maccabi Haifa'})
+    assert query['filters'] == {'team': 'Maccabi Haifa'}
+    assert query['limit'] == DEFAULT_PAGE_SIZE
+    assert query['after_id'] is None
+    assert query['format'] == 'records'
+
+
+def test_numbers_and_limits():
+    query = parse_players_query({'min_goals': '3', 'min_lat': '31.5', 'cursor': '10', 'limit': '5000'})
+    assert query['filters'] == {'min_goals': 3, 'min_lat': 31.5}
+    assert query['after_id'] == 10
+    assert query['limit'] == MAX_PAGE_SIZE
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'fields': 'name,salary'}, 'Unknown fields: salary'),
+    ({'min_goals': 'many'}, "'min_goals' must be an integer"),
+    ({'min_goals': '-1'}, "'min_goals' must be at least 0"),
+    ({'max_lng': 'east'}, "'max_lng' must be a number"),
+    ({'limit': '0'}, "'limit' must be at least 1"),
+    ({'format': 'csv'}, "'format' must be 'records' or 'columnar'"),
+])
+def test_invalid_queries(args, message):
+    with pytest.raises(ValueError, match=message):
+        parse_players_query(args)
+
+
+def test_computed_field_only(repo):
+    payload, _ = query_players(repo, parse_players_query({'fields': 'value'}))
+    assert payload == [{'value': 0}, {'value': 0}]
@@ -0,0 +1,57 @@
+import json
+import sqlite3
+from contextlib import closing
+
+from geocoding import MISS, GeocodeCache
+from players_snapshot import PlayersSnapshot
+
+
+def write(repo, sql, params=()):
+    """Commit from another connection, as the tracker does."""
+    with closing(sqlite3.connect(repo.db_path)) as conn:
+        conn.execute(sql, params)
+        conn.commit()
+
+
+def test_player_change_rebuilds_the_snapshot(repo):
+    snapshot = PlayersSnapshot(repo)
+    body, etag = snapshot.get()
+    assert snapshot.get() == (body, etag)
+
+    write(repo, "UPDATE football_players SET goals = 9 WHERE player_id = '1'")
+    new_body, new_etag = snapshot.get()
+    assert new_etag != etag
+    assert [player['goals'] for player in json.loads(new_body)] == [9, 5]
+
+
+def test_other_tables_in_the_file_dont_rebuild_it(repo):
+    geocode_cache = GeocodeCache(repo.db_path)
+    geocode_cache.setup_database()
+    snapshot = PlayersSnapshot(repo)
+    _, etag = snapshot.get()
+
+    rebuilds = []
+    snapshot.rebuild = lambda: rebuilds.append(1)
+    geocode_cache.store('Haifa', (32.79, 34.99))
+    assert snapshot.get()[1] == etag
+    assert not rebuilds
+
+
+def test_unresolved_cities_are_retried(repo, monkeypatch):
+    write(repo, "UPDATE football_players SET lat = NULL, lng = NULL")
+    lookups = []
+
+    def geocode(city, country):
+        lookups.append(city)
+        return MISS if len(lookups) <= 2 else (32.79, 34.99)
+
+    snapshot = PlayersSnapshot(repo, geocode=geocode)
+    players = json.loads(snapshot.get()[0])
+    assert players[0]['lat'] is None
+    snapshot.get()
+    assert len(lookups) == 2  # Not before the retry delay
+
+    # Once the geocode job has cached the city, the next rebuild after the retry delay places it
+    monkeypatch.setattr(snapshot, '_retry_due', lambda: True)
+    players = json.loads(snapshot.get()[0])
+    assert players[0]['lat'] == 32.79
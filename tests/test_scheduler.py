@@ -0,0 +1,28 @@
+import time
+
+from scheduler import SchedulerStore
+
+
+def test_one_runner_holds_the_lease(tmp_path):
+    path = str(tmp_path / 'shared_cache.db')
+    first, second = SchedulerStore(path), SchedulerStore(path)
+
+    assert first.acquire_lease()
+    assert not second.acquire_lease()
+    assert first.acquire_lease()  # Renewing keeps it
+
+    first.release_lease()
+    assert second.acquire_lease()
+    assert not first.acquire_lease()
+
+
+def test_expired_lease_is_taken_over(tmp_path, monkeypatch):
+    path = str(tmp_path / 'shared_cache.db')
+    first, second = SchedulerStore(path, lease_seconds=30), SchedulerStore(path, lease_seconds=30)
+    assert first.acquire_lease()
+
+    # The runner died without releasing: its lease runs out
+    later = time.time() + 31
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert second.acquire_lease()
+    assert not first.acquire_lease()
@@ -0,0 +1,39 @@
+import pytest
+
+from shared_cache import QuotaExceededError, QuotaLedger
+
+
+def test_quota_ledger_refuses_calls_past_the_limit(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'shared_cache.db'), quotas={'opencage': 3})
+    ledger.acquire('opencage', calls=2)
+    ledger.acquire('opencage')
+    with pytest.raises(QuotaExceededError):
+        ledger.acquire('opencage')
+    assert ledger.used('opencage') == 3
+
+
+def test_quota_ledger_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'shared_cache.db')
+    web, tracker = QuotaLedger(path, quotas={'rapidapi': 5}), QuotaLedger(path, quotas={'rapidapi': 5})
+    web.acquire('rapidapi', calls=4)
+    # A refused reservation takes nothing
+    with pytest.raises(QuotaExceededError):
+        tracker.acquire('rapidapi', calls=2)
+    tracker.acquire('rapidapi')
+    assert web.used('rapidapi') == 5
+
+
+def test_sync_only_raises_the_count(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'shared_cache.db'), quotas={'rapidapi': 100})
+    ledger.acquire('rapidapi', calls=10)
+    ledger.sync('rapidapi', 40)  # The upstream counted calls we didn't see
+    assert ledger.used('rapidapi') == 40
+    ledger.sync('rapidapi', 20)
+    assert ledger.used('rapidapi') == 40
+
+
+def test_zero_quota_means_unlimited(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'shared_cache.db'), quotas={'opencage': 0})
+    for _ in range(10):
+        ledger.acquire('opencage')
+    assert ledger.used('opencage') == 0
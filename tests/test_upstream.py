@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from upstream import CircuitBreaker, CircuitOpenError
+
+
+def fail():
+    raise ConnectionError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'not called')
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert not breaker.is_open
+
+
+def test_trial_call_after_the_cool_down(monkeypatch):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.is_open
+
+    later = time.monotonic() + 31
+    monkeypatch.setattr(time, 'monotonic', lambda: later)
+    # A failed trial re-opens it for another cool-down; a successful one closes it
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.is_open
+    monkeypatch.setattr(time, 'monotonic', lambda: later + 31)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert not breaker.is_open
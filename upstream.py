@@ -0,0 +1,243 @@
+"""Shared protection for calls to OpenCage and RapidAPI.
+
+- SingleFlight coalesces concurrent identical calls into one in-flight request.
+- CircuitBreaker stops calling a host that keeps failing, for a cool-down period.
+- UpstreamCache serves fresh values, serves stale ones while a background refresh runs,
+  and falls back to the last good value when the upstream errors or the breaker is open.
+  Given a SharedCache it also shares values with the other worker processes.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import CACHE_REQUESTS
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class SingleFlight:
+    """Run a function once per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (done event, result holder)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = (threading.Event(), {})
+                self._calls[key] = call
+        done, result = call
+
+        if not leader:
+            done.wait()
+        else:
+            try:
+                result['value'] = fn()
+            except Exception as e:
+                result['error'] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                done.set()
+
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+
+class AsyncSingleFlight:
+    """asyncio version of SingleFlight for the ASGI app."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coroutine_fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; allows a trial call after `reset_timeout`."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def check(self):
+        """Raise CircuitOpenError if calls to this upstream should be skipped right now."""
+        if self.is_open:
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(f"{self.name} circuit opened after {self._failures} failures")
+                # Re-opening after a failed trial call starts a new cool-down
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn through the breaker."""
+        self.check()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+# One breaker per upstream host, shared by every caller in the process
+opencage_breaker = CircuitBreaker('OpenCage')
+rapidapi_breaker = CircuitBreaker('RapidAPI')
+
+
+class UpstreamCache:
+    """In-process cache for upstream responses with stale-while-revalidate.
+
+    A value is fresh for `ttl` seconds. After that, and for up to `stale_ttl` seconds
+    in total, it is still served while one background refresh runs. If the refresh or
+    a synchronous load fails, the last good value is served for as long as it is kept.
+
+    With `shared` (a shared_cache.SharedCache), values loaded by any worker are stored there
+    under `namespace`, and a local miss or stale entry first checks it for a newer value.
+    """
+
+    def __init__(self, ttl, stale_ttl, maxsize=1024, shared=None, namespace=''):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.shared = shared
+        self.namespace = namespace
+        self._data = OrderedDict()  # key -> (value, stored_at); wall-clock so workers can compare
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._refreshing = set()
+
+    def _shared_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _local_entry(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.stale_ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def _entry(self, key):
+        entry = self._local_entry(key)
+        if self.shared is None or (entry is not None and time.time() - entry[1] <= self.ttl):
+            return entry
+
+        # Another worker may already have loaded (or refreshed) this value
+        try:
+            shared_entry = self.shared.get_entry(self._shared_key(key))
+        except Exception as e:
+            logging.warning(f"Shared cache read of {key!r} failed: {e}")
+            return entry
+        if shared_entry is not None and (entry is None or shared_entry[1] > entry[1]):
+            self._store_local(key, *shared_entry)
+            return shared_entry
+        return entry
+
+    def get(self, key, default=None):
+        """Return the cached value (fresh or stale), or `default`."""
+        entry = self._entry(key)
+        return entry[0] if entry else default
+
+    def is_fresh(self, key):
+        entry = self._entry(key)
+        return entry is not None and time.time() - entry[1] <= self.ttl
+
+    def _store_local(self, key, value, stored_at):
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set(self, key, value):
+        stored_at = time.time()
+        self._store_local(key, value, stored_at)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(key), value, self.stale_ttl, stored_at=stored_at)
+            except Exception as e:
+                logging.warning(f"Shared cache write of {key!r} failed: {e}")
+
+    def _load(self, key, loader):
+        def load_and_store():
+            value = loader()
+            self.set(key, value)
+            return value
+        return self._flight.do(key, load_and_store)
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                logging.warning(f"Background refresh of {key!r} failed, still serving stale data: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def refresh(self, key, loader):
+        """Load `key` now (sharing a load already in flight) and return the new value."""
+        return self._load(key, loader)
+
+    def fetch(self, key, loader):
+        """Return the value for `key`, calling `loader()` only when needed.
+
+        Concurrent misses for the same key share one loader call.
+        """
+        entry = self._entry(key)
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                CACHE_REQUESTS.inc(cache=self.namespace, result='stale')
+                self._refresh_in_background(key, loader)
+            else:
+                CACHE_REQUESTS.inc(cache=self.namespace, result='hit')
+            return value
+
+        CACHE_REQUESTS.inc(cache=self.namespace, result='miss')
+        return self._load(key, loader)